@@ -1,5 +1,152 @@
-from django.contrib import admin
+from typing import List, Optional, Tuple
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db.models import Q
+from django.utils.html import format_html
+from menu.services.menu_funcs import (
+    count_subtrees,
+    delete_subtrees,
+    move_items,
+    update_parent,
+)
 
 from .models import MenuItem  # Имя вашей модели
 
-admin.site.register(MenuItem)
+
+class MenuItemActionForm(ActionForm):
+    new_parent = forms.IntegerField(
+        required=False,
+        label="New parent id",
+        help_text="Empty - move to the root.",
+    )
+
+
+class ParentFilter(admin.SimpleListFilter):
+    """
+    Children of one item (or the roots).
+
+    Only the chosen item and its ancestors are listed,
+    not all items of the tree.
+    """
+
+    title = "parent"
+    parameter_name = "parent"
+
+    def lookups(self, request, model_admin) -> List[Tuple[str, str]]:
+        choices: List[Tuple[str, str]] = [("root", "Roots")]
+        value: Optional[str] = self.value()
+        if value and value.isdigit():
+            url: Optional[str] = (
+                MenuItem.objects.filter(pk=value)
+                .values_list("url", flat=True)
+                .first()
+            )
+            if url is not None:
+                prefixes: List[str] = [
+                    url[: pos + 1]
+                    for pos, char in enumerate(url)
+                    if char == "/"
+                ]
+                choices.extend(
+                    (str(item_id), item_url)
+                    for item_id, item_url in MenuItem.objects.filter(
+                        url__in=prefixes
+                    )
+                    .order_by("url")
+                    .values_list("id", "url")
+                )
+        return choices
+
+    def queryset(self, request, queryset):
+        value: Optional[str] = self.value()
+        if value == "root":
+            return queryset.filter(parent__isnull=True)
+        if value and value.isdigit():
+            return queryset.filter(parent_id=value)
+        return queryset
+
+
+@admin.register(MenuItem)
+class MenuItemAdmin(admin.ModelAdmin):
+    fields = ("name", "parent", "url")
+    readonly_fields = ("url",)
+    autocomplete_fields = ("parent",)
+    # для автодополнения, сам поиск - в get_search_results
+    search_fields = ("name", "url")
+    search_help_text = "Exact name or the beginning of the url."
+    list_display = ("id", "name", "url", "parent_id", "children_link")
+    list_filter = (ParentFilter,)
+    list_per_page = 100
+    show_full_result_count = False
+    ordering = ("id",)
+    action_form = MenuItemActionForm
+    actions = ("move_to_parent",)
+
+    @admin.display(description="children")
+    def children_link(self, obj: MenuItem) -> str:
+        return format_html('<a href="?parent={}">&rarr;</a>', obj.pk)
+
+    def get_search_results(self, request, queryset, search_term):
+        # индексы: name - равенство, url - префикс (varchar_pattern_ops)
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return (
+            queryset.filter(
+                Q(name=search_term) | Q(url__startswith=search_term)
+            ),
+            False,
+        )
+
+    @admin.action(description="Move selected menu items to the parent")
+    def move_to_parent(self, request, queryset):
+        new_parent_id: Optional[int] = None
+        value: str = request.POST.get("new_parent", "").strip()
+        if value:
+            if not value.isdigit():
+                self.message_user(
+                    request, "Parent id must be a number.", messages.ERROR
+                )
+                return
+            new_parent_id = int(value)
+
+        item_ids: List[int] = list(queryset.values_list("pk", flat=True))
+        try:
+            move_items((item_id, new_parent_id) for item_id in item_ids)
+        except ValueError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+        self.message_user(
+            request, f"{len(item_ids)} menu items moved.", messages.SUCCESS
+        )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # при смене имени url поддерева строятся заново
+        # (при смене родителя это уже сделал MenuItem.save)
+        changed: List[str] = form.changed_data
+        if change and "name" in changed and "parent" not in changed:
+            obj.url = update_parent(obj.pk, obj.parent_id)
+
+    def get_deleted_objects(self, objs, request):
+        # без коллектора Django: потомки только считаются
+        objs = list(objs)
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        count: int = count_subtrees(obj.pk for obj in objs)
+        to_delete = [str(obj) for obj in objs]
+        return (
+            to_delete,
+            {self.opts.verbose_name_plural: count},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        delete_subtrees([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        delete_subtrees(queryset.values_list("pk", flat=True))
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MenuConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "menu"
+
+    def ready(self):
+        from menu.services.tree_version import warn_if_caches_disabled
+
+        warn_if_caches_disabled()
@@ -0,0 +1,85 @@
+"""Module with the view decorators of the menu app."""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.views.decorators.http import condition
+from menu.services.tree_version import (
+    get_tree_modified,
+    get_tree_version,
+    is_tree_version_shared,
+)
+
+# имя и путь целевого пункта меню, как в теге draw_menu
+MenuTarget = Tuple[str, Optional[str]]
+
+
+def menu_etag(targets: Iterable[MenuTarget]) -> str:
+    """
+    Build the ETag of a page with the menus of the targets.
+
+    Within one tree version the menus are fully defined by the targets
+    and the render settings, so the ETag is built without the database
+    and the templates.
+
+    :param targets: Names and paths of the target items.
+    :return: Strong ETag (without quotes).
+    """
+    parts: List[str] = [
+        str(get_tree_version()),
+        settings.MENU_URL,
+        getattr(settings, "MENU_RENDERER", "template"),
+    ]
+    for menu_name, menu_path in sorted(
+        (menu_name, menu_path or "") for menu_name, menu_path in targets
+    ):
+        parts.extend((menu_name, menu_path))
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+
+def menu_last_modified() -> datetime:
+    """
+    Get the Last-Modified time of the pages with menus.
+
+    :return: Time of the last change of the menu tree.
+    """
+    return datetime.fromtimestamp(get_tree_modified(), tz=timezone.utc)
+
+
+def menu_condition(
+    get_targets: Callable[..., Iterable[MenuTarget]],
+) -> Callable:
+    """
+    Conditional GET for a view whose page depends only on its menus.
+
+    The view gets the ETag of the menu tree version and the targets
+    and the Last-Modified of the last menu change. If the request
+    has a matching If-None-Match (or If-Modified-Since), the response
+    is 304 and the view isn't called. Without a shared tree version
+    (see is_tree_version_shared) another process could have changed
+    the menus, so there are no validators and the view is always called.
+    Works with sync and async views.
+
+    :param get_targets: Function getting the targets of the page menus
+        from the view arguments (request, *args, **kwargs).
+    :return: View decorator.
+    """
+
+    def etag_func(request: HttpRequest, *args, **kwargs) -> Optional[str]:
+        if not is_tree_version_shared():
+            return None
+        return menu_etag(get_targets(request, *args, **kwargs))
+
+    def last_modified_func(
+        request: HttpRequest, *args, **kwargs
+    ) -> Optional[datetime]:
+        if not is_tree_version_shared():
+            return None
+        return menu_last_modified()
+
+    return condition(
+        etag_func=etag_func, last_modified_func=last_modified_func
+    )
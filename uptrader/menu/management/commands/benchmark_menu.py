@@ -0,0 +1,243 @@
+import datetime
+import json
+import random
+import statistics
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext, override_settings
+from menu.models.menu_item import MenuItem
+from menu.services.bulk_funcs import (
+    generate_menu_rows,
+    insert_menu_rows,
+    reserve_menu_item_ids,
+)
+from menu.services.closure_funcs import is_closure_enabled
+from menu.services.menu_funcs import MenuRow, get_menu_branch, update_parent
+
+SHAPES = ("deep", "wide", "random")
+
+
+def deep_rows(first_id: int, size: int, depth: int) -> Iterator[MenuRow]:
+    # цепочки по depth узлов
+    url: str = ""
+    for index in range(size):
+        name: str = f"n{index}"
+        if index % depth == 0:
+            parent_id: Optional[int] = None
+            url = f"{name}/"
+        else:
+            parent_id = first_id + index - 1
+            url = f"{url}{name}/"
+        yield first_id + index, parent_id, name, url
+
+
+def wide_rows(first_id: int, size: int, fanout: int) -> Iterator[MenuRow]:
+    # одно дерево, у каждого узла fanout детей
+    for index in range(size):
+        parts: List[str] = list()
+        position: int = index
+        while True:
+            parts.append(f"n{position}/")
+            if position == 0:
+                break
+            position = (position - 1) // fanout
+        parent_id: Optional[int] = (
+            first_id + (index - 1) // fanout if index else None
+        )
+        yield first_id + index, parent_id, f"n{index}", "".join(
+            reversed(parts)
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark menu retrieval, moves, saves and rendering on generated "
+        "trees. The trees are inserted in a transaction which is rolled "
+        "back, run it against a local database only."
+    )
+
+    template = Template(
+        "{% load menu_tags %}{% draw_menu menu_name menu_path %}"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000, 1000000],
+            help="Numbers of menu items in the generated trees.",
+        )
+        parser.add_argument(
+            "--shapes",
+            nargs="+",
+            choices=SHAPES,
+            default=list(SHAPES),
+            help=(
+                "deep - chains of --depth items, wide - one tree with "
+                "--fanout children per item, random - random parents."
+            ),
+        )
+        parser.add_argument("--depth", type=int, default=100)
+        parser.add_argument("--fanout", type=int, default=100)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=50,
+            help="Number of calls of every operation.",
+        )
+        parser.add_argument(
+            "--output",
+            default="menu_benchmark.json",
+            help="JSON file for the results.",
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON file with the results of a previous run.",
+        )
+
+    def rows(self, shape: str, first_id: int, size: int, options: Dict):
+        if shape == "deep":
+            return deep_rows(first_id, size, options["depth"])
+        if shape == "wide":
+            return wide_rows(first_id, size, options["fanout"])
+        names = (f"n{index}" for index in range(size))
+        return generate_menu_rows(first_id, names, one_tree=True)
+
+    @classmethod
+    def measure(cls, calls: List[Callable[[], object]]) -> Dict[str, float]:
+        if not calls:
+            return {"calls": 0}
+        timings: List[float] = list()
+        queries: int = 0
+        for call in calls:
+            with CaptureQueriesContext(connection) as captured:
+                start: float = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries += len(captured.captured_queries)
+
+        percentiles: List[float] = (
+            statistics.quantiles(timings, n=100, method="inclusive")
+            if len(timings) > 1
+            else timings * 99
+        )
+        return {
+            "calls": len(calls),
+            "p50_ms": round(percentiles[49], 3),
+            "p95_ms": round(percentiles[94], 3),
+            "p99_ms": round(percentiles[98], 3),
+            "queries_per_call": round(queries / len(calls), 2),
+        }
+
+    def render(self, row: MenuRow) -> str:
+        return self.template.render(
+            Context({"menu_name": row[2], "menu_path": row[3].strip("/")})
+        )
+
+    def run(self, shape: str, size: int, options: Dict) -> Dict[str, Dict]:
+        results: Dict[str, Dict] = dict()
+        with transaction.atomic():
+            start: float = time.perf_counter()
+            first_id: int = reserve_menu_item_ids(size)
+            insert_menu_rows(self.rows(shape, first_id, size, options))
+            results["build"] = {
+                "seconds": round(time.perf_counter() - start, 3)
+            }
+
+            ids: List[int] = random.sample(
+                range(first_id, first_id + size), min(options["repeat"], size)
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, parent_id, name, url FROM menu_menuitem"
+                    " WHERE id = ANY(%s) ORDER BY id;",
+                    (ids,),
+                )
+                sample: List[MenuRow] = cursor.fetchall()
+            children: List[MenuRow] = [row for row in sample if row[1]]
+
+            results["get_menu_branch"] = self.measure(
+                [lambda row=row: get_menu_branch(row[2]) for row in sample]
+            )
+            # ветка из базы и рендер без кэша фрагментов
+            with override_settings(
+                MENU_TREE_CACHE=False, MENU_FRAGMENT_CACHE=False
+            ):
+                results["draw_menu"] = self.measure(
+                    [lambda row=row: self.render(row) for row in sample]
+                )
+            # перенос в корень и обратно
+            results["update_parent"] = self.measure(
+                [
+                    call
+                    for row in children
+                    for call in (
+                        lambda row=row: update_parent(row[0], None),
+                        lambda row=row: update_parent(row[0], row[1]),
+                    )
+                ]
+            )
+            results["save"] = self.measure(
+                [
+                    lambda row=row: MenuItem(
+                        name="new", parent_id=row[0]
+                    ).save()
+                    for row in sample
+                ]
+            )
+            transaction.set_rollback(True)
+        return results
+
+    def compare(self, path: str, results: Dict[str, Dict]) -> None:
+        with open(path, encoding="utf-8") as file:
+            previous: Dict[str, Dict] = json.load(file)["results"]
+
+        self.stdout.write(f"Compared with {path} (p50):")
+        for key, stats in results.items():
+            old: Optional[Dict] = previous.get(key)
+            if not old or "p50_ms" not in stats or not old["p50_ms"]:
+                continue
+            ratio: float = stats["p50_ms"] / old["p50_ms"]
+            line: str = (
+                f"{key}: {old['p50_ms']:.3f} -> {stats['p50_ms']:.3f} ms"
+                f" (x{ratio:.2f})"
+            )
+            if ratio > 1.1:
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be positive")
+
+        results: Dict[str, Dict] = dict()
+        for shape in options["shapes"]:
+            for size in options["sizes"]:
+                self.stdout.write(f"{shape} tree, {size} items")
+                for operation, stats in self.run(shape, size, options).items():
+                    key: str = f"{shape}/{size}/{operation}"
+                    results[key] = stats
+                    self.stdout.write(f"  {operation}: {stats}")
+
+        report: Dict = {
+            "meta": {
+                "created": datetime.datetime.now().isoformat(),
+                "repeat": options["repeat"],
+                "depth": options["depth"],
+                "fanout": options["fanout"],
+                "closure_table": is_closure_enabled(),
+            },
+            "results": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(f"Results are written to {options['output']}")
+
+        if options["compare"]:
+            self.compare(options["compare"], results)
@@ -0,0 +1,123 @@
+import multiprocessing
+import random
+import resource
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from django.core.management.base import BaseCommand
+from menu.services.menu_funcs import MenuForest, MenuItemSchema, MenuRow
+
+
+def build_dicts(rows: List[MenuRow]) -> object:
+    # прежнее устройство MenuForest: строки в словарях и списки детей
+    items: Dict[int, MenuRow] = dict()
+    children: Dict[Optional[int], List[int]] = defaultdict(list)
+    ids_by_name: Dict[str, List[int]] = defaultdict(list)
+    ids_by_url: Dict[str, List[int]] = defaultdict(list)
+    for row in rows:
+        items[row[0]] = row
+        children[row[1]].append(row[0])
+        ids_by_name[row[2]].append(row[0])
+        ids_by_url[row[3]].append(row[0])
+    return items, children, ids_by_name, ids_by_url
+
+
+def build_objects(rows: List[MenuRow]) -> object:
+    # дерево из MenuItemSchema, как при сборке ветки из всех узлов
+    nodes: Dict[int, MenuItemSchema] = {
+        item_id: MenuItemSchema(
+            id=item_id, parent_id=parent_id, name=name, url=url
+        )
+        for item_id, parent_id, name, url in rows
+    }
+    for node in nodes.values():
+        parent: Optional[MenuItemSchema] = nodes.get(node.parent_id)
+        if parent is not None:
+            parent.children.append(node)
+    return nodes
+
+
+BUILDERS: Dict[str, Callable[[List[MenuRow]], object]] = {
+    "dicts": build_dicts,
+    "objects": build_objects,
+    "arrays": MenuForest,
+}
+
+
+def measure(builder: str, rows: List[MenuRow], queue) -> None:
+    rss_before: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start: float = time.perf_counter()
+    forest = BUILDERS[builder](rows)
+    elapsed: float = time.perf_counter() - start
+    rss_after: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, rss_after - rss_before))
+    del forest
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the peak RSS and the build time of the array-backed"
+        " menu forest and the object representations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=100000,
+            help="Number of menu items in the generated tree.",
+        )
+        parser.add_argument(
+            "--fanout",
+            type=int,
+            default=50,
+            help="Max number of children of one item.",
+        )
+        parser.add_argument(
+            "--names",
+            type=int,
+            default=1000,
+            help="Number of different item names.",
+        )
+
+    @classmethod
+    def generate(cls, count: int, fanout: int, names: int) -> List[MenuRow]:
+        rows: List[MenuRow] = [(1, None, "root", "root/")]
+        for item_id in range(2, count + 1):
+            parent: MenuRow = rows[random.randint(0, (item_id - 2) // fanout)]
+            name: str = f"item{random.randrange(names)}"
+            rows.append((item_id, parent[0], name, f"{parent[3]}{name}/"))
+        return rows
+
+    def handle(self, *args, **options):
+        rows: List[MenuRow] = self.generate(
+            options["count"], options["fanout"], options["names"]
+        )
+        self.stdout.write(f"{len(rows)} menu items")
+
+        # каждый вариант строится в отдельном процессе,
+        # иначе пик RSS предыдущего скрывает следующий
+        context = multiprocessing.get_context("fork")
+        for builder in BUILDERS:
+            queue = context.Queue()
+            process = context.Process(
+                target=measure, args=(builder, rows, queue)
+            )
+            process.start()
+            elapsed, rss = queue.get()
+            process.join()
+            self.stdout.write(
+                f"{builder:>7}: build {elapsed * 1000:.1f} ms,"
+                f" peak RSS +{rss / 1024:.1f} MiB"
+            )
+
+        forest = MenuForest(rows)
+        targets: List[str] = [row[3] for row in random.sample(rows, 1000)]
+        start: float = time.perf_counter()
+        for url in targets:
+            forest.branch_by_url(url)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"branch_by_url: {elapsed * 1000 / len(targets):.3f} ms per call"
+        )
@@ -0,0 +1,88 @@
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from menu.services.menu_funcs import MenuForest, MenuItemSchema, MenuRow
+from menu.services.menu_renderer import render_menu
+
+
+class Command(BaseCommand):
+    help = "Compare the template and the compiled menu renderers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=10000,
+            help="Number of menu items in the generated tree.",
+        )
+        parser.add_argument(
+            "--fanout",
+            type=int,
+            default=50,
+            help="Max number of children of one item.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of renders of each renderer.",
+        )
+
+    @classmethod
+    def generate(cls, count: int, fanout: int) -> List[MenuRow]:
+        rows: List[MenuRow] = [(1, None, "root", "root/")]
+        for item_id in range(2, count + 1):
+            parent: MenuRow = rows[random.randint(0, (item_id - 2) // fanout)]
+            name: str = f"item{item_id}"
+            rows.append((item_id, parent[0], name, f"{parent[3]}{name}/"))
+        return rows
+
+    def measure(self, label: str, render: Callable[[], str], repeat: int):
+        timings: List[float] = list()
+        html: str = ""
+        for _ in range(repeat):
+            start: float = time.perf_counter()
+            html = render()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.stdout.write(
+            f"{label:>9}: median {timings[len(timings) // 2] * 1000:.2f} ms,"
+            f" min {timings[0] * 1000:.2f} ms, {len(html)} bytes"
+        )
+
+    def handle(self, *args, **options):
+        rows: List[MenuRow] = self.generate(
+            options["count"], options["fanout"]
+        )
+        forest = MenuForest(rows)
+        target: MenuRow = rows[-1]
+        menu_items: List[MenuItemSchema] = forest.branch_by_url(target[3])
+        target_url: Optional[str] = target[3]
+        menu_url: str = "http://127.0.0.1:8000/menu/"
+
+        nodes: int = 0
+        stack: List[MenuItemSchema] = list(menu_items)
+        while stack:
+            nodes += 1
+            stack.extend(stack.pop().children)
+        self.stdout.write(f"Branch of {target[3]}: {nodes} nodes")
+
+        context: Dict = {
+            "menu_items": [[item] for item in menu_items],
+            "target": target[2],
+            "target_url": target_url,
+            "menu_url": menu_url,
+        }
+        self.measure(
+            "template",
+            lambda: render_to_string("menu/all_menu.html", context),
+            options["repeat"],
+        )
+        self.measure(
+            "compiled",
+            lambda: render_menu(menu_items, target[2], target_url, menu_url),
+            options["repeat"],
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from menu.services.branch_funcs import rebuild_branches
+
+
+class Command(BaseCommand):
+    help = "Build the stored branches of all menu items."
+
+    def handle(self, *args, **options):
+        count: int = rebuild_branches()
+        self.stdout.write(f"Done! {count} stored branches.")
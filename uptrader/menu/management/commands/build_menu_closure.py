@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from menu.services.closure_funcs import rebuild_closure
+
+
+class Command(BaseCommand):
+    help = "Build the menu closure table from scratch."
+
+    def handle(self, *args, **options):
+        rows: int = rebuild_closure()
+        self.stdout.write(f"Done! {rows} closure rows.")
@@ -1,9 +1,18 @@
 import random
+import time
 from typing import List
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from faker import Faker
 from menu.factories.menu_item_factory import MenuItemFactory
 from menu.models.menu_item import MenuItem
+from menu.services.bulk_funcs import (
+    METHODS,
+    generate_menu_rows,
+    insert_menu_rows,
+    reserve_menu_item_ids,
+)
 
 
 class Command(BaseCommand):
@@ -19,11 +28,32 @@ class Command(BaseCommand):
         parser.add_argument(
             "--one-tree", action="store_true", help="Create only one tree."
         )
+        parser.add_argument(
+            "--method",
+            choices=("factory",) + METHODS,
+            default="factory",
+            help=(
+                "factory - create items one by one through the factory, "
+                "copy - stream rows with COPY, bulk - batched bulk_create."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of rows in one batch (copy and bulk methods).",
+        )
 
     def handle(self, *args, **options):
         count = options["count"]
         one_tree = options["one_tree"]
 
+        if options["method"] != "factory":
+            self.bulk_load(
+                count, one_tree, options["method"], options["batch_size"]
+            )
+            return
+
         items: List[MenuItem] = [
             MenuItemFactory.create() for _ in range(count)
         ]
@@ -36,3 +66,29 @@ class Command(BaseCommand):
             items[i].save()
 
         self.stdout.write("Done!")
+
+    def bulk_load(
+        self, count: int, one_tree: bool, method: str, batch_size: int
+    ) -> None:
+        start: float = time.perf_counter()
+
+        def progress(inserted: int) -> None:
+            elapsed: float = time.perf_counter() - start
+            self.stdout.write(
+                f"{inserted}/{count} rows, {inserted / elapsed:.0f} rows/s"
+            )
+
+        fake = Faker()
+        with transaction.atomic():
+            first_id: int = reserve_menu_item_ids(count)
+            names = (fake.word() for _ in range(count))
+            insert_menu_rows(
+                generate_menu_rows(first_id, names, one_tree),
+                method=method,
+                batch_size=batch_size,
+                progress=progress,
+            )
+
+        self.stdout.write(
+            f"Done! {count} rows in {time.perf_counter() - start:.1f} s"
+        )
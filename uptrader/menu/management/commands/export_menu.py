@@ -0,0 +1,58 @@
+import csv
+import json
+import sys
+from typing import TextIO
+
+from django.core.management.base import BaseCommand
+from menu.services.bulk_funcs import iter_menu_rows_topological
+
+FORMATS = ("jsonl", "csv")
+FIELDS = ("id", "parent_id", "name", "url")
+
+
+class Command(BaseCommand):
+    help = "Export menu items in topological order (parents first)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="Path to the output file, '-' - stdout.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default="jsonl",
+            help="Format of the output file.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of rows fetched from the database at once.",
+        )
+
+    def handle(self, *args, **options):
+        if options["output"] == "-":
+            count: int = self.export(sys.stdout, options)
+        else:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                count = self.export(file, options)
+        self.stderr.write(f"Done! {count} rows exported.")
+
+    @classmethod
+    def export(cls, file: TextIO, options) -> int:
+        count: int = 0
+        rows = iter_menu_rows_topological(options["chunk_size"])
+        if options["format"] == "csv":
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            for count, row in enumerate(rows, start=1):
+                writer.writerow(row)
+        else:
+            for count, row in enumerate(rows, start=1):
+                file.write(
+                    json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False)
+                )
+                file.write("\n")
+        return count
@@ -0,0 +1,84 @@
+import csv
+import json
+import time
+from typing import Iterator, Optional, TextIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from menu.services.bulk_funcs import (
+    METHODS,
+    ImportRecord,
+    import_menu_records,
+)
+
+FORMATS = ("jsonl", "csv")
+
+
+class Command(BaseCommand):
+    help = (
+        "Import menu items exported with export_menu. "
+        "The items get new ids, urls are recomputed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Path to the exported file.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Format of the file, by default - by its extension.",
+        )
+        parser.add_argument(
+            "--method",
+            choices=METHODS,
+            default="copy",
+            help="copy - COPY FROM STDIN, bulk - batched INSERT.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of rows in one batch.",
+        )
+
+    @classmethod
+    def read_jsonl(cls, file: TextIO) -> Iterator[ImportRecord]:
+        for line in file:
+            if line.strip():
+                item = json.loads(line)
+                yield item["id"], item["parent_id"], item["name"]
+
+    @classmethod
+    def read_csv(cls, file: TextIO) -> Iterator[ImportRecord]:
+        for item in csv.DictReader(file):
+            parent_id: Optional[int] = (
+                int(item["parent_id"]) if item["parent_id"] else None
+            )
+            yield int(item["id"]), parent_id, item["name"]
+
+    def handle(self, *args, **options):
+        path: str = options["input"]
+        file_format: str = options["format"] or (
+            "csv" if path.endswith(".csv") else "jsonl"
+        )
+        read = self.read_csv if file_format == "csv" else self.read_jsonl
+        start: float = time.perf_counter()
+
+        def progress(loaded: int) -> None:
+            elapsed: float = time.perf_counter() - start
+            self.stdout.write(f"{loaded} rows, {loaded / elapsed:.0f} rows/s")
+
+        try:
+            with (
+                open(path, encoding="utf-8", newline="") as file,
+                transaction.atomic(),
+            ):
+                count: int = import_menu_records(
+                    read(file),
+                    method=options["method"],
+                    batch_size=options["batch_size"],
+                    progress=progress,
+                )
+        except (ValueError, KeyError) as exc:
+            raise CommandError(f"Invalid menu file: {exc}")
+
+        self.stdout.write(f"Done! {count} rows imported.")
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def get(host: str, port: int, path: str) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line: bytes = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the menu page with concurrent requests, e.g. to compare "
+        "gunicorn (WSGI) with uvicorn and MENU_ASYNC_VIEW=1 (ASGI)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "urls",
+            nargs="+",
+            help="Menu page urls, e.g. http://127.0.0.1:8000/menu/a/b/.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Total number of requests.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=50,
+            help="Number of concurrent requests.",
+        )
+        parser.add_argument(
+            "--label",
+            default="",
+            help="Name of the run in the output (e.g. wsgi or asgi).",
+        )
+        parser.add_argument(
+            "--output", help="JSON file to append the results to."
+        )
+
+    async def load(self, urls: List[str], total: int, concurrency: int):
+        targets = [urlsplit(url) for url in urls]
+        timings: List[float] = list()
+        errors: int = 0
+        counter: int = 0
+
+        async def worker():
+            nonlocal errors, counter
+            while counter < total:
+                target = targets[counter % len(targets)]
+                counter += 1
+                start: float = time.perf_counter()
+                try:
+                    status: int = await get(
+                        target.hostname,
+                        target.port or 80,
+                        target.path or "/",
+                    )
+                except OSError:
+                    status = 0
+                timings.append((time.perf_counter() - start) * 1000)
+                if status != 200:
+                    errors += 1
+
+        start: float = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return timings, errors, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        if options["requests"] < 2 or options["concurrency"] < 1:
+            raise CommandError("Need at least 2 requests and 1 worker")
+
+        timings, errors, elapsed = asyncio.run(
+            self.load(
+                options["urls"], options["requests"], options["concurrency"]
+            )
+        )
+        percentiles: List[float] = statistics.quantiles(
+            timings, n=100, method="inclusive"
+        )
+        result: Dict[str, Optional[float]] = {
+            "label": options["label"],
+            "requests": len(timings),
+            "concurrency": options["concurrency"],
+            "errors": errors,
+            "rps": round(len(timings) / elapsed, 1),
+            "p50_ms": round(percentiles[49], 3),
+            "p95_ms": round(percentiles[94], 3),
+            "p99_ms": round(percentiles[98], 3),
+        }
+        self.stdout.write(json.dumps(result))
+
+        if options["output"]:
+            with open(options["output"], "a", encoding="utf-8") as file:
+                file.write(json.dumps(result) + "\n")
@@ -0,0 +1,67 @@
+import time
+from typing import List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from menu.services.move_funcs import resume_move_jobs, run_move, start_move
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a menu item to a new parent, updating its subtree in batches, "
+        "or continue the interrupted moves with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("item_id", type=int, nargs="?", help="Item id.")
+        parser.add_argument(
+            "--parent",
+            type=int,
+            help="Id of the new parent, by default - move to the root.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue the unfinished moves.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of items updated by one transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between the batches.",
+        )
+
+    def handle(self, *args, **options):
+        item_id: Optional[int] = options["item_id"]
+        if (item_id is None) == (not options["resume"]):
+            raise CommandError("Pass either item_id or --resume.")
+        start: float = time.perf_counter()
+
+        def progress(moved: int, total: int) -> None:
+            elapsed: float = time.perf_counter() - start
+            self.stdout.write(
+                f"{moved}/{total} items, {moved / elapsed:.0f} items/s"
+            )
+
+        kwargs = dict(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            progress=progress,
+        )
+        if options["resume"]:
+            job_ids: List[int] = resume_move_jobs(**kwargs)
+            self.stdout.write(f"Done! {len(job_ids)} moves finished.")
+            return
+
+        try:
+            job_id: int = start_move(item_id, options["parent"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not run_move(job_id, **kwargs):
+            raise CommandError(f"Move {job_id} is run by another process.")
+        self.stdout.write(f"Done! Move {job_id} finished.")
@@ -0,0 +1,188 @@
+"""Module with the middlewares of the menu app."""
+
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Union
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from menu.services.menu_loader import MenuLoader
+from menu.services.menu_metrics import MenuMetrics, collect_metrics
+from menu.services.replicas import (
+    get_replicas,
+    has_written,
+    pin_primary,
+    replica_context,
+)
+
+logger = logging.getLogger("main")
+
+GetResponse = Callable[
+    [HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]
+]
+
+
+class AsyncCapableMiddleware:
+    """Base of the middlewares working both under WSGI and ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: GetResponse):
+        self.get_response = get_response
+        self.is_async: bool = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.call(request)
+
+    def call(self, request: HttpRequest) -> HttpResponse:
+        raise NotImplementedError
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        raise NotImplementedError
+
+
+class MenuLoaderMiddleware(AsyncCapableMiddleware):
+    """
+    Render all menus of the page together.
+
+    The draw_menu tags put placeholders into the page, after the response
+    is rendered they are replaced by the menus, whose branches are loaded
+    in one query. Must go after the middlewares which change
+    or compress the response content (e.g. GZipMiddleware).
+    Under ASGI the branches are loaded without blocking the event loop.
+    """
+
+    def call(self, request: HttpRequest) -> HttpResponse:
+        loader = MenuLoader()
+        request.menu_loader = loader
+        response: HttpResponse = self.get_response(request)
+        if len(loader) and not response.streaming:
+            self.set_content(
+                response, loader.replace(response.content, response.charset)
+            )
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        loader = MenuLoader()
+        request.menu_loader = loader
+        response: HttpResponse = await self.get_response(request)
+        if len(loader) and not response.streaming:
+            self.set_content(
+                response,
+                await loader.areplace(response.content, response.charset),
+            )
+        return response
+
+    @classmethod
+    def set_content(cls, response: HttpResponse, content: bytes) -> None:
+        response.content = content
+        if response.has_header("Content-Length"):
+            response.headers["Content-Length"] = str(len(content))
+
+
+class MenuMetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Collect the menu metrics of the request (see menu.services.menu_metrics).
+
+    The phases are sent in the Server-Timing header (settings.
+    MENU_SERVER_TIMING) and logged to the "main" logger: with the WARNING
+    level if the request took longer than settings.MENU_METRICS_SLOW_MS,
+    otherwise with the DEBUG level. Must go first to measure the whole
+    request.
+    """
+
+    def call(self, request: HttpRequest) -> HttpResponse:
+        if not getattr(settings, "MENU_METRICS", True):
+            return self.get_response(request)
+
+        with collect_metrics() as metrics:
+            response: HttpResponse = self.get_response(request)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if not getattr(settings, "MENU_METRICS", True):
+            return await self.get_response(request)
+
+        with collect_metrics() as metrics:
+            response: HttpResponse = await self.get_response(request)
+        return self.report(request, response, metrics)
+
+    @classmethod
+    def report(
+        cls, request: HttpRequest, response: HttpResponse, metrics: MenuMetrics
+    ) -> HttpResponse:
+        if not metrics.phases:
+            return response
+        if getattr(settings, "MENU_SERVER_TIMING", True):
+            response.headers["Server-Timing"] = metrics.server_timing()
+
+        record: Dict[str, object] = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            **metrics.as_dict(),
+        }
+        slow: bool = record["total_ms"] > getattr(
+            settings, "MENU_METRICS_SLOW_MS", 500
+        )
+        logger.log(
+            logging.WARNING if slow else logging.DEBUG,
+            "menu metrics %s",
+            json.dumps(record),
+            extra={"menu_metrics": record},
+        )
+        return response
+
+
+class MenuReplicaMiddleware(AsyncCapableMiddleware):
+    """
+    Read-your-writes for the menu reads from the replicas.
+
+    The requests changing data (not GET, HEAD, OPTIONS, TRACE) and the ones
+    writing the menu models read the menus from the primary and set
+    a cookie, so the next requests of the client read from the primary
+    for settings.MENU_REPLICA_STICKY_SECONDS, while the replicas catch up.
+    """
+
+    cookie_name: str = "menu_primary"
+
+    def call(self, request: HttpRequest) -> HttpResponse:
+        if not get_replicas():
+            return self.get_response(request)
+
+        with replica_context(self.cookie_name in request.COOKIES):
+            self.start(request)
+            response: HttpResponse = self.get_response(request)
+            return self.finish(response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if not get_replicas():
+            return await self.get_response(request)
+
+        with replica_context(self.cookie_name in request.COOKIES):
+            self.start(request)
+            response: HttpResponse = await self.get_response(request)
+            return self.finish(response)
+
+    @classmethod
+    def start(cls, request: HttpRequest) -> None:
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            pin_primary()
+
+    @classmethod
+    def finish(cls, response: HttpResponse) -> HttpResponse:
+        if has_written():
+            response.set_cookie(
+                cls.cookie_name,
+                "1",
+                max_age=getattr(settings, "MENU_REPLICA_STICKY_SECONDS", 10),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
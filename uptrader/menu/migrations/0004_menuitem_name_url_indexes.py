@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0003_alter_menuitem_parent"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(fields=["name"], name="menu_item_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(
+                fields=["url"],
+                name="menu_item_url_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+# Версия дерева меняется после каждого изменения пунктов меню любым способом
+# (ORM, сырой SQL, psql), новая версия рассылается через NOTIFY
+CREATE_TRIGGER_SQL: str = """
+INSERT INTO menu_menutreeversion (id, version) VALUES (1, 0);
+
+CREATE FUNCTION menu_bump_tree_version() RETURNS trigger AS $$
+DECLARE
+    new_version bigint;
+BEGIN
+    INSERT INTO menu_menutreeversion (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE
+    SET version = menu_menutreeversion.version + 1
+    RETURNING version INTO new_version;
+    PERFORM pg_notify('menu_tree_version', new_version::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER menu_menuitem_tree_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON menu_menuitem
+FOR EACH STATEMENT EXECUTE FUNCTION menu_bump_tree_version();
+"""
+
+DROP_TRIGGER_SQL: str = """
+DROP TRIGGER menu_menuitem_tree_version ON menu_menuitem;
+DROP FUNCTION menu_bump_tree_version();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0005_menuitemclosure"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuTreeVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+    ]
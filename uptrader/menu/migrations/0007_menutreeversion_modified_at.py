@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+# Триггер запоминает время изменения и рассылает его вместе с версией
+# ("<version> <unix time>")
+BUMP_FUNCTION_SQL: str = """
+CREATE OR REPLACE FUNCTION menu_bump_tree_version() RETURNS trigger AS $$
+DECLARE
+    new_version bigint;
+BEGIN
+    INSERT INTO menu_menutreeversion (id, version, modified_at)
+    VALUES (1, 1, now())
+    ON CONFLICT (id) DO UPDATE
+    SET version = menu_menutreeversion.version + 1, modified_at = now()
+    RETURNING version INTO new_version;
+    PERFORM pg_notify(
+        'menu_tree_version',
+        new_version::text || ' ' || extract(epoch FROM now())::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+UPDATE menu_menutreeversion SET modified_at = now();
+"""
+
+OLD_BUMP_FUNCTION_SQL: str = """
+CREATE OR REPLACE FUNCTION menu_bump_tree_version() RETURNS trigger AS $$
+DECLARE
+    new_version bigint;
+BEGIN
+    INSERT INTO menu_menutreeversion (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE
+    SET version = menu_menutreeversion.version + 1
+    RETURNING version INTO new_version;
+    PERFORM pg_notify('menu_tree_version', new_version::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0006_menutreeversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menutreeversion",
+            name="modified_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunSQL(BUMP_FUNCTION_SQL, OLD_BUMP_FUNCTION_SQL),
+    ]
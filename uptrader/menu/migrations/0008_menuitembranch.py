@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:53
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Ветка пункта T содержит пункт X, если X или его родитель - предок T
+# (или сам T), поэтому после изменения X удаляются ветки, у которых
+# в ancestor_ids есть родитель X (для корня - сам X).
+# Триггеры срабатывают по имени после menu_menuitem_tree_version,
+# который блокирует строку версии (см. branch_funcs.fill_branches).
+CREATE_TRIGGERS_SQL: str = """
+CREATE FUNCTION menu_delete_stored_branches() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        DELETE FROM menu_menuitembranch
+        WHERE ancestor_ids && ARRAY(
+            SELECT DISTINCT COALESCE(parent_id, id) FROM new_rows
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM menu_menuitembranch
+        WHERE ancestor_ids && ARRAY(
+            SELECT DISTINCT COALESCE(parent_id, id) FROM old_rows
+        );
+    ELSE
+        DELETE FROM menu_menuitembranch
+        WHERE ancestor_ids && ARRAY(
+            SELECT COALESCE(o.parent_id, o.id)
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE (o.parent_id, o.name, o.url)
+                IS DISTINCT FROM (n.parent_id, n.name, n.url)
+            UNION
+            SELECT COALESCE(n.parent_id, n.id)
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE (o.parent_id, o.name, o.url)
+                IS DISTINCT FROM (n.parent_id, n.name, n.url)
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER menu_menuitem_update_branches_insert
+AFTER INSERT ON menu_menuitem
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION menu_delete_stored_branches();
+
+CREATE TRIGGER menu_menuitem_update_branches_update
+AFTER UPDATE ON menu_menuitem
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION menu_delete_stored_branches();
+
+CREATE TRIGGER menu_menuitem_update_branches_delete
+AFTER DELETE ON menu_menuitem
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION menu_delete_stored_branches();
+"""
+
+DROP_TRIGGERS_SQL: str = """
+DROP TRIGGER menu_menuitem_update_branches_insert ON menu_menuitem;
+DROP TRIGGER menu_menuitem_update_branches_update ON menu_menuitem;
+DROP TRIGGER menu_menuitem_update_branches_delete ON menu_menuitem;
+DROP FUNCTION menu_delete_stored_branches();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0007_menutreeversion_modified_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuItemBranch",
+            fields=[
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stored_branch",
+                        serialize=False,
+                        to="menu.menuitem",
+                    ),
+                ),
+                (
+                    "ancestor_ids",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.BigIntegerField(), size=None
+                    ),
+                ),
+                ("rows", models.JSONField()),
+            ],
+            options={
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["ancestor_ids"],
+                        name="menu_item_branch_anc_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
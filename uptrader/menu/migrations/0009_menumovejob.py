@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0008_menuitembranch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuMoveJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("item_id", models.BigIntegerField()),
+                ("new_parent_id", models.BigIntegerField(null=True)),
+                ("old_url", models.CharField(max_length=2048)),
+                ("new_url", models.CharField(max_length=2048)),
+                ("total", models.BigIntegerField(default=0)),
+                ("moved", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
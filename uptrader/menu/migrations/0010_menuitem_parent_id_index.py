@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0009_menumovejob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(
+                fields=["parent", "id"], name="menu_item_parent_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0010_menuitem_parent_id_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menumovejob",
+            name="last_id",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1 +1,5 @@
 from .menu_item import MenuItem
+from .menu_item_branch import MenuItemBranch
+from .menu_item_closure import MenuItemClosure
+from .menu_move_job import MenuMoveJob
+from .menu_tree_version import MenuTreeVersion
@@ -1,5 +1,17 @@
-from django.db import models
-from menu.services.menu_funcs import update_parent
+from django.db import connection, models, router, transaction
+from menu.services.closure_funcs import insert_closure_item, is_closure_enabled
+from menu.services.menu_funcs import delete_subtrees, update_parent
+from menu.services.tree_version import bump_tree_version
+
+
+class MenuItemQuerySet(models.QuerySet):
+    def delete(self):
+        # поддеревья удаляются одним запросом, без коллектора Django
+        count: int = delete_subtrees(self.values_list("pk", flat=True))
+        return count, {self.model._meta.label: count}
+
+    delete.alters_data = True
+    delete.queryset_only = True
 
 
 class MenuItem(models.Model):
@@ -13,34 +25,119 @@ class MenuItem(models.Model):
         blank=True,
     )
 
+    objects = MenuItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["name"], name="menu_item_name_idx"),
+            # поиск по префиксу пути (url LIKE 'a/b/%')
+            models.Index(
+                fields=["url"],
+                name="menu_item_url_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            # страницы детей по id (menu_limits, menu:children)
+            models.Index(
+                fields=["parent", "id"], name="menu_item_parent_id_idx"
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.name} ({self.url})"
 
+    def delete(self, using=None, keep_parents=False):
+        if self.pk is None:
+            raise ValueError(
+                f"{self._meta.object_name} object can't be deleted because "
+                f"its {self._meta.pk.attname} attribute is set to None."
+            )
+        count: int = delete_subtrees([self.pk])
+        self.pk = None
+        return count, {self._meta.label: count}
+
+    delete.alters_data = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженный parent_id, чтобы не перечитывать его в save
+        if "parent_id" in field_names:
+            instance._loaded_parent_id = instance.parent_id
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(
+            using=using, fields=fields, from_queryset=from_queryset
+        )
+        refreshed: bool = "parent_id" not in self.get_deferred_fields() and (
+            fields is None or bool({"parent", "parent_id"} & set(fields))
+        )
+        if refreshed:
+            self._loaded_parent_id = self.parent_id
+        elif hasattr(self, "_loaded_parent_id"):
+            # другие поля могли измениться вместе с parent_id,
+            # save прочитает его из БД
+            del self._loaded_parent_id
+
+    def _get_parent_url(self, using: str) -> str:
+        # Родитель уже загружен (например, MenuItem(parent=parent))
+        if (
+            MenuItem.parent.is_cached(self)
+            and self.parent is not None
+            and self.parent.pk == self.parent_id
+        ):
+            return self.parent.url
+
+        url = (
+            MenuItem.objects.using(using)
+            .filter(pk=self.parent_id)
+            .values_list("url", flat=True)
+            .first()
+        )
+        if url is None:
+            raise ValueError("Parent does not exist")
+        return url
+
     def save(self, *args, **kwargs):
         is_new = not self.pk
+        # Чтения перед записью - из той же базы, а не с реплики
+        using: str = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self
+        )
 
-        # Сохраняем оригинальный parent_id до сохранения
+        # Оригинальный parent_id известен, если объект загружен из БД
         if not is_new:
-            original = MenuItem.objects.get(pk=self.pk)
-            self._original_parent_id = original.parent_id
+            if hasattr(self, "_loaded_parent_id"):
+                self._original_parent_id = self._loaded_parent_id
+            else:
+                self._original_parent_id = (
+                    MenuItem.objects.using(using)
+                    .filter(pk=self.pk)
+                    .values_list("parent_id", flat=True)
+                    .first()
+                )
         else:
             self._original_parent_id = None
 
         # Если это новый объект — строим URL
         if is_new:
             if self.parent_id is not None:
-                try:
-                    parent = MenuItem.objects.get(pk=self.parent_id)
-                    self.url = f"{parent.url}{self.name}/"
-                except MenuItem.DoesNotExist:
-                    raise ValueError("Parent does not exist")
+                self.url = f"{self._get_parent_url(using)}{self.name}/"
             else:
                 self.url = f"{self.name}/"
 
-        # Сохраняем объект, чтобы получить pk
-        super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            # Сохраняем объект, чтобы получить pk
+            super().save(*args, **kwargs)
+            if is_new and is_closure_enabled():
+                with connection.cursor() as cursor:
+                    insert_closure_item(cursor, self.pk, self.parent_id)
+            transaction.on_commit(bump_tree_version)
 
         # Если это обновление и parent изменился — запускаем update_parent
         if not is_new and self.parent_id != self._original_parent_id:
-            update_parent(menu_item_id=self.id, new_parent_id=self.parent_id)
-            self.refresh_from_db()
+            self.url = update_parent(
+                menu_item_id=self.id, new_parent_id=self.parent_id
+            )
+
+        self._loaded_parent_id = self.parent_id
@@ -0,0 +1,30 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+
+
+class MenuItemBranch(models.Model):
+    """
+    Stored branch of the menu item (settings.MENU_BRANCH_TABLE).
+
+    rows are the items of the expanded branch: the ancestors of the item,
+    the item itself and the children of all of them, [id, parent_id,
+    name, url] each. ancestor_ids are the ids of the ancestors
+    and the item itself. The branches containing changed items are deleted
+    by the triggers on menu_menuitem (see migration 0008) and built again
+    when they are read.
+    """
+
+    item = models.OneToOneField(
+        "MenuItem",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stored_branch",
+    )
+    ancestor_ids = ArrayField(models.BigIntegerField())
+    rows = models.JSONField()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["ancestor_ids"], name="menu_item_branch_anc_idx"),
+        ]
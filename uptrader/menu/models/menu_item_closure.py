@@ -0,0 +1,41 @@
+from django.db import models
+
+
+class MenuItemClosure(models.Model):
+    """
+    Closure table of the menu tree.
+
+    There is a row for every pair of an item and its ancestor
+    (including the item itself with depth 0).
+    """
+
+    ancestor = models.ForeignKey(
+        "MenuItem",
+        on_delete=models.CASCADE,
+        related_name="descendant_links",
+        db_index=False,
+    )
+    descendant = models.ForeignKey(
+        "MenuItem",
+        on_delete=models.CASCADE,
+        related_name="ancestor_links",
+        db_index=False,
+    )
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"],
+                name="menu_item_closure_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["descendant", "depth"],
+                name="menu_item_closure_desc_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
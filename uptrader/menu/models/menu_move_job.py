@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class MenuMoveJob(models.Model):
+    """
+    Online move of a menu subtree (see menu.services.move_funcs).
+
+    The item itself is moved at once, the urls of its descendants
+    are rewritten from old_url to new_url in batches in the order of id.
+    The descendants with ids up to last_id are processed, so the job
+    can be continued after a crash. moved of total descendants are done.
+    """
+
+    # без внешних ключей: пункты удаляются и SQL-запросами
+    item_id = models.BigIntegerField()
+    new_parent_id = models.BigIntegerField(null=True)
+    old_url = models.CharField(max_length=2048)
+    new_url = models.CharField(max_length=2048)
+    total = models.BigIntegerField(default=0)
+    moved = models.BigIntegerField(default=0)
+    last_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.old_url} -> {self.new_url} ({self.moved}/{self.total})"
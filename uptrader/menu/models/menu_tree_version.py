@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class MenuTreeVersion(models.Model):
+    """
+    Version of the menu tree in the database.
+
+    The only row is updated by the trigger on menu_menuitem
+    after every change of the items (see migration 0006).
+    """
+
+    version = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(null=True)
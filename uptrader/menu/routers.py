@@ -0,0 +1,37 @@
+"""Module with the database routers of the menu app."""
+
+from typing import Optional
+
+from django.db import DEFAULT_DB_ALIAS
+from menu.services.replicas import get_read_alias, get_replicas, pin_primary
+
+
+class MenuReplicaRouter:
+    """
+    Read the menu models from the replicas (see menu.services.replicas).
+
+    The writes go to the primary and pin the following reads of the request
+    to it. The migrations are applied to the primary only.
+    """
+
+    app_label: str = "menu"
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        if model._meta.app_label == self.app_label:
+            return get_read_alias()
+        return None
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        if model._meta.app_label == self.app_label:
+            pin_primary()
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # реплики - копии основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, **hints) -> Optional[bool]:
+        if db in get_replicas():
+            return False
+        return None
@@ -0,0 +1,204 @@
+"""
+Module with the async variants of the menu functions.
+
+With psycopg 3 (pip install "psycopg[binary,pool]") the queries go through
+an async connection pool of the event loop, so one ASGI worker can serve
+many menu requests while they wait for Postgres. Without it the sync
+functions are run in a thread (sync_to_async).
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from menu.services.branch_funcs import is_branch_table_enabled
+from menu.services.closure_funcs import is_closure_enabled
+from menu.services.menu_funcs import (
+    UPDATE_PARENT_QUERY,
+    MenuForest,
+    MenuNode,
+    MenuRow,
+    _branch_query,
+    get_menu_branch,
+    get_menu_branch_by_url,
+    load_menu_branches,
+    update_parent,
+)
+from menu.services.menu_metrics import add_query, phase
+from menu.services.move_funcs import (
+    ITEM_MOVING_QUERY,
+    LOCK_JOBS_SHARED_QUERY,
+    MOVE_LOCK_CLASS,
+    raise_if_moving,
+)
+from menu.services.prepared import is_prepared_enabled
+from menu.services.replicas import pin_primary
+from menu.services.tree_version import bump_tree_version
+
+try:
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    AsyncConnectionPool = None
+
+# пул соединений на каждый event loop (задача открытия пула).
+# Задача ссылается на свой loop, поэтому записи закрытых loop
+# удаляются явно (_forget_closed_loops), а не по слабой ссылке.
+_pools: Dict[asyncio.AbstractEventLoop, asyncio.Task] = dict()
+
+
+def is_async_driver_available() -> bool:
+    return AsyncConnectionPool is not None and getattr(
+        settings, "MENU_ASYNC_DRIVER", True
+    )
+
+
+def _reads_async() -> bool:
+    # сохранённые ветки читает и достраивает только синхронная функция
+    return is_async_driver_available() and not is_branch_table_enabled()
+
+
+async def _open_pool() -> "AsyncConnectionPool":
+    database = connections["default"].settings_dict
+    pool = AsyncConnectionPool(
+        make_conninfo(
+            dbname=database["NAME"],
+            user=database["USER"],
+            password=database["PASSWORD"],
+            host=database["HOST"],
+            port=database["PORT"],
+        ),
+        min_size=1,
+        max_size=getattr(settings, "MENU_ASYNC_POOL_SIZE", 10),
+        open=False,
+    )
+    await pool.open()
+    return pool
+
+
+def _forget_closed_loops() -> None:
+    # пулы закрытых loop уже не закрыть, соединения закроет сборщик мусора
+    for loop in [loop for loop in _pools if loop.is_closed()]:
+        del _pools[loop]
+
+
+def _forget_failed_pool(
+    loop: asyncio.AbstractEventLoop, task: asyncio.Task
+) -> None:
+    # следующий вызов снова попробует открыть пул
+    if (task.cancelled() or task.exception() is not None) and (
+        _pools.get(loop) is task
+    ):
+        del _pools[loop]
+
+
+async def _get_pool() -> "AsyncConnectionPool":
+    loop = asyncio.get_running_loop()
+    task: Optional[asyncio.Task] = _pools.get(loop)
+    if task is None:
+        _forget_closed_loops()
+        task = _pools[loop] = loop.create_task(_open_pool())
+        task.add_done_callback(lambda done: _forget_failed_pool(loop, done))
+    # отмена одного запроса не отменяет открытие пула для остальных
+    return await asyncio.shield(task)
+
+
+async def _fetch(query: str, params: Sequence) -> List[MenuRow]:
+    pool = await _get_pool()
+    with phase("db"):
+        async with pool.connection() as conn, conn.cursor() as cursor:
+            await cursor.execute(query, params, prepare=is_prepared_enabled())
+            rows: List[MenuRow] = await cursor.fetchall()
+        add_query(len(rows))
+    return rows
+
+
+async def aget_menu_branch(menu_name: str) -> List[MenuNode]:
+    """
+    Async variant of get_menu_branch.
+
+    :param menu_name: Menu item name.
+    :return: List of the roots subtrees.
+    """
+    if not _reads_async():
+        return await sync_to_async(get_menu_branch)(menu_name)
+    rows: List[MenuRow] = await _fetch(
+        _branch_query("name = %s"), (menu_name,)
+    )
+    with phase("tree"):
+        return MenuForest(rows).branch(menu_name)
+
+
+async def aget_menu_branch_by_url(url: str) -> List[MenuNode]:
+    """
+    Async variant of get_menu_branch_by_url.
+
+    :param url: Full url of the menu item, e.g. "a/b/c/".
+    :return: List of the roots subtrees, empty if there is no such item.
+    """
+    if not _reads_async():
+        return await sync_to_async(get_menu_branch_by_url)(url)
+    rows: List[MenuRow] = await _fetch(
+        _branch_query("url = %s ORDER BY id LIMIT 1"), (url,)
+    )
+    with phase("tree"):
+        return MenuForest(rows).branch_by_url(url)
+
+
+async def aload_menu_branches(
+    menu_names: Iterable[str], urls: Iterable[str]
+) -> MenuForest:
+    """
+    Async variant of load_menu_branches.
+
+    :param menu_names: Names of the target items.
+    :param urls: Full urls of the target items.
+    :return: Forest with the branches of all targets.
+    """
+    if not _reads_async():
+        return await sync_to_async(load_menu_branches)(menu_names, urls)
+    rows: List[MenuRow] = await _fetch(
+        _branch_query("name = ANY(%s) OR url = ANY(%s)"),
+        (list(menu_names), list(urls)),
+    )
+    with phase("tree"):
+        return MenuForest(rows)
+
+
+async def aupdate_parent(
+    menu_item_id: int, new_parent_id: Optional[int] = None
+) -> Optional[str]:
+    """
+    Async variant of update_parent.
+
+    The closure table is maintained only by the sync function,
+    so it is used if the closure table is enabled.
+
+    :param menu_item_id: Menu item id.
+    :param new_parent_id: New parent id, None - move to the root.
+    :return: New url of the menu item, None if there is no such item.
+    :raise ValueError: If the subtree is being moved online.
+    """
+    if not is_async_driver_available() or is_closure_enabled():
+        return await sync_to_async(update_parent)(menu_item_id, new_parent_id)
+
+    pool = await _get_pool()
+    async with pool.connection() as conn:
+        async with conn.transaction(), conn.cursor() as cursor:
+            await cursor.execute(LOCK_JOBS_SHARED_QUERY, (MOVE_LOCK_CLASS,))
+            await cursor.execute(
+                ITEM_MOVING_QUERY, (new_parent_id, menu_item_id)
+            )
+            raise_if_moving(await cursor.fetchone())
+            await cursor.execute(
+                UPDATE_PARENT_QUERY,
+                (new_parent_id, menu_item_id, menu_item_id),
+                prepare=is_prepared_enabled(),
+            )
+            row: Optional[Tuple[str]] = await cursor.fetchone()
+    # следующие чтения запроса - с основного сервера, как в update_parent
+    pin_primary()
+    await sync_to_async(bump_tree_version)()
+    return row[0] if row is not None else None
@@ -0,0 +1,158 @@
+"""
+Module with the functions of the stored menu branches.
+
+With settings.MENU_BRANCH_TABLE the expanded branch of every menu item
+is stored in menu_menuitembranch, so reading a branch is one lookup
+of the stored rows by the item id. The triggers on menu_menuitem delete
+the stored branches containing the changed items in the same transaction,
+for any change (save, update_parent, bulk inserts, raw SQL), and the
+missing branches are built again when they are read.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from menu.services.menu_metrics import phase
+from menu.services.prepared import execute_prepared
+from menu.services.replicas import read_connection
+
+MenuRow = Tuple[int, Optional[int], str, str]
+
+# Сохранённые ветки целевых узлов, NULL - ветку нужно построить
+# ({targets} - условие выбора целевых узлов)
+STORED_BRANCHES_QUERY: str = """
+SELECT m.id, b.rows
+FROM menu_menuitem m
+LEFT JOIN menu_menuitembranch b ON b.item_id = m.id
+WHERE {targets};
+"""
+
+# Ветки узлов, как в BRANCH_QUERY, но для каждого узла отдельно
+BRANCHES_CTE: str = """
+WITH targets AS (
+    SELECT id, url FROM menu_menuitem WHERE id = ANY(%s)
+),
+ancestors AS (
+    SELECT t.id AS target_id, m.id, m.parent_id, m.name, m.url
+    FROM targets t
+    CROSS JOIN LATERAL generate_series(1, length(t.url)) AS pos(n)
+    JOIN menu_menuitem m ON m.url = left(t.url, pos.n)
+    WHERE substr(t.url, pos.n, 1) = '/'
+),
+branch AS (
+    SELECT * FROM ancestors
+    UNION
+    SELECT a.target_id, m.id, m.parent_id, m.name, m.url
+    FROM ancestors a
+    JOIN menu_menuitem m ON m.parent_id = a.id
+)
+"""
+
+# Строки ветки одного узла
+BRANCH_ROWS: str = (
+    "jsonb_agg("
+    "jsonb_build_array(b.id, b.parent_id, b.name, b.url) ORDER BY b.id"
+    ")"
+)
+
+FILL_BRANCHES_QUERY: str = BRANCHES_CTE + f"""
+INSERT INTO menu_menuitembranch (item_id, ancestor_ids, rows)
+SELECT
+    b.target_id,
+    (
+        SELECT array_agg(a.id) FROM ancestors a
+        WHERE a.target_id = b.target_id
+    ),
+    {BRANCH_ROWS}
+FROM branch b
+GROUP BY b.target_id
+ON CONFLICT (item_id) DO UPDATE
+SET ancestor_ids = EXCLUDED.ancestor_ids, rows = EXCLUDED.rows
+RETURNING item_id, rows;
+"""
+
+# Те же ветки без сохранения
+BUILD_BRANCHES_QUERY: str = BRANCHES_CTE + f"""
+SELECT b.target_id, {BRANCH_ROWS}
+FROM branch b
+GROUP BY b.target_id;
+"""
+
+
+def is_branch_table_enabled() -> bool:
+    return getattr(settings, "MENU_BRANCH_TABLE", False)
+
+
+def fill_branches(item_ids: List[int]) -> Dict[int, list]:
+    """
+    Build and store the branches of the menu items.
+
+    The version row of the tree is locked first, so a change of the tree
+    committed while the branches are being built waits for them
+    and its triggers delete them if they became stale.
+    If a change of the tree holds the row (its transaction is open),
+    the branches are built without storing, so the read doesn't wait
+    for the writer.
+
+    :param item_ids: Ids of the menu items.
+    :return: Dict of the branch rows by the item id.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT version FROM menu_menutreeversion
+            WHERE id = 1
+            FOR SHARE SKIP LOCKED;
+            """)
+        locked: bool = cursor.fetchone() is not None
+        cursor.execute(
+            FILL_BRANCHES_QUERY if locked else BUILD_BRANCHES_QUERY,
+            (item_ids,),
+        )
+        return dict(cursor.fetchall())
+
+
+def get_stored_rows(targets: str, params: Iterable) -> List[MenuRow]:
+    """
+    Get the rows of the stored branches of the target items.
+
+    The missing branches are built and stored.
+
+    :param targets: Condition of the target items, e.g. "name = %s".
+    :param params: Parameters of the condition.
+    :return: Rows of all branches without duplicates, sorted by id.
+    """
+    with phase("db"):
+        with read_connection().cursor() as cursor:
+            execute_prepared(
+                cursor, STORED_BRANCHES_QUERY.format(targets=targets), params
+            )
+            branches: Dict[int, Optional[list]] = dict(cursor.fetchall())
+        missing: List[int] = [
+            item_id for item_id, rows in branches.items() if rows is None
+        ]
+        if missing:
+            branches.update(fill_branches(missing))
+
+    rows: Dict[int, MenuRow] = dict()
+    for branch_rows in branches.values():
+        for item_id, parent_id, name, url in branch_rows or ():
+            rows[item_id] = (item_id, parent_id, name, url)
+    return [rows[item_id] for item_id in sorted(rows)]
+
+
+def rebuild_branches(batch_size: int = 1000) -> int:
+    """
+    Build the stored branches of all menu items from scratch.
+
+    :param batch_size: Number of the branches built by one query.
+    :return: Number of the stored branches.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id FROM menu_menuitem ORDER BY id;")
+        item_ids: List[int] = [row[0] for row in cursor.fetchall()]
+
+    count: int = 0
+    for start in range(0, len(item_ids), batch_size):
+        count += len(fill_branches(item_ids[start : start + batch_size]))
+    return count
@@ -0,0 +1,321 @@
+"""Module with the functions for bulk loading of menu items."""
+
+import io
+import random
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.backends.utils import CursorWrapper
+from menu.models import MenuItem
+from menu.services.closure_funcs import is_closure_enabled, rebuild_closure
+from menu.services.menu_funcs import MenuRow
+from menu.services.tree_version import bump_tree_version
+
+METHODS = ("copy", "bulk")
+
+# Импортируемый пункт: старый id, старый id родителя, имя
+ImportRecord = Tuple[int, Optional[int], str]
+
+# Импортируемые пункты до вставки в menu_menuitem
+# (depth и url вычисляются по уровням)
+CREATE_IMPORT_TABLE_QUERY: str = """
+CREATE TEMPORARY TABLE menu_import (
+    old_id bigint PRIMARY KEY,
+    old_parent_id bigint,
+    name text NOT NULL,
+    new_id bigint,
+    depth integer,
+    url text
+) ON COMMIT DROP;
+"""
+
+# Пункты уровня depth (параметры: уровень, уровень родителей)
+IMPORT_LEVEL_QUERY: str = """
+UPDATE menu_import AS t
+SET url = p.url || t.name || '/', depth = %s
+FROM menu_import AS p
+WHERE p.depth = %s AND t.old_parent_id = p.old_id;
+"""
+
+
+def reserve_menu_item_ids(count: int) -> int:
+    """
+    Reserve a range of ids of the menu items.
+
+    The table is locked against concurrent inserts until the end
+    of the transaction, so the range is not taken by other sessions.
+    Must be called inside a transaction.
+
+    :param count: Number of the ids (positive).
+    :return: First id of the range.
+    """
+    if count <= 0:
+        raise ValueError("Number of the ids must be positive")
+    with connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE menu_menuitem IN SHARE ROW EXCLUSIVE MODE;")
+        cursor.execute(
+            """
+            SELECT setval(seq::regclass, nextval(seq::regclass) + %s - 1)
+                - %s + 1
+            FROM pg_get_serial_sequence('menu_menuitem', 'id') AS seq;
+            """,
+            (count, count),
+        )
+        return cursor.fetchone()[0]
+
+
+def _copy_value(value: Optional[object]) -> str:
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_batch(
+    rows: List[tuple], table: str = "menu_menuitem (id, parent_id, name, url)"
+) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    query: str = f"COPY {table} FROM STDIN"
+    with connection.cursor() as cursor:
+        if is_psycopg3:
+            # psycopg 3 (Django выбирает его, если он установлен)
+            with cursor.copy(query) as copy:
+                copy.write(buffer.getvalue())
+        else:
+            buffer.seek(0)
+            cursor.copy_expert(query, buffer)
+
+
+def _bulk_create_batch(rows: List[MenuRow]) -> None:
+    MenuItem.objects.bulk_create(
+        [
+            MenuItem(id=item_id, parent_id=parent_id, name=name, url=url)
+            for item_id, parent_id, name, url in rows
+        ],
+        batch_size=len(rows),
+    )
+
+
+def insert_menu_rows(
+    rows: Iterable[MenuRow],
+    method: str = "copy",
+    batch_size: int = 10000,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Insert the menu items bypassing MenuItem.save.
+
+    Ids and urls must be already computed and parents must go before
+    their children. The rows are consumed in batches, so they can be
+    generated on the fly. All rows are inserted in one transaction.
+
+    :param rows: Menu items rows (id, parent_id, name, url).
+    :param method: "copy" (COPY FROM STDIN) or "bulk" (bulk_create).
+    :param batch_size: Number of rows in one batch.
+    :param progress: Function called with the number of inserted rows
+    after every batch.
+    :return: Number of inserted rows.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method}, use one of {METHODS}")
+    insert_batch = _copy_batch if method == "copy" else _bulk_create_batch
+
+    total: int = 0
+    iterator: Iterator[MenuRow] = iter(rows)
+    with transaction.atomic():
+        while batch := list(islice(iterator, batch_size)):
+            insert_batch(batch)
+            total += len(batch)
+            if progress is not None:
+                progress(total)
+
+        if is_closure_enabled():
+            rebuild_closure()
+        transaction.on_commit(bump_tree_version)
+    return total
+
+
+def generate_menu_rows(
+    first_id: int, names: Iterable[str], one_tree: bool = False
+) -> Iterator[MenuRow]:
+    """
+    Generate a random menu forest.
+
+    Every item gets a random parent among the previous items
+    (or no parent, if one_tree is False).
+
+    :param first_id: Id of the first item, the next items get next ids.
+    :param names: Names of the items.
+    :param one_tree: Create only one tree.
+    :return: Iterator of the menu items rows.
+    """
+    urls: List[str] = list()
+    for index, name in enumerate(names):
+        parent: Optional[int] = None
+        if index > 0:
+            parent = random.randrange(index)
+            if not one_tree and random.random() < 0.5:
+                parent = None
+
+        if parent is None:
+            urls.append(f"{name}/")
+            yield first_id + index, None, name, urls[-1]
+        else:
+            urls.append(f"{urls[parent]}{name}/")
+            yield first_id + index, first_id + parent, name, urls[-1]
+
+
+def iter_menu_rows_topological(chunk_size: int = 10000) -> Iterator[MenuRow]:
+    """
+    Iterate over all menu items, parents before their children.
+
+    The rows are read with a server-side cursor in chunks,
+    so the memory usage doesn't depend on the number of items.
+
+    :param chunk_size: Number of rows fetched at once.
+    :return: Iterator of the menu items rows sorted by depth and id.
+    """
+    query: str = """
+    WITH RECURSIVE tree AS (
+        SELECT id, parent_id, name, url, 0 AS depth
+        FROM menu_menuitem
+        WHERE parent_id IS NULL
+
+        UNION ALL
+
+        SELECT m.id, m.parent_id, m.name, m.url, t.depth + 1
+        FROM menu_menuitem m
+        JOIN tree t ON m.parent_id = t.id
+    )
+
+    SELECT id, parent_id, name, url FROM tree ORDER BY depth, id;
+    """
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(query)
+        while chunk := cursor.fetchmany(chunk_size):
+            yield from chunk
+
+
+def _copy_import_batch(records: List[ImportRecord]) -> None:
+    _copy_batch(records, "menu_import (old_id, old_parent_id, name)")
+
+
+def _insert_import_batch(records: List[ImportRecord]) -> None:
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            """
+            INSERT INTO menu_import (old_id, old_parent_id, name)
+            VALUES (%s, %s, %s);
+            """,
+            records,
+        )
+
+
+def import_menu_records(
+    records: Iterable[ImportRecord],
+    method: str = "copy",
+    batch_size: int = 10000,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Import the menu items with new ids, computing their urls.
+
+    The records are loaded into a temporary table in batches, then
+    the new ids and the urls are computed by SQL level by level,
+    so the memory usage doesn't depend on the number of items
+    and the records may go in any order. All items are inserted
+    in one transaction.
+
+    :param records: Imported items (old id, old parent id, name).
+    :param method: "copy" (COPY FROM STDIN) or "bulk" (batched INSERT)
+        to load the records.
+    :param batch_size: Number of records in one batch.
+    :param progress: Function called with the number of loaded records
+    after every batch.
+    :return: Number of imported items.
+    :raise ValueError: If an id repeats, a parent is missing
+        or the items form a cycle.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method}, use one of {METHODS}")
+    load_batch = (
+        _copy_import_batch if method == "copy" else _insert_import_batch
+    )
+
+    total: int = 0
+    iterator: Iterator[ImportRecord] = iter(records)
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(CREATE_IMPORT_TABLE_QUERY)
+            while batch := list(islice(iterator, batch_size)):
+                load_batch(batch)
+                total += len(batch)
+                if progress is not None:
+                    progress(total)
+            if total:
+                _insert_imported(cursor, total)
+            cursor.execute("DROP TABLE menu_import;")
+    except IntegrityError as exc:
+        raise ValueError(f"Invalid menu items: {exc}")
+    return total
+
+
+def _insert_imported(cursor: CursorWrapper, total: int) -> None:
+    cursor.execute("CREATE INDEX ON menu_import (old_parent_id);")
+    cursor.execute("CREATE INDEX ON menu_import (depth);")
+    cursor.execute("ANALYZE menu_import;")
+    cursor.execute(
+        """
+        UPDATE menu_import AS t
+        SET new_id = %s + n.number - 1
+        FROM (
+            SELECT old_id, row_number() OVER (ORDER BY old_id) AS number
+            FROM menu_import
+        ) AS n
+        WHERE t.old_id = n.old_id;
+        """,
+        (reserve_menu_item_ids(total),),
+    )
+
+    # корни, затем уровень за уровнем
+    cursor.execute("""
+        UPDATE menu_import SET url = name || '/', depth = 0
+        WHERE old_parent_id IS NULL;
+        """)
+    depth: int = 0
+    while cursor.rowcount:
+        depth += 1
+        cursor.execute(IMPORT_LEVEL_QUERY, (depth, depth - 1))
+
+    cursor.execute("""
+        SELECT old_id, old_parent_id FROM menu_import
+        WHERE depth IS NULL
+        LIMIT 1;
+        """)
+    row: Optional[Tuple[int, int]] = cursor.fetchone()
+    if row is not None:
+        raise ValueError(
+            f"Parent {row[1]} of the item {row[0]} is missing "
+            f"or the items form a cycle"
+        )
+
+    cursor.execute("""
+        INSERT INTO menu_menuitem (id, parent_id, name, url)
+        SELECT t.new_id, p.new_id, t.name, t.url
+        FROM menu_import t
+        LEFT JOIN menu_import p ON p.old_id = t.old_parent_id
+        ORDER BY t.depth, t.new_id;
+        """)
+    if is_closure_enabled():
+        rebuild_closure()
+    transaction.on_commit(bump_tree_version)
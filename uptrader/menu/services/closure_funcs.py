@@ -0,0 +1,232 @@
+"""Module with the functions maintaining the menu closure table."""
+
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+
+# Ветка через таблицу замыканий: предки целевых узлов и их дети
+# ({targets} - условие выбора целевых узлов)
+CLOSURE_BRANCH_QUERY: str = """
+WITH targets AS (
+    SELECT id FROM menu_menuitem WHERE {targets}
+),
+parents AS (
+    SELECT DISTINCT m.id, m.parent_id, m.name, m.url
+    FROM targets t
+    JOIN menu_menuitemclosure c ON c.descendant_id = t.id
+    JOIN menu_menuitem m ON m.id = c.ancestor_id
+)
+
+SELECT * FROM parents
+UNION
+SELECT m.id, m.parent_id, m.name, m.url
+FROM menu_menuitem m
+JOIN parents p ON m.parent_id = p.id;
+"""
+
+
+def is_closure_enabled() -> bool:
+    return getattr(settings, "MENU_CLOSURE_TABLE", False)
+
+
+def insert_closure_item(
+    cursor: CursorWrapper, item_id: int, parent_id: Optional[int]
+) -> None:
+    """
+    Add the paths of the new menu item to the closure table.
+
+    :param cursor: Database cursor.
+    :param item_id: Id of the new menu item.
+    :param parent_id: Id of the parent item.
+    """
+    cursor.execute(
+        """
+        INSERT INTO menu_menuitemclosure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, %(item_id)s, depth + 1
+        FROM menu_menuitemclosure
+        WHERE descendant_id = %(parent_id)s
+        UNION ALL
+        SELECT %(item_id)s, %(item_id)s, 0;
+        """,
+        {"item_id": item_id, "parent_id": parent_id},
+    )
+
+
+def detach_closure_subtree(cursor: CursorWrapper, item_id: int) -> None:
+    """
+    Remove the paths from the ancestors of the item to its subtree.
+
+    :param cursor: Database cursor.
+    :param item_id: Id of the root of the subtree.
+    """
+    cursor.execute(
+        """
+        DELETE FROM menu_menuitemclosure c
+        USING menu_menuitemclosure sub, menu_menuitemclosure anc
+        WHERE sub.ancestor_id = %(item_id)s
+            AND c.descendant_id = sub.descendant_id
+            AND anc.descendant_id = %(item_id)s
+            AND anc.depth > 0
+            AND c.ancestor_id = anc.ancestor_id;
+        """,
+        {"item_id": item_id},
+    )
+
+
+def attach_closure_subtree(
+    cursor: CursorWrapper, item_id: int, parent_id: Optional[int]
+) -> None:
+    """
+    Add the paths from the new ancestors of the item to its subtree.
+
+    :param cursor: Database cursor.
+    :param item_id: Id of the root of the detached subtree.
+    :param parent_id: Id of the new parent item.
+    """
+    if parent_id is None:
+        return
+    cursor.execute(
+        """
+        INSERT INTO menu_menuitemclosure (ancestor_id, descendant_id, depth)
+        SELECT p.ancestor_id, sub.descendant_id, p.depth + sub.depth + 1
+        FROM menu_menuitemclosure p
+        CROSS JOIN menu_menuitemclosure sub
+        WHERE p.descendant_id = %(parent_id)s
+            AND sub.ancestor_id = %(item_id)s;
+        """,
+        {"item_id": item_id, "parent_id": parent_id},
+    )
+
+
+def move_closure_subtree(
+    cursor: CursorWrapper, item_id: int, parent_id: Optional[int]
+) -> None:
+    """
+    Update the closure table after the subtree was moved to the new parent.
+
+    :param cursor: Database cursor.
+    :param item_id: Id of the root of the moved subtree.
+    :param parent_id: Id of the new parent item.
+    """
+    detach_closure_subtree(cursor, item_id)
+    attach_closure_subtree(cursor, item_id, parent_id)
+
+
+def move_closure_item(
+    cursor: CursorWrapper, item_id: int, parent_id: Optional[int]
+) -> None:
+    """
+    Update only the paths to the item after it was moved to the new parent.
+
+    The paths to its descendants are updated later by
+    move_closure_descendants (online move, see menu.services.move_funcs).
+
+    :param cursor: Database cursor.
+    :param item_id: Id of the moved item.
+    :param parent_id: Id of the new parent item.
+    """
+    cursor.execute(
+        """
+        DELETE FROM menu_menuitemclosure
+        WHERE descendant_id = %s AND depth > 0;
+        """,
+        (item_id,),
+    )
+    if parent_id is None:
+        return
+    cursor.execute(
+        """
+        INSERT INTO menu_menuitemclosure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, %(item_id)s, depth + 1
+        FROM menu_menuitemclosure
+        WHERE descendant_id = %(parent_id)s;
+        """,
+        {"item_id": item_id, "parent_id": parent_id},
+    )
+
+
+def move_closure_descendants(
+    cursor: CursorWrapper, item_id: int, descendant_ids: List[int]
+) -> None:
+    """
+    Replace the paths from the old ancestors of the moved item
+    to the descendants with the paths from its new ancestors
+    (after move_closure_item).
+
+    :param cursor: Database cursor.
+    :param item_id: Id of the moved item.
+    :param descendant_ids: Ids of the descendants not updated yet.
+    """
+    params: dict = {"item_id": item_id, "ids": descendant_ids}
+    # старые предки - предки вне поддерева узла
+    cursor.execute(
+        """
+        DELETE FROM menu_menuitemclosure c
+        WHERE c.descendant_id = ANY(%(ids)s)
+            AND NOT EXISTS (
+                SELECT 1 FROM menu_menuitemclosure sub
+                WHERE sub.ancestor_id = %(item_id)s
+                    AND sub.descendant_id = c.ancestor_id
+            );
+        """,
+        params,
+    )
+    cursor.execute(
+        """
+        INSERT INTO menu_menuitemclosure (ancestor_id, descendant_id, depth)
+        SELECT p.ancestor_id, sub.descendant_id, p.depth + sub.depth
+        FROM menu_menuitemclosure p
+        JOIN menu_menuitemclosure sub
+            ON sub.ancestor_id = %(item_id)s
+            AND sub.descendant_id = ANY(%(ids)s)
+        WHERE p.descendant_id = %(item_id)s AND p.depth > 0;
+        """,
+        params,
+    )
+
+
+def get_descendant_ids(item_id: int) -> List[int]:
+    """
+    Get ids of the subtree items, including the root.
+
+    :param item_id: Id of the root of the subtree.
+    :return: List of the ids.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT descendant_id FROM menu_menuitemclosure
+            WHERE ancestor_id = %s
+            ORDER BY depth, descendant_id;
+            """,
+            (item_id,),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild_closure() -> int:
+    """
+    Build the closure table from scratch for all menu items.
+
+    :return: Number of the closure table rows.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("TRUNCATE menu_menuitemclosure;")
+        cursor.execute("""
+            WITH RECURSIVE paths AS (
+                SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+                FROM menu_menuitem
+
+                UNION ALL
+
+                SELECT p.ancestor_id, m.id, p.depth + 1
+                FROM paths p
+                JOIN menu_menuitem m ON m.parent_id = p.descendant_id
+            )
+
+            INSERT INTO menu_menuitemclosure (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, descendant_id, depth FROM paths;
+            """)
+        return cursor.rowcount
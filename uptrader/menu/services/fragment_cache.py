@@ -0,0 +1,158 @@
+"""Module with the cache of the rendered menu HTML fragments."""
+
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from menu.services.menu_metrics import phase
+from menu.services.tree_listener import is_tree_notify_enabled
+from menu.services.tree_version import get_tree_version
+
+
+class FragmentCacheStats:
+    """Hit and miss counters of the fragment cache of the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+fragment_cache_stats = FragmentCacheStats()
+
+
+def _get_cache() -> BaseCache:
+    return caches[
+        getattr(settings, "MENU_FRAGMENT_CACHE_ALIAS", "menu_fragments")
+    ]
+
+
+def _get_timeout() -> Optional[int]:
+    # версия дерева из триггера меняется сразу, устаревших фрагментов нет
+    if is_tree_notify_enabled():
+        return None
+    return getattr(settings, "MENU_FRAGMENT_CACHE_TIMEOUT", 300)
+
+
+def fragment_cache_key(
+    version: int,
+    menu_name: str,
+    menu_path: Optional[str],
+    menu_url: str,
+    renderer: str,
+    variant: str = "",
+) -> str:
+    """
+    Build the cache key of the rendered menu.
+
+    Within one tree version the target item is fully defined
+    by the name and the path, so they are used instead of the item itself.
+
+    :param version: Menu tree version.
+    :param menu_name: Name of the target item.
+    :param menu_path: Path of the target item.
+    :param menu_url: Base url of the menu links.
+    :param renderer: Renderer of the menu ("template" or "compiled").
+    :param variant: Other options of the rendering (e.g. the limits).
+    :return: Cache key.
+    """
+    target: str = "\0".join(
+        (menu_name, menu_path or "", menu_url, renderer, variant)
+    )
+    digest: str = hashlib.sha1(target.encode()).hexdigest()
+    return f"menu:html:{version}:{digest}"
+
+
+def get_or_render_fragment(
+    menu_name: str,
+    menu_path: Optional[str],
+    menu_url: str,
+    renderer: str,
+    render: Callable[[], str],
+    variant: str = "",
+) -> str:
+    """
+    Get the rendered menu from the cache or render and cache it.
+
+    A hit doesn't touch the database and the templates.
+
+    :param menu_name: Name of the target item.
+    :param menu_path: Path of the target item.
+    :param menu_url: Base url of the menu links.
+    :param renderer: Renderer of the menu ("template" or "compiled").
+    :param render: Function rendering the menu.
+    :param variant: Other options of the rendering (e.g. the limits).
+    :return: HTML of the menu.
+    """
+    cache: BaseCache = _get_cache()
+    key: str = fragment_cache_key(
+        get_tree_version(), menu_name, menu_path, menu_url, renderer, variant
+    )
+    with phase("cache"):
+        html: Optional[str] = cache.get(key)
+    if html is not None:
+        fragment_cache_stats.hit()
+        return html
+
+    fragment_cache_stats.miss()
+    html = render()
+    with phase("cache"):
+        cache.set(key, html, timeout=_get_timeout())
+    return html
+
+
+def get_fragments(keys: Iterable[str]) -> Dict[str, str]:
+    """
+    Get several rendered menus from the cache at once.
+
+    :param keys: Cache keys (see fragment_cache_key).
+    :return: Dict of the found fragments by the keys.
+    """
+    keys = list(keys)
+    with phase("cache"):
+        fragments: Dict[str, str] = _get_cache().get_many(keys)
+    for key in keys:
+        if key in fragments:
+            fragment_cache_stats.hit()
+        else:
+            fragment_cache_stats.miss()
+    return fragments
+
+
+def set_fragments(fragments: Dict[str, str]) -> None:
+    """
+    Put several rendered menus into the cache at once.
+
+    :param fragments: Dict of the fragments by the cache keys.
+    """
+    if fragments:
+        with phase("cache"):
+            _get_cache().set_many(fragments, timeout=_get_timeout())
+
+
+def get_fragment_cache_stats() -> Dict[str, int]:
+    """
+    Get hit and miss counters of the fragment cache of the process.
+
+    :return: Dict with the counters.
+    """
+    return fragment_cache_stats.as_dict()
@@ -0,0 +1,142 @@
+"""Module with the process-local cache of the menu tree."""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple, Union
+
+from django.conf import settings
+from menu.services.menu_funcs import (
+    MenuForest,
+    MenuItemSchema,
+    load_menu_forest,
+)
+from menu.services.menu_metrics import phase
+from menu.services.menu_snapshot import MenuSnapshot, MenuSnapshotStore
+from menu.services.tree_version import get_tree_version
+
+Forest = Union[MenuForest, MenuSnapshot]
+
+
+def load_forest(version: int) -> MenuForest:
+    return load_menu_forest()
+
+
+class MenuTreeCache:
+    """
+    Cache of the whole menu forest in the process memory.
+
+    The forest is reloaded from the database when the tree version changes.
+    Branches built for the targets are kept in the LRU cache
+    with at most max_branches entries.
+    The loader gets the tree version and returns the forest of this version,
+    by default the forest is loaded from the database.
+    """
+
+    def __init__(
+        self,
+        max_branches: int,
+        loader: Callable[[int], Forest] = load_forest,
+    ):
+        self.max_branches = max_branches
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._forest: Optional[Forest] = None
+        self._branches: "OrderedDict[tuple, List[MenuItemSchema]]" = (
+            OrderedDict()
+        )
+
+    def get_forest(self) -> Forest:
+        """
+        Get the menu forest of the current tree version.
+
+        :return: Menu forest.
+        """
+        version: int = get_tree_version()
+        with self._lock:
+            if self._forest is None or self._version != version:
+                self._forest = self.loader(version)
+                self._version = version
+                self._branches.clear()
+            return self._forest
+
+    def get_branch(self, menu_name: str) -> List[MenuItemSchema]:
+        """
+        Get subtrees that includes an item with name menu_name.
+
+        :param menu_name: Menu item name.
+        :return: List of the roots subtrees.
+        """
+        return self._get_branch(("name", menu_name))
+
+    def get_branch_by_url(self, url: str) -> List[MenuItemSchema]:
+        """
+        Get the subtree that includes the item with the full url.
+
+        :param url: Full url of the menu item, e.g. "a/b/c/".
+        :return: List of the roots subtrees.
+        """
+        return self._get_branch(("url", url))
+
+    def _get_branch(self, key: Tuple[str, str]) -> List[MenuItemSchema]:
+        forest: Forest = self.get_forest()
+        with self._lock:
+            branch: Optional[List[MenuItemSchema]] = self._branches.get(key)
+            if branch is not None:
+                self._branches.move_to_end(key)
+                return branch
+
+        kind, value = key
+        with phase("tree"):
+            branch = (
+                forest.branch(value)
+                if kind == "name"
+                else forest.branch_by_url(value)
+            )
+        with self._lock:
+            # the forest could be reloaded while the branch was being built
+            if self._forest is forest:
+                self._branches[key] = branch
+                while len(self._branches) > self.max_branches:
+                    self._branches.popitem(last=False)
+        return branch
+
+    def clear(self) -> None:
+        """Drop the cached forest and branches."""
+        with self._lock:
+            self._forest = None
+            self._version = None
+            self._branches.clear()
+
+
+def _get_loader() -> Callable[[int], Forest]:
+    path: str = getattr(settings, "MENU_SNAPSHOT_PATH", "")
+    if path:
+        return MenuSnapshotStore(path).get
+    return load_forest
+
+
+menu_tree_cache = MenuTreeCache(
+    max_branches=getattr(settings, "MENU_CACHE_MAX_BRANCHES", 1024),
+    loader=_get_loader(),
+)
+
+
+def get_cached_menu_branch(menu_name: str) -> List[MenuItemSchema]:
+    """
+    Get subtrees that includes an item with name menu_name from the cache.
+
+    :param menu_name: Menu item name.
+    :return: List of the roots subtrees.
+    """
+    return menu_tree_cache.get_branch(menu_name)
+
+
+def get_cached_menu_branch_by_url(url: str) -> List[MenuItemSchema]:
+    """
+    Get the subtree that includes the item with the full url from the cache.
+
+    :param url: Full url of the menu item, e.g. "a/b/c/".
+    :return: List of the roots subtrees.
+    """
+    return menu_tree_cache.get_branch_by_url(url)
@@ -1,9 +1,33 @@
-from typing import Dict, List, Optional
+from array import array
+from bisect import bisect_left, bisect_right
+from sys import intern
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from django.db import connection, transaction
+from menu.services.branch_funcs import get_stored_rows, is_branch_table_enabled
+from menu.services.closure_funcs import (
+    CLOSURE_BRANCH_QUERY,
+    attach_closure_subtree,
+    detach_closure_subtree,
+    is_closure_enabled,
+    move_closure_subtree,
+)
+from menu.services.menu_metrics import add_nodes, phase
+from menu.services.move_funcs import (
+    check_item_not_moving,
+    check_not_moving,
+    lock_move_jobs,
+)
+from menu.services.prepared import execute_prepared
+from menu.services.replicas import pin_primary, read_connection
+from menu.services.tree_version import bump_tree_version
+
+MenuRow = Tuple[int, Optional[int], str, str]
 
 
 class MenuItemSchema:
+    __slots__ = ("id", "parent_id", "name", "url", "children")
+
     def __init__(
         self, *, id: int, parent_id: Optional[int], name: str, url: str
     ):
@@ -14,7 +38,229 @@ class MenuItemSchema:
         self.children: List["MenuItemSchema"] = list()
 
     def __repr__(self) -> str:
-        return f"(id={self.id} parent_id={self.id} name={self.name} url={self.url} children={self.children})"
+        return f"(id={self.id} parent_id={self.parent_id} name={self.name} url={self.url} children={self.children})"
+
+
+class MenuNode:
+    """
+    Menu item of a MenuForest branch.
+
+    Has the same attributes as MenuItemSchema, but keeps only
+    the position of the item and reads the values from the forest arrays.
+    """
+
+    __slots__ = ("_forest", "_index", "children")
+
+    def __init__(self, forest: "MenuForest", index: int):
+        self._forest = forest
+        self._index = index
+        self.children: List["MenuNode"] = list()
+
+    @property
+    def id(self) -> int:
+        return self._forest.ids[self._index]
+
+    @property
+    def parent_id(self) -> Optional[int]:
+        parent: int = self._forest.parents[self._index]
+        return self._forest.ids[parent] if parent >= 0 else None
+
+    @property
+    def name(self) -> str:
+        return self._forest.names[self._index]
+
+    @property
+    def url(self) -> str:
+        return self._forest.urls[self._index]
+
+    def __repr__(self) -> str:
+        return f"(id={self.id} parent_id={self.parent_id} name={self.name} url={self.url} children={self.children})"
+
+
+class MenuForest:
+    """
+    Menu items kept in memory with indexes by id, name and url.
+
+    The forest builds the same branches as get_menu_branch,
+    but without any query to the database.
+
+    The items are stored in parallel arrays sorted by id (the same
+    layout as the menu snapshot): ids, parent indices (-1 for roots),
+    children of the item i are child_index[child_offsets[i]:
+    child_offsets[i + 1]], names (interned) and urls. name_order
+    and url_order are the indices sorted by name and url for lookups.
+    """
+
+    def __init__(self, rows: Iterable[MenuRow]):
+        rows = sorted(rows)
+        count: int = len(rows)
+        positions: Dict[int, int] = {row[0]: i for i, row in enumerate(rows)}
+
+        self.ids = array("q", (row[0] for row in rows))
+        self.parents = array(
+            "q",
+            (
+                positions.get(row[1], -1) if row[1] is not None else -1
+                for row in rows
+            ),
+        )
+        self.names: List[str] = [intern(row[2]) for row in rows]
+        self.urls: List[str] = [row[3] for row in rows]
+        del positions, rows
+
+        # дети сгруппированы по родителю (сортировка подсчётом)
+        self.child_offsets = array("q", bytes(8 * (count + 1)))
+        for parent in self.parents:
+            if parent >= 0:
+                self.child_offsets[parent + 1] += 1
+        for index in range(count):
+            self.child_offsets[index + 1] += self.child_offsets[index]
+        self.child_index = array("q", bytes(8 * self.child_offsets[count]))
+        filled = array("q", self.child_offsets[:count])
+        for index, parent in enumerate(self.parents):
+            if parent >= 0:
+                self.child_index[filled[parent]] = index
+                filled[parent] += 1
+
+        self.name_order = array(
+            "q", sorted(range(count), key=self.names.__getitem__)
+        )
+        self.url_order = array(
+            "q", sorted(range(count), key=self.urls.__getitem__)
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def _search(cls, order: array, values: List[str], value: str) -> List[int]:
+        start: int = bisect_left(order, value, key=values.__getitem__)
+        end: int = bisect_right(order, value, key=values.__getitem__)
+        return list(order[start:end])
+
+    def index_by_id(self, item_id: int) -> Optional[int]:
+        index: int = bisect_left(self.ids, item_id)
+        if index < len(self.ids) and self.ids[index] == item_id:
+            return index
+        return None
+
+    def branch(self, menu_name: str) -> List[MenuNode]:
+        """
+        Get subtrees that includes an item with name menu_name.
+
+        :param menu_name: Menu item name.
+        :return: List of the roots subtrees.
+        """
+        return self._branch(
+            self._search(self.name_order, self.names, menu_name)
+        )
+
+    def branch_by_url(self, url: str) -> List[MenuNode]:
+        """
+        Get the subtree that includes the item with the url.
+
+        If several items have the same url, the one with the least id is used.
+
+        :param url: Full url of the menu item, e.g. "a/b/c/".
+        :return: List of the roots subtrees.
+        """
+        indices: List[int] = self._search(self.url_order, self.urls, url)
+        return self._branch([min(indices)] if indices else [])
+
+    def branch_by_ids(self, target_ids: Iterable[int]) -> List[MenuNode]:
+        """
+        Get subtrees that includes items with ids from target_ids.
+
+        Every ancestor of the target items is expanded,
+        i.e. all its children are included in the subtree.
+
+        :param target_ids: Ids of the target menu items.
+        :return: List of the roots subtrees.
+        """
+        indices: List[Optional[int]] = [
+            self.index_by_id(item_id) for item_id in target_ids
+        ]
+        return self._branch(index for index in indices if index is not None)
+
+    def _branch(self, targets: Iterable[int]) -> List[MenuNode]:
+        parents: Set[int] = set()
+        for index in targets:
+            while index >= 0 and index not in parents:
+                parents.add(index)
+                index = self.parents[index]
+
+        indices: Set[int] = set(parents)
+        for index in parents:
+            indices.update(
+                self.child_index[
+                    self.child_offsets[index] : self.child_offsets[index + 1]
+                ]
+            )
+
+        nodes: Dict[int, MenuNode] = {
+            index: MenuNode(self, index) for index in sorted(indices)
+        }
+        add_nodes(len(nodes))
+        roots: List[MenuNode] = list()
+        for index, node in nodes.items():
+            parent: Optional[MenuNode] = nodes.get(self.parents[index])
+            if parent is not None:
+                parent.children.append(node)
+            else:
+                roots.append(node)
+        return roots
+
+
+def load_menu_rows() -> List[MenuRow]:
+    """
+    Load all menu items sorted by id.
+
+    :return: List of the menu items rows.
+    """
+    with phase("db"), read_connection().cursor() as cursor:
+        cursor.execute(
+            "SELECT id, parent_id, name, url FROM menu_menuitem ORDER BY id;"
+        )
+        return cursor.fetchall()
+
+
+def load_menu_forest() -> MenuForest:
+    """
+    Load all menu items into memory.
+
+    :return: Forest of all menu items.
+    """
+    rows: List[MenuRow] = load_menu_rows()
+    with phase("tree"):
+        return MenuForest(rows)
+
+
+# Предки узла ищутся по префиксам его пути (url), а не рекурсивно:
+# для url "a/b/c/" это узлы с url "a/", "a/b/" и "a/b/c/".
+# Оба поиска идут по индексам (menu_item_url_idx и индекс parent_id).
+# ({targets} - условие выбора целевых узлов)
+BRANCH_QUERY: str = """
+WITH targets AS (
+    SELECT url FROM menu_menuitem WHERE {targets}
+),
+ancestor_urls AS (
+    SELECT DISTINCT left(t.url, pos.n) AS url
+    FROM targets t
+    CROSS JOIN LATERAL generate_series(1, length(t.url)) AS pos(n)
+    WHERE substr(t.url, pos.n, 1) = '/'
+),
+parents AS (
+    SELECT m.id, m.parent_id, m.name, m.url
+    FROM menu_menuitem m
+    JOIN ancestor_urls a ON m.url = a.url
+)
+
+SELECT * FROM parents
+UNION
+SELECT m.id, m.parent_id, m.name, m.url
+FROM menu_menuitem m
+JOIN parents p ON m.parent_id = p.id;
+"""
 
 
 def get_menu_branch(menu_name: str) -> List[MenuItemSchema]:
@@ -25,106 +271,352 @@ def get_menu_branch(menu_name: str) -> List[MenuItemSchema]:
     the roots of the subtrees, which include all the child elements
     of each parent element, starting with the element with name menu_name.
 
+    The ancestors are found by the prefixes of the stored url
+    in one non-recursive query. Different items can have the same url
+    (siblings with the same name), so the ancestor chain is checked
+    by parent_id when the tree is assembled.
+    If the closure table is enabled, the ancestors are taken from it.
+    If the branch table is enabled, the stored branches are used.
+
     :param menu_name: Menu item name.
     :return: List of the roots subtrees.
     """
-    query: str = """
-    WITH RECURSIVE parents AS (
-        SELECT 
-            id,
-            parent_id,
-            name,
-            url
-        FROM menu_menuitem
-        WHERE name = %s
-        
-        UNION
-        
-        SELECT
-            m.id,
-            m.parent_id,
-            m.name,
-            m.url
-        FROM menu_menuitem m
-        JOIN parents p ON m.id = p.parent_id
-    ),
-    children AS (
-        SELECT
-            m.id,
-            m.parent_id,
-            m.name,
-            m.url
-        FROM menu_menuitem m
-        JOIN parents p ON m.parent_id = p.id
-    )
-    
-    SELECT * FROM parents
-    UNION
-    SELECT * FROM children;
+    rows: List[MenuRow] = _fetch_branch_rows("name = %s", (menu_name,))
+    with phase("tree"):
+        return MenuForest(rows).branch(menu_name)
+
+
+def get_menu_branch_by_url(url: str) -> List[MenuItemSchema]:
     """
-    with connection.cursor() as cursor:
-        cursor.execute(query, (menu_name,))
-        nodes: Dict[int, MenuItemSchema] = dict()
-        roots: List[MenuItemSchema] = list()
-
-        for item in cursor.fetchall():
-            menu_item = MenuItemSchema(
-                id=item[0],
-                parent_id=item[1],
-                name=item[2],
-                url=item[3],
-            )
+    Get the subtree that includes the item with the full url.
 
-            nodes[menu_item.id] = menu_item
+    Unlike get_menu_branch, exactly one item is the target.
+    If several items have the same url, the one with the least id is used.
 
-        for item in nodes.values():
-            if item.parent_id is not None:
-                nodes[item.parent_id].children.append(item)
-            else:
-                roots.append(nodes[item.id])
+    :param url: Full url of the menu item, e.g. "a/b/c/".
+    :return: List of the roots subtrees, empty if there is no such item.
+    """
+    rows: List[MenuRow] = _fetch_branch_rows(
+        "url = %s ORDER BY id LIMIT 1", (url,)
+    )
+    with phase("tree"):
+        return MenuForest(rows).branch_by_url(url)
 
-        return roots
 
+def load_menu_branches(
+    menu_names: Iterable[str], urls: Iterable[str]
+) -> MenuForest:
+    """
+    Load the branches of several targets in one query.
 
-def update_parent(
-    menu_item_id: int, new_parent_id: Optional[int] = None
-) -> None:
-    query: str = """
-    WITH RECURSIVE
-    new_parent AS (
-        SELECT * FROM menu_menuitem WHERE id = %s
-    ),
-    children AS (
-        SELECT 
-            m.id,
-            m.parent_id,
-            m.name,
-            m.url,
-            np.id AS new_parent_id,
-            CONCAT(COALESCE(np.url, ''), m.name, '/') AS new_url
-        FROM menu_menuitem m
-        CROSS JOIN new_parent AS np
-        WHERE m.id = %s
-    
-        UNION ALL
-    
-        SELECT
-            m.id,
-            m.parent_id,
-            m.name,
-            m.url,
-            m.parent_id AS new_parent_id,
-            CONCAT(c.new_url, m.name, '/') AS new_url
-        FROM menu_menuitem m
-        JOIN children c ON m.parent_id = c.id
+    The result contains the branches of all items with the given names
+    and urls, the common ancestors are loaded once. Take the branches
+    from it with MenuForest.branch and MenuForest.branch_by_url.
+
+    :param menu_names: Names of the target items.
+    :param urls: Full urls of the target items.
+    :return: Forest with the branches of all targets.
+    """
+    rows: List[MenuRow] = _fetch_branch_rows(
+        "name = ANY(%s) OR url = ANY(%s)", (list(menu_names), list(urls))
     )
+    with phase("tree"):
+        return MenuForest(rows)
+
+
+def path_to_url(path: str) -> str:
+    """
+    Convert the request path of the menu item to its url.
+
+    :param path: Path of the menu item, e.g. "a/b/c".
+    :return: Url of the menu item, e.g. "a/b/c/".
+    """
+    return f"{path.strip('/')}/"
+
+
+def _branch_query(targets: str) -> str:
+    query: str = CLOSURE_BRANCH_QUERY if is_closure_enabled() else BRANCH_QUERY
+    return query.format(targets=targets)
+
+
+def _fetch_branch_rows(targets: str, params: tuple) -> List[MenuRow]:
+    if is_branch_table_enabled():
+        return get_stored_rows(targets, params)
+    with phase("db"), read_connection().cursor() as cursor:
+        execute_prepared(cursor, _branch_query(targets), params)
+        return cursor.fetchall()
+
+
+# Перенос узла: новые url всего поддерева и новый родитель одним запросом
+# (параметры: id нового родителя, id узла, id узла)
+UPDATE_PARENT_QUERY: str = """
+WITH RECURSIVE
+new_parent AS (
+    SELECT * FROM menu_menuitem WHERE id = %s
+),
+children AS (
+    SELECT
+        m.id,
+        m.parent_id,
+        m.name,
+        m.url,
+        np.id AS new_parent_id,
+        CONCAT(COALESCE(np.url, ''), m.name, '/') AS new_url
+    FROM menu_menuitem m
+    LEFT JOIN new_parent AS np ON TRUE
+    WHERE m.id = %s
+
+    UNION ALL
 
+    SELECT
+        m.id,
+        m.parent_id,
+        m.name,
+        m.url,
+        m.parent_id AS new_parent_id,
+        CONCAT(c.new_url, m.name, '/') AS new_url
+    FROM menu_menuitem m
+    JOIN children c ON m.parent_id = c.id
+),
+updated AS (
     UPDATE menu_menuitem AS menu
     SET
         url = ch.new_url,
         parent_id = ch.new_parent_id
     FROM (SELECT * FROM children FOR UPDATE) AS ch
-    WHERE menu.id = ch.id;
+    WHERE menu.id = ch.id
+    RETURNING menu.id, menu.url
+)
+
+SELECT url FROM updated WHERE id = %s;
+"""
+
+
+def update_parent(
+    menu_item_id: int, new_parent_id: Optional[int] = None
+) -> Optional[str]:
+    """
+    Move the menu item to the new parent and update urls of its subtree.
+
+    :param menu_item_id: Menu item id.
+    :param new_parent_id: New parent id, None - move to the root.
+    :return: New url of the menu item, None if there is no such item.
+    :raise ValueError: If the subtree is being moved online
+        (see menu.services.move_funcs).
+    """
+    pin_primary()
+    with transaction.atomic(), connection.cursor() as cursor:
+        lock_move_jobs(cursor)
+        check_item_not_moving(cursor, menu_item_id, new_parent_id)
+        execute_prepared(
+            cursor,
+            UPDATE_PARENT_QUERY,
+            (new_parent_id, menu_item_id, menu_item_id),
+        )
+        row: Optional[Tuple[str]] = cursor.fetchone()
+        if is_closure_enabled():
+            move_closure_subtree(cursor, menu_item_id, new_parent_id)
+        transaction.on_commit(bump_tree_version)
+    return row[0] if row is not None else None
+
+
+def move_items(moves: Iterable[Tuple[int, Optional[int]]]) -> None:
+    """
+    Move many menu items to new parents in one transaction.
+
+    The whole batch is validated first (the items and the parents exist,
+    no item becomes its own ancestor). Then parent_id and url are
+    recomputed for the union of the moved subtrees by one statement,
+    so every row is updated exactly once.
+
+    :param moves: Pairs (menu item id, new parent id or None).
+    :raise ValueError: If the batch is invalid or a subtree is being moved
+        online (see menu.services.move_funcs).
+    """
+    new_parents: Dict[int, Optional[int]] = dict()
+    for item_id, new_parent_id in moves:
+        if new_parents.setdefault(item_id, new_parent_id) != new_parent_id:
+            raise ValueError(f"Item {item_id} is moved twice")
+    if not new_parents:
+        return
+
+    pin_primary()
+    with transaction.atomic(), connection.cursor() as cursor:
+        lock_move_jobs(cursor)
+        cursor.execute(
+            """
+            SELECT id, parent_id, name, url FROM menu_menuitem
+            WHERE id = ANY(%s)
+            ORDER BY id
+            FOR UPDATE;
+            """,
+            (list(new_parents),),
+        )
+        nodes: Dict[int, MenuRow] = {row[0]: row for row in cursor.fetchall()}
+        missing: Set[int] = set(new_parents) - set(nodes)
+        if missing:
+            raise ValueError(f"Items {sorted(missing)} do not exist")
+
+        # цепочки предков новых родителей
+        cursor.execute(
+            """
+            WITH RECURSIVE chain AS (
+                SELECT id, parent_id, name, url FROM menu_menuitem
+                WHERE id = ANY(%s)
+
+                UNION
+
+                SELECT m.id, m.parent_id, m.name, m.url
+                FROM menu_menuitem m
+                JOIN chain c ON m.id = c.parent_id
+            )
+
+            SELECT * FROM chain;
+            """,
+            (
+                [
+                    parent_id
+                    for parent_id in new_parents.values()
+                    if parent_id is not None
+                ],
+            ),
+        )
+        for row in cursor.fetchall():
+            nodes.setdefault(row[0], row)
+        missing = {
+            parent_id
+            for parent_id in new_parents.values()
+            if parent_id is not None and parent_id not in nodes
+        }
+        if missing:
+            raise ValueError(f"Parents {sorted(missing)} do not exist")
+
+        # путь от каждого перемещаемого узла до корня после перемещения
+        paths: Dict[int, List[int]] = dict()
+        for item_id in new_parents:
+            path: List[int] = [item_id]
+            parent_id: Optional[int] = new_parents[item_id]
+            while parent_id is not None:
+                if parent_id in path:
+                    raise ValueError(f"Moving item {item_id} creates a cycle")
+                path.append(parent_id)
+                parent_id = new_parents.get(parent_id, nodes[parent_id][1])
+            paths[item_id] = path
+
+        ids: List[int] = list(new_parents)
+        new_urls: List[str] = [
+            "".join(
+                f"{nodes[node_id][2]}/" for node_id in reversed(paths[item_id])
+            )
+            for item_id in ids
+        ]
+        check_not_moving(
+            cursor, [nodes[item_id][3] for item_id in ids] + new_urls
+        )
+        cursor.execute(
+            """
+            WITH RECURSIVE moves AS (
+                SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::text[])
+                    AS mv(id, new_parent_id, new_url)
+            ),
+            tree AS (
+                SELECT id, new_parent_id AS parent_id, new_url AS url
+                FROM moves
+
+                UNION ALL
+
+                SELECT m.id, m.parent_id, CONCAT(t.url, m.name, '/')
+                FROM tree t
+                JOIN menu_menuitem m ON m.parent_id = t.id
+                WHERE NOT EXISTS (SELECT 1 FROM moves mv WHERE mv.id = m.id)
+            )
+
+            UPDATE menu_menuitem AS menu
+            SET
+                url = t.url,
+                parent_id = t.parent_id
+            FROM tree t
+            WHERE menu.id = t.id;
+            """,
+            (ids, [new_parents[item_id] for item_id in ids], new_urls),
+        )
+
+        if is_closure_enabled():
+            for item_id in ids:
+                detach_closure_subtree(cursor, item_id)
+            # сначала узлы, которые окажутся ближе к корню
+            for item_id in sorted(ids, key=lambda key: len(paths[key])):
+                attach_closure_subtree(cursor, item_id, new_parents[item_id])
+        transaction.on_commit(bump_tree_version)
+
+
+# Поддеревья узлов (параметр: массив id корней поддеревьев)
+SUBTREES_CTE: str = """
+WITH RECURSIVE subtree AS (
+    SELECT id FROM menu_menuitem WHERE id = ANY(%s)
+
+    UNION
+
+    SELECT m.id
+    FROM menu_menuitem m
+    JOIN subtree s ON m.parent_id = s.id
+)
+"""
+
+# Удаление поддеревьев одним запросом вместе со строками таблицы замыканий
+# и сохранёнными ветками (их внешние ключи без ON DELETE CASCADE)
+DELETE_SUBTREES_QUERY: str = SUBTREES_CTE + """,
+closure AS (
+    DELETE FROM menu_menuitemclosure
+    WHERE descendant_id IN (SELECT id FROM subtree)
+),
+branches AS (
+    DELETE FROM menu_menuitembranch
+    WHERE item_id IN (SELECT id FROM subtree)
+)
+
+DELETE FROM menu_menuitem WHERE id IN (SELECT id FROM subtree);
+"""
+
+
+def count_subtrees(item_ids: Iterable[int]) -> int:
+    """
+    Count the items of the subtrees.
+
+    :param item_ids: Ids of the roots of the subtrees.
+    :return: Number of the items, including the roots.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SUBTREES_CTE + "SELECT count(*) FROM subtree;", (list(item_ids),)
+        )
+        return cursor.fetchone()[0]
+
+
+def delete_subtrees(item_ids: Iterable[int]) -> int:
+    """
+    Delete the menu items with their subtrees by one statement.
+
+    Unlike the cascade of Django, the descendants are not loaded,
+    and the post_delete signals are not sent.
+
+    :param item_ids: Ids of the roots of the subtrees.
+    :return: Number of the deleted items.
+    :raise ValueError: If a subtree is being moved online or contains
+        a subtree being moved (see menu.services.move_funcs).
     """
+    ids: List[int] = list(item_ids)
+    if not ids:
+        return 0
+    pin_primary()
     with transaction.atomic(), connection.cursor() as cursor:
-        cursor.execute(query, (new_parent_id, menu_item_id))
+        lock_move_jobs(cursor)
+        cursor.execute(
+            "SELECT url FROM menu_menuitem WHERE id = ANY(%s);", (ids,)
+        )
+        check_not_moving(cursor, [row[0] for row in cursor.fetchall()])
+        cursor.execute(DELETE_SUBTREES_QUERY, (ids,))
+        count: int = cursor.rowcount
+        if count:
+            transaction.on_commit(bump_tree_version)
+    return count
@@ -0,0 +1,303 @@
+"""
+Module with the depth- and width-limited menu branches.
+
+The draw_menu tag can limit the depth of the menu (max_depth, the roots
+are on the level 1) and the number of the shown children of every
+expanded item (max_siblings). The children on the way to the target
+are always shown. The items with the hidden children are marked
+with more, their children are loaded on demand from the children
+endpoint (menu.views.menu_children), starting after more_after.
+"""
+
+from typing import AbstractSet, Callable, Iterable, List, Optional, Set, Tuple
+
+from menu.services.menu_funcs import MenuForest, MenuItemSchema, MenuRow
+from menu.services.menu_metrics import phase
+from menu.services.replicas import read_connection
+
+# Ограничение "без ограничения"
+UNLIMITED: int = 2**31 - 1
+
+# Как BRANCH_QUERY, но дети каждого предка выбираются с LIMIT,
+# так что лишние узлы не читаются. Предки глубже max_depth не выбираются.
+# Предки ищутся по parent_id, а не по префиксам url: у соседей может быть
+# одинаковый url, и такой сосед не должен раскрываться.
+# Столбцы: id, parent_id, name, url, предок ли узел, есть ли скрытые дети.
+# ({targets} - условие выбора целевых узлов,
+# параметры после условия: max_depth, max_siblings)
+LIMITED_BRANCH_QUERY: str = """
+WITH RECURSIVE targets AS (
+    SELECT id, parent_id, name, url FROM menu_menuitem WHERE {targets}
+),
+limits AS (
+    SELECT %s::bigint AS max_depth, %s::bigint AS max_siblings
+),
+ancestors AS (
+    SELECT * FROM targets
+
+    UNION
+
+    SELECT m.id, m.parent_id, m.name, m.url
+    FROM menu_menuitem m
+    JOIN ancestors a ON m.id = a.parent_id
+),
+parents AS (
+    SELECT
+        a.id,
+        a.parent_id,
+        a.name,
+        a.url,
+        length(a.url) - length(replace(a.url, '/', '')) AS depth
+    FROM ancestors a
+    CROSS JOIN limits l
+    WHERE length(a.url) - length(replace(a.url, '/', '')) <= l.max_depth
+),
+children AS (
+    SELECT c.*, p.depth AS parent_depth
+    FROM parents p
+    CROSS JOIN limits l
+    CROSS JOIN LATERAL (
+        SELECT
+            m.id,
+            m.parent_id,
+            m.name,
+            m.url,
+            row_number() OVER (ORDER BY m.id) AS position
+        FROM menu_menuitem m
+        WHERE m.parent_id = p.id
+        ORDER BY m.id
+        LIMIT CASE
+            WHEN p.depth < l.max_depth THEN l.max_siblings + 1
+            ELSE 1
+        END
+    ) c
+)
+
+SELECT
+    p.id,
+    p.parent_id,
+    p.name,
+    p.url,
+    TRUE,
+    EXISTS (
+        SELECT 1 FROM children c, limits l
+        WHERE c.parent_id = p.id
+            AND (p.depth >= l.max_depth OR c.position > l.max_siblings)
+    )
+FROM parents p
+UNION ALL
+SELECT c.id, c.parent_id, c.name, c.url, FALSE, FALSE
+FROM children c
+CROSS JOIN limits l
+WHERE c.parent_depth < l.max_depth
+    AND c.position <= l.max_siblings
+    AND c.id NOT IN (SELECT id FROM parents);
+"""
+
+
+class LimitedMenuItem(MenuItemSchema):
+    """
+    Menu item of a limited branch.
+
+    more is True if some children of the item are not in the branch,
+    more_after is the id of the last child shown before them
+    (None - the children are not shown at all).
+    """
+
+    __slots__ = ("more", "more_after")
+
+    def __init__(
+        self, *, id: int, parent_id: Optional[int], name: str, url: str
+    ):
+        super().__init__(id=id, parent_id=parent_id, name=name, url=url)
+        self.more: bool = False
+        self.more_after: Optional[int] = None
+
+
+def is_limited(max_depth: Optional[int], max_siblings: Optional[int]) -> bool:
+    return max_depth is not None or max_siblings is not None
+
+
+def limit_branch(
+    roots: List[MenuItemSchema],
+    max_depth: Optional[int],
+    max_siblings: Optional[int],
+    keep: Callable[[MenuItemSchema], bool],
+    hidden: AbstractSet[int] = frozenset(),
+) -> List[LimitedMenuItem]:
+    """
+    Cut the menu branch to the limits.
+
+    :param roots: Roots of the menu subtrees.
+    :param max_depth: Max level of the shown items, None - unlimited.
+    :param max_siblings: Max number of the shown children of an item
+        (not counting the kept ones), None - unlimited.
+    :param keep: Whether the child must be shown over the max_siblings
+        limit (the items on the way to the target).
+    :param hidden: Ids of the items whose children were cut before
+        (see get_limited_menu_branch).
+    :return: Roots of the limited subtrees.
+    """
+    max_depth = UNLIMITED if max_depth is None else max_depth
+    max_siblings = UNLIMITED if max_siblings is None else max_siblings
+
+    def copy(node: MenuItemSchema, depth: int) -> LimitedMenuItem:
+        item = LimitedMenuItem(
+            id=node.id, parent_id=node.parent_id, name=node.name, url=node.url
+        )
+        children: List[MenuItemSchema] = node.children
+        if depth >= max_depth:
+            item.more = bool(children) or node.id in hidden
+            return item
+
+        if len(children) > max_siblings or node.id in hidden:
+            item.more = True
+            if len(children) >= max_siblings:
+                item.more_after = children[max_siblings - 1].id
+        item.children = [
+            copy(child, depth + 1)
+            for position, child in enumerate(children)
+            if position < max_siblings or keep(child)
+        ]
+        return item
+
+    return [copy(root, 1) for root in roots]
+
+
+def _get_limited_branch(
+    targets: str,
+    params: tuple,
+    max_depth: Optional[int],
+    max_siblings: Optional[int],
+) -> List[LimitedMenuItem]:
+    with phase("db"), read_connection().cursor() as cursor:
+        cursor.execute(
+            LIMITED_BRANCH_QUERY.format(targets=targets),
+            (
+                *params,
+                UNLIMITED if max_depth is None else max_depth,
+                UNLIMITED if max_siblings is None else max_siblings,
+            ),
+        )
+        result: List[Tuple[int, Optional[int], str, str, bool, bool]] = (
+            cursor.fetchall()
+        )
+
+    rows: List[MenuRow] = [row[:4] for row in result]
+    parent_ids: Set[int] = {row[0] for row in result if row[4]}
+    hidden: Set[int] = {row[0] for row in result if row[5]}
+    with phase("tree"):
+        return limit_branch(
+            MenuForest(rows).branch_by_ids(parent_ids),
+            max_depth,
+            max_siblings,
+            keep=lambda node: node.id in parent_ids,
+            hidden=hidden,
+        )
+
+
+def get_limited_menu_branch(
+    menu_name: str,
+    max_depth: Optional[int] = None,
+    max_siblings: Optional[int] = None,
+) -> List[LimitedMenuItem]:
+    """
+    Get the limited subtrees that includes an item with name menu_name.
+
+    Unlike limit_branch(get_menu_branch(...)), the cut items
+    are not read from the database.
+
+    :param menu_name: Menu item name.
+    :param max_depth: Max level of the shown items, None - unlimited.
+    :param max_siblings: Max number of the shown children, None - unlimited.
+    :return: List of the roots subtrees.
+    """
+    return _get_limited_branch(
+        "name = %s", (menu_name,), max_depth, max_siblings
+    )
+
+
+def get_limited_menu_branch_by_url(
+    url: str,
+    max_depth: Optional[int] = None,
+    max_siblings: Optional[int] = None,
+) -> List[LimitedMenuItem]:
+    """
+    Get the limited subtree that includes the item with the full url.
+
+    :param url: Full url of the menu item, e.g. "a/b/c/".
+    :param max_depth: Max level of the shown items, None - unlimited.
+    :param max_siblings: Max number of the shown children, None - unlimited.
+    :return: List of the roots subtrees, empty if there is no such item.
+    """
+    return _get_limited_branch(
+        "url = %s ORDER BY id LIMIT 1", (url,), max_depth, max_siblings
+    )
+
+
+def get_menu_children(
+    item_id: int, after: int = 0, limit: int = 100
+) -> Optional[Tuple[List[Tuple[int, str, str, bool]], bool]]:
+    """
+    Get a page of the children of the menu item.
+
+    :param item_id: Menu item id.
+    :param after: Return the children with greater ids.
+    :param limit: Max number of the children.
+    :return: Children (id, name, url, whether it has children) sorted
+        by id and whether there are more of them, None if there is
+        no such item.
+    """
+    with read_connection().cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT
+                c.id,
+                c.name,
+                c.url,
+                EXISTS (SELECT 1 FROM menu_menuitem g WHERE g.parent_id = c.id)
+            FROM menu_menuitem c
+            WHERE c.parent_id = %s AND c.id > %s
+            ORDER BY c.id
+            LIMIT %s;
+            """,
+            (item_id, after, limit + 1),
+        )
+        children: List[Tuple[int, str, str, bool]] = cursor.fetchall()
+        if not children:
+            cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM menu_menuitem WHERE id = %s);",
+                (item_id,),
+            )
+            if not cursor.fetchone()[0]:
+                return None
+    return children[:limit], len(children) > limit
+
+
+def limit_full_branch(
+    roots: Iterable[MenuItemSchema],
+    menu_name: str,
+    target_url: Optional[str],
+    max_depth: Optional[int],
+    max_siblings: Optional[int],
+) -> List[LimitedMenuItem]:
+    """
+    Cut the full menu branch (e.g. from the menu cache) to the limits.
+
+    :param roots: Roots of the menu subtrees.
+    :param menu_name: Name of the target item.
+    :param target_url: Url of the target item, if it was resolved by url.
+    :param max_depth: Max level of the shown items, None - unlimited.
+    :param max_siblings: Max number of the shown children, None - unlimited.
+    :return: Roots of the limited subtrees.
+    """
+
+    def keep(node: MenuItemSchema) -> bool:
+        # в полной ветке развёрнуты только предки цели
+        if node.children:
+            return True
+        if target_url:
+            return node.url == target_url
+        return node.name == menu_name
+
+    return limit_branch(list(roots), max_depth, max_siblings, keep=keep)
@@ -0,0 +1,224 @@
+"""
+Module with the request-scoped menu loader.
+
+The draw_menu tags of a page only register their targets in the loader
+and put placeholders into the page. When the page is rendered, the loader
+resolves all targets at once and the placeholders are replaced
+by the menus (see menu.middleware.MenuLoaderMiddleware).
+"""
+
+import secrets
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from menu.services.async_menu_funcs import aload_menu_branches
+from menu.services.fragment_cache import (
+    fragment_cache_key,
+    get_fragments,
+    set_fragments,
+)
+from menu.services.menu_cache import Forest, menu_tree_cache
+from menu.services.menu_funcs import (
+    MenuForest,
+    load_menu_branches,
+    path_to_url,
+)
+from menu.services.tree_version import (
+    get_tree_version,
+    is_fragment_cache_enabled,
+    is_tree_cache_enabled,
+)
+
+
+class DeferredMenu(NamedTuple):
+    placeholder: str
+    menu_name: str
+    menu_path: Optional[str]
+    renderer: str
+    # рендер меню по лесу с ветками (None - брать ветку из кэша процесса)
+    render: Callable[[Optional[Forest]], str]
+
+
+class MenuLoader:
+    """Collects the menus drawn during one request and renders them together."""
+
+    def __init__(self):
+        self._token: str = secrets.token_hex(8)
+        self._menus: List[DeferredMenu] = list()
+
+    def __len__(self) -> int:
+        return len(self._menus)
+
+    def defer(
+        self,
+        menu_name: str,
+        menu_path: Optional[str],
+        renderer: str,
+        render: Callable[[Optional[Forest]], str],
+    ) -> str:
+        """
+        Register the menu to render it later.
+
+        :param menu_name: Name of the target item.
+        :param menu_path: Path of the target item.
+        :param renderer: Renderer of the menu ("template" or "compiled").
+        :param render: Function rendering the menu from the given forest.
+        :return: Placeholder to put into the page instead of the menu.
+        """
+        placeholder: str = f"<!--draw_menu:{self._token}:{len(self._menus)}-->"
+        self._menus.append(
+            DeferredMenu(placeholder, menu_name, menu_path, renderer, render)
+        )
+        return placeholder
+
+    @classmethod
+    def _targets(
+        cls, menus: List[DeferredMenu]
+    ) -> Tuple[List[str], List[str]]:
+        names: List[str] = list({menu.menu_name for menu in menus})
+        urls: List[str] = list(
+            {path_to_url(menu.menu_path) for menu in menus if menu.menu_path}
+        )
+        return names, urls
+
+    def load(self, menus: List[DeferredMenu]) -> Optional[MenuForest]:
+        """
+        Load the branches of the menus in one query.
+
+        If the process menu cache is enabled, the branches are taken
+        from it and nothing is loaded.
+
+        :param menus: Menus to load.
+        :return: Forest with the branches of all menus or None.
+        """
+        if is_tree_cache_enabled():
+            return None
+        return load_menu_branches(*self._targets(menus))
+
+    async def aload(self, menus: List[DeferredMenu]) -> Forest:
+        """
+        Async variant of load, doesn't access the database
+        in the event loop thread.
+
+        :param menus: Menus to load.
+        :return: Forest with the branches of all menus.
+        """
+        if is_tree_cache_enabled():
+            return await sync_to_async(menu_tree_cache.get_forest)()
+        return await aload_menu_branches(*self._targets(menus))
+
+    def _get_cached(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        # фрагменты из кэша и ключи кэша по плейсхолдерам
+        fragments: Dict[str, str] = dict()
+        keys: Dict[str, str] = dict()
+        if not is_fragment_cache_enabled():
+            return fragments, keys
+
+        version: int = get_tree_version()
+        keys = {
+            menu.placeholder: fragment_cache_key(
+                version,
+                menu.menu_name,
+                menu.menu_path,
+                settings.MENU_URL,
+                menu.renderer,
+            )
+            for menu in self._menus
+        }
+        cached: Dict[str, str] = get_fragments(set(keys.values()))
+        for placeholder, key in keys.items():
+            if key in cached:
+                fragments[placeholder] = cached[key]
+        return fragments, keys
+
+    def _get_missing(self, fragments: Dict[str, str]) -> List[DeferredMenu]:
+        return [
+            menu for menu in self._menus if menu.placeholder not in fragments
+        ]
+
+    @classmethod
+    def _render_missing(
+        cls,
+        missing: List[DeferredMenu],
+        forest: Optional[Forest],
+        fragments: Dict[str, str],
+        keys: Dict[str, str],
+    ) -> Dict[str, str]:
+        rendered: Dict[str, str] = dict()
+        for menu in missing:
+            key: Optional[str] = keys.get(menu.placeholder)
+            if key not in rendered:
+                html: str = menu.render(forest)
+                if key is None:
+                    fragments[menu.placeholder] = html
+                    continue
+                rendered[key] = html
+            fragments[menu.placeholder] = rendered[key]
+        set_fragments(rendered)
+        return fragments
+
+    def render(self) -> Dict[str, str]:
+        """
+        Render all registered menus.
+
+        The cached menus are fetched from the fragment cache at once,
+        the others are rendered from one loaded forest.
+
+        :return: Dict of the menus HTML by the placeholders.
+        """
+        fragments, keys = self._get_cached()
+        missing: List[DeferredMenu] = self._get_missing(fragments)
+        if not missing:
+            return fragments
+        return self._render_missing(
+            missing, self.load(missing), fragments, keys
+        )
+
+    async def arender(self) -> Dict[str, str]:
+        """
+        Async variant of render.
+
+        The fragment cache is accessed and the menus are rendered
+        in a thread, so the event loop isn't blocked by them.
+
+        :return: Dict of the menus HTML by the placeholders.
+        """
+        fragments, keys = await sync_to_async(self._get_cached)()
+        missing: List[DeferredMenu] = self._get_missing(fragments)
+        if not missing:
+            return fragments
+        forest: Forest = await self.aload(missing)
+        return await sync_to_async(self._render_missing)(
+            missing, forest, fragments, keys
+        )
+
+    @classmethod
+    def _replace(
+        cls, content: bytes, charset: str, fragments: Dict[str, str]
+    ) -> bytes:
+        for placeholder, html in fragments.items():
+            content = content.replace(
+                placeholder.encode(charset), html.encode(charset)
+            )
+        return content
+
+    def replace(self, content: bytes, charset: str) -> bytes:
+        """
+        Replace the placeholders in the page by the rendered menus.
+
+        :param content: Page content.
+        :param charset: Page encoding.
+        :return: Page content with the menus.
+        """
+        return self._replace(content, charset, self.render())
+
+    async def areplace(self, content: bytes, charset: str) -> bytes:
+        """
+        Async variant of replace.
+
+        :param content: Page content.
+        :param charset: Page encoding.
+        :return: Page content with the menus.
+        """
+        return self._replace(content, charset, await self.arender())
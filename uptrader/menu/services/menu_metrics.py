@@ -0,0 +1,188 @@
+"""
+Module with the per-request menu performance metrics.
+
+The menu code marks its phases ("db" - branch queries, "tree" - building
+the forest and the branches, "render" - rendering, "cache" - fragment
+cache lookups) with the phase context manager. The metrics are collected
+only inside collect_metrics (see menu.middleware.MenuMetricsMiddleware),
+otherwise the hooks do nothing.
+"""
+
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Dict, Iterator, List, Optional
+
+from django.db import connections
+
+
+class PhaseMetrics:
+    __slots__ = ("calls", "seconds", "queries", "rows", "nodes")
+
+    def __init__(self):
+        self.calls: int = 0
+        self.seconds: float = 0.0
+        self.queries: int = 0
+        self.rows: int = 0
+        self.nodes: int = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "ms": round(self.seconds * 1000, 3),
+            "queries": self.queries,
+            "rows": self.rows,
+            "nodes": self.nodes,
+        }
+
+
+class MenuMetrics:
+    """Metrics of the menu phases of one request."""
+
+    def __init__(self):
+        self.started: float = time.perf_counter()
+        self.phases: Dict[str, PhaseMetrics] = dict()
+        self.active: Optional[PhaseMetrics] = None
+        # все запросы к базе за время сбора, не только в фазах меню
+        self.queries: int = 0
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def get(self, name: str) -> PhaseMetrics:
+        phase_metrics: Optional[PhaseMetrics] = self.phases.get(name)
+        if phase_metrics is None:
+            phase_metrics = self.phases[name] = PhaseMetrics()
+        return phase_metrics
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "total_ms": round(self.total_ms, 3),
+            "queries": self.queries,
+            "phases": {
+                name: phase_metrics.as_dict()
+                for name, phase_metrics in self.phases.items()
+            },
+        }
+
+    def server_timing(self) -> str:
+        """
+        Build the value of the Server-Timing header.
+
+        :return: Header value, e.g. 'db;dur=1.2;desc="1 queries, 7 rows"'.
+        """
+        metrics: List[str] = list()
+        for name, phase_metrics in self.phases.items():
+            description: str = f"{phase_metrics.calls} calls"
+            if phase_metrics.queries:
+                description = (
+                    f"{phase_metrics.queries} queries,"
+                    f" {phase_metrics.rows} rows"
+                )
+            elif phase_metrics.nodes:
+                description = f"{phase_metrics.nodes} nodes"
+            metrics.append(
+                f"menu-{name};dur={phase_metrics.seconds * 1000:.3f};"
+                f'desc="{description}"'
+            )
+        metrics.append(f"menu-total;dur={self.total_ms:.3f}")
+        return ", ".join(metrics)
+
+
+_current: ContextVar[Optional[MenuMetrics]] = ContextVar(
+    "menu_metrics", default=None
+)
+
+
+def get_metrics() -> Optional[MenuMetrics]:
+    """
+    Get the metrics being collected in the current context.
+
+    :return: Metrics or None if they are not collected.
+    """
+    return _current.get()
+
+
+def _count_query(metrics: MenuMetrics, execute, sql, params, many, context):
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        if metrics.active is not None:
+            metrics.active.queries += 1
+            rowcount: int = context["cursor"].rowcount
+            if rowcount > 0:
+                metrics.active.rows += rowcount
+
+
+@contextmanager
+def collect_metrics() -> Iterator[MenuMetrics]:
+    """
+    Collect the menu metrics in the block.
+
+    :return: Metrics filled by the phases of the block.
+    """
+    metrics = MenuMetrics()
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(partial(_count_query, metrics))
+                )
+            yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Mark the menu phase, the time and the queries of the block
+    are added to it (the time of a nested phase is counted in both).
+
+    :param name: Phase name.
+    """
+    metrics: Optional[MenuMetrics] = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    phase_metrics: PhaseMetrics = metrics.get(name)
+    previous: Optional[PhaseMetrics] = metrics.active
+    metrics.active = phase_metrics
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_metrics.seconds += time.perf_counter() - start
+        phase_metrics.calls += 1
+        metrics.active = previous
+
+
+def add_nodes(count: int) -> None:
+    """
+    Add the number of the built tree nodes to the current phase.
+
+    :param count: Number of the nodes.
+    """
+    metrics: Optional[MenuMetrics] = _current.get()
+    if metrics is not None and metrics.active is not None:
+        metrics.active.nodes += count
+
+
+def add_query(rows: int) -> None:
+    """
+    Add the query which doesn't go through the Django connections
+    (e.g. of the async driver) to the metrics.
+
+    :param rows: Number of the fetched rows.
+    """
+    metrics: Optional[MenuMetrics] = _current.get()
+    if metrics is not None:
+        metrics.queries += 1
+        if metrics.active is not None:
+            metrics.active.queries += 1
+            metrics.active.rows += rows
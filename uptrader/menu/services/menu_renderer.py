@@ -0,0 +1,88 @@
+"""
+Module with the compiled menu renderer.
+
+The renderer produces the same markup as menu/all_menu.html
+(without the insignificant whitespace), but walks the tree iteratively
+and writes into one buffer instead of including the template per node.
+"""
+
+from html import escape
+from typing import Iterator, List, Optional, Tuple
+
+from django.urls import reverse
+from menu.services.menu_funcs import MenuItemSchema
+
+
+def render_more(node: MenuItemSchema) -> str:
+    """
+    Render the link loading the hidden children of the limited item
+    (see menu.services.menu_limits).
+
+    :param node: Menu item with the hidden children.
+    :return: HTML of the link.
+    """
+    url: str = reverse("menu:children", args=(node.id,))
+    if node.more_after:
+        url += f"?after={node.more_after}"
+    return (
+        f'<li class="menu-more"><a href="{escape(url)}" '
+        f'data-menu-children="{node.id}">&hellip;</a></li>'
+    )
+
+
+def render_menu(
+    menu_items: List[MenuItemSchema],
+    target: str,
+    target_url: Optional[str],
+    menu_url: str,
+) -> str:
+    """
+    Render the menu to HTML.
+
+    :param menu_items: Roots of the menu subtrees.
+    :param target: Name of the target item.
+    :param target_url: Url of the target item, if it was resolved by url.
+    :param menu_url: Base url of the menu links.
+    :return: HTML of the menu.
+    """
+    parts: List[str] = list()
+    append = parts.append
+    menu_url = escape(menu_url)
+
+    for root in menu_items:
+        append('<div class="block-menu"><ul class="menu">')
+        # дети уровня и их родитель
+        stack: List[
+            Tuple[Iterator[MenuItemSchema], Optional[MenuItemSchema]]
+        ] = [(iter((root,)), None)]
+        while stack:
+            children, parent = stack[-1]
+            node: Optional[MenuItemSchema] = next(children, None)
+            if node is None:
+                stack.pop()
+                if getattr(parent, "more", False):
+                    append(render_more(parent))
+                append("</ul></li>" if stack else "</ul>")
+                continue
+
+            link: str = (
+                f'<a href="{menu_url}{escape(node.url)}">'
+                f"{escape(node.name)}</a>"
+            )
+            if target_url and node.url == target_url:
+                active: bool = True
+            else:
+                active = not target_url and target == node.name
+            if active:
+                append(f'<li><span class="dotted-underline">{link}</span>')
+            else:
+                append(f"<li>{link}")
+
+            if node.children or getattr(node, "more", False):
+                append('<ul class="menu">')
+                stack.append((iter(node.children), node))
+            else:
+                append("</li>")
+        append("</div>")
+
+    return "".join(parts)
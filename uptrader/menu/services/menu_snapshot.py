@@ -0,0 +1,323 @@
+"""
+Module with the menu snapshot shared between worker processes.
+
+The snapshot is a binary file with the whole menu forest
+in a compact array layout. Every worker maps the file into memory,
+so the pages are shared by all workers through the page cache
+and the memory usage does not grow with the number of workers.
+
+File layout (native byte order, every number is int64):
+
+- header: magic, tree version, items count, children count, strings size;
+- ids: ids of the items sorted ascending;
+- parents: index of the parent item or -1;
+- child offsets: children of the item i are
+  child_index[child_offsets[i]:child_offsets[i + 1]];
+- child index: indices of the children grouped by parent;
+- string offsets: name of the item i is
+  strings[offsets[2 * i]:offsets[2 * i + 1]], url is the next slice;
+- name order: indices of the items sorted by name;
+- url order: indices of the items sorted by url;
+- strings: utf-8 encoded names and urls.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from menu.services.menu_funcs import MenuItemSchema, MenuRow, load_menu_rows
+from menu.services.menu_metrics import add_nodes
+from menu.services.tree_version import get_tree_version
+
+MAGIC: bytes = b"MENUSNP2"
+HEADER: struct.Struct = struct.Struct("=8sqqqq")
+ITEM_SIZE: int = array("q").itemsize
+
+
+class MenuSnapshot:
+    """
+    Menu forest mapped from the snapshot file.
+
+    Lookups read the mapped arrays directly,
+    only the items of the requested branch are decoded.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.inode: int = os.fstat(file.fileno()).st_ino
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, count, child_count, strings_size = (
+            HEADER.unpack_from(self._mmap)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a menu snapshot")
+
+        buffer = memoryview(self._mmap)
+        offset: int = HEADER.size
+
+        def take(length: int) -> memoryview:
+            nonlocal offset
+            view = buffer[offset : offset + length * ITEM_SIZE].cast("q")
+            offset += length * ITEM_SIZE
+            return view
+
+        self.count: int = count
+        self.ids = take(count)
+        self.parents = take(count)
+        self.child_offsets = take(count + 1)
+        self.child_index = take(child_count)
+        self.string_offsets = take(2 * count + 1)
+        self.name_order = take(count)
+        self.url_order = take(count)
+        self.strings = buffer[offset : offset + strings_size]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _string(self, position: int) -> bytes:
+        return bytes(
+            self.strings[
+                self.string_offsets[position] : self.string_offsets[
+                    position + 1
+                ]
+            ]
+        )
+
+    def _search(self, order: memoryview, shift: int, value: str) -> List[int]:
+        # Binary search over the sorted names (shift 0) or urls (shift 1)
+        key: bytes = value.encode()
+        low, high = 0, self.count
+        while low < high:
+            middle: int = (low + high) // 2
+            if self._string(2 * order[middle] + shift) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        indices: List[int] = list()
+        while low < self.count and self._string(2 * order[low] + shift) == key:
+            indices.append(order[low])
+            low += 1
+        return indices
+
+    def _node(self, index: int) -> MenuItemSchema:
+        start, middle, end = self.string_offsets[2 * index : 2 * index + 3]
+        parent: int = self.parents[index]
+        return MenuItemSchema(
+            id=self.ids[index],
+            parent_id=self.ids[parent] if parent >= 0 else None,
+            name=str(self.strings[start:middle], "utf-8"),
+            url=str(self.strings[middle:end], "utf-8"),
+        )
+
+    def indices_by_name(self, menu_name: str) -> List[int]:
+        """
+        Find the items with name menu_name.
+
+        :param menu_name: Menu item name.
+        :return: Indices of the items.
+        """
+        return self._search(self.name_order, 0, menu_name)
+
+    def indices_by_url(self, url: str) -> List[int]:
+        """
+        Find the items with the url.
+
+        :param url: Full url of the menu item.
+        :return: Indices of the items.
+        """
+        return self._search(self.url_order, 1, url)
+
+    def index_by_id(self, item_id: int) -> Optional[int]:
+        index: int = bisect_left(self.ids, item_id)
+        if index < self.count and self.ids[index] == item_id:
+            return index
+        return None
+
+    def branch(self, menu_name: str) -> List[MenuItemSchema]:
+        """
+        Get subtrees that includes an item with name menu_name.
+
+        :param menu_name: Menu item name.
+        :return: List of the roots subtrees.
+        """
+        return self._branch(self.indices_by_name(menu_name))
+
+    def branch_by_url(self, url: str) -> List[MenuItemSchema]:
+        """
+        Get the subtree that includes the item with the url.
+
+        If several items have the same url, the one with the least id is used.
+
+        :param url: Full url of the menu item, e.g. "a/b/c/".
+        :return: List of the roots subtrees.
+        """
+        indices: List[int] = self.indices_by_url(url)
+        return self._branch([min(indices)] if indices else [])
+
+    def branch_by_ids(self, target_ids: Iterable[int]) -> List[MenuItemSchema]:
+        """
+        Get subtrees that includes items with ids from target_ids.
+
+        :param target_ids: Ids of the target menu items.
+        :return: List of the roots subtrees.
+        """
+        indices: List[Optional[int]] = [
+            self.index_by_id(item_id) for item_id in target_ids
+        ]
+        return self._branch(index for index in indices if index is not None)
+
+    def _branch(self, targets: Iterable[int]) -> List[MenuItemSchema]:
+        parents: Set[int] = set()
+        for index in targets:
+            while index >= 0 and index not in parents:
+                parents.add(index)
+                index = self.parents[index]
+
+        indices: Set[int] = set(parents)
+        for index in parents:
+            indices.update(
+                self.child_index[
+                    self.child_offsets[index] : self.child_offsets[index + 1]
+                ]
+            )
+
+        nodes: Dict[int, MenuItemSchema] = {
+            index: self._node(index) for index in sorted(indices)
+        }
+        add_nodes(len(nodes))
+        roots: List[MenuItemSchema] = list()
+        for index, node in nodes.items():
+            parent: Optional[MenuItemSchema] = nodes.get(self.parents[index])
+            if parent is not None:
+                parent.children.append(node)
+            else:
+                roots.append(node)
+        return roots
+
+
+def write_menu_snapshot(
+    path: str, version: int, rows: Sequence[MenuRow]
+) -> None:
+    """
+    Write the menu snapshot and atomically replace the old one.
+
+    :param path: Path to the snapshot file.
+    :param version: Menu tree version of the rows.
+    :param rows: Menu items sorted by id.
+    """
+    count: int = len(rows)
+    positions: Dict[int, int] = {row[0]: i for i, row in enumerate(rows)}
+
+    ids = array("q", (row[0] for row in rows))
+    parents = array(
+        "q",
+        (
+            positions.get(row[1], -1) if row[1] is not None else -1
+            for row in rows
+        ),
+    )
+
+    children: List[List[int]] = [list() for _ in range(count)]
+    for index, parent in enumerate(parents):
+        if parent >= 0:
+            children[parent].append(index)
+    child_offsets = array("q", [0])
+    child_index = array("q")
+    for item_children in children:
+        child_index.extend(item_children)
+        child_offsets.append(len(child_index))
+
+    strings = bytearray()
+    string_offsets = array("q", [0])
+    encoded_names: List[bytes] = list()
+    encoded_urls: List[bytes] = list()
+    for _, _, name, url in rows:
+        encoded_names.append(name.encode())
+        strings += encoded_names[-1]
+        string_offsets.append(len(strings))
+        encoded_urls.append(url.encode())
+        strings += encoded_urls[-1]
+        string_offsets.append(len(strings))
+
+    name_order = array(
+        "q", sorted(range(count), key=encoded_names.__getitem__)
+    )
+    url_order = array("q", sorted(range(count), key=encoded_urls.__getitem__))
+
+    tmp_path: str = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(
+            HEADER.pack(MAGIC, version, count, len(child_index), len(strings))
+        )
+        for part in (
+            ids,
+            parents,
+            child_offsets,
+            child_index,
+            string_offsets,
+            name_order,
+            url_order,
+        ):
+            part.tofile(file)
+        file.write(strings)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class MenuSnapshotStore:
+    """
+    Keeper of the mapped menu snapshot of one process.
+
+    When the tree version changes, only one worker rebuilds the snapshot
+    (the others wait for the file lock) and the rest map the new file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot: Optional[MenuSnapshot] = None
+
+    def _map(self) -> Optional[MenuSnapshot]:
+        try:
+            if (
+                self._snapshot is None
+                or os.stat(self.path).st_ino != self._snapshot.inode
+            ):
+                self._snapshot = MenuSnapshot(self.path)
+        except (FileNotFoundError, ValueError):
+            self._snapshot = None
+        return self._snapshot
+
+    def get(self, version: int) -> MenuSnapshot:
+        """
+        Get the snapshot of the menu tree version.
+
+        :param version: Menu tree version.
+        :return: Mapped menu snapshot.
+        """
+        with self._lock:
+            snapshot: Optional[MenuSnapshot] = self._map()
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    version = get_tree_version()
+                    snapshot = self._map()
+                    if snapshot is None or snapshot.version != version:
+                        write_menu_snapshot(
+                            self.path, version, load_menu_rows()
+                        )
+                        snapshot = self._map()
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return snapshot
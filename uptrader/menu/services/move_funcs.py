@@ -0,0 +1,420 @@
+"""
+Module with the online move of large menu subtrees.
+
+update_parent rewrites the whole subtree in one transaction, which holds
+the row locks of all descendants until the commit. move_subtree_online
+moves the item itself at once and then rewrites the urls of its
+descendants in short transactions of batch_size rows, with an optional
+pause between them. With settings.MENU_CLOSURE_TABLE the paths
+of the descendants in the closure table are rewritten in the same batches.
+
+Until the move is finished, the not yet processed descendants keep
+the old url prefix and the old ancestors in the closure table (their
+parent_id is not changed). The branches of such descendants are
+incomplete: their links point to the old urls, the branch targeted
+by one of them doesn't contain the moved item and its new ancestors,
+and a target by the new url isn't found.
+
+The progress is stored in menu_menumovejob. The descendants are processed
+in the order of id and the job keeps the last processed one (last_id),
+so a job interrupted by a crash is continued with resume_move_jobs
+(or the move_menu_subtree command).
+A running job holds a session advisory lock, so one job is processed
+by one process only.
+
+While a job is unfinished, update_parent and move_items refuse to change
+the items of its old and new subtrees. start_move takes the exclusive
+transaction advisory lock of the jobs and they take the shared one,
+so a job is never created for a subtree being changed concurrently.
+"""
+
+import time
+from typing import Callable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+from menu.services.closure_funcs import (
+    is_closure_enabled,
+    move_closure_descendants,
+    move_closure_item,
+)
+from menu.services.replicas import pin_primary
+from menu.services.tree_version import bump_tree_version
+
+# Класс ключей advisory-блокировок заданий переноса
+# (ключ 0 - блокировка создания заданий, остальные - id заданий)
+MOVE_LOCK_CLASS: int = 0x6D656E75
+
+LOCK_JOBS_QUERY: str = "SELECT pg_advisory_xact_lock(%s, 0);"
+LOCK_JOBS_SHARED_QUERY: str = "SELECT pg_advisory_xact_lock_shared(%s, 0);"
+
+# Незавершённое задание, поддеревья которого пересекаются с urls
+OVERLAPPING_JOB_QUERY: str = """
+SELECT j.old_url
+FROM menu_menumovejob j
+JOIN ({urls}) AS u(url) ON (
+    starts_with(u.url, j.old_url) OR starts_with(j.old_url, u.url)
+    OR starts_with(u.url, j.new_url) OR starts_with(j.new_url, u.url)
+)
+WHERE j.finished_at IS NULL
+LIMIT 1;
+"""
+# (параметр: массив urls)
+URLS_MOVING_QUERY: str = OVERLAPPING_JOB_QUERY.format(
+    urls="SELECT unnest(%s::text[])"
+)
+# url пункта до и после перемещения
+# (параметры: id нового родителя, id пункта)
+ITEM_MOVING_QUERY: str = OVERLAPPING_JOB_QUERY.format(urls="""
+    SELECT unnest(ARRAY[m.url, CONCAT(p.url, m.name, '/')])
+    FROM menu_menuitem m
+    LEFT JOIN menu_menuitem p ON p.id = %s
+    WHERE m.id = %s
+    """)
+
+# Следующая пачка потомков со старым префиксом url после last_id.
+# Пачки идут по id (keyset): выборка по url с ORDER BY url каждый раз
+# заново проходила бы мёртвые записи индекса уже перенесённых потомков.
+# (параметры: new_url - новый префикс, start - длина старого префикса + 1,
+# pattern - шаблон LIKE, last_id, size - размер пачки)
+MOVE_BATCH_QUERY: str = """
+UPDATE menu_menuitem AS menu
+SET url = %(new_url)s || substr(menu.url, %(start)s)
+FROM (
+    SELECT id FROM menu_menuitem
+    WHERE url LIKE %(pattern)s AND id > %(last_id)s
+    ORDER BY id
+    LIMIT %(size)s
+    FOR UPDATE
+) AS batch
+WHERE menu.id = batch.id
+RETURNING menu.id;
+"""
+
+Progress = Callable[[int, int], None]
+
+
+def like_prefix(prefix: str) -> str:
+    """
+    Build the LIKE pattern matching the strings with the prefix.
+
+    :param prefix: Prefix, e.g. "a/b_c/".
+    :return: Pattern, e.g. "a/b\\_c/%".
+    """
+    for char in ("\\", "%", "_"):
+        prefix = prefix.replace(char, "\\" + char)
+    return prefix + "%"
+
+
+def raise_if_moving(row: Optional[Tuple[str]]) -> None:
+    """
+    Raise the error for the row of OVERLAPPING_JOB_QUERY.
+
+    :param row: Row with the old url of the overlapping job or None.
+    :raise ValueError: If there is an overlapping job.
+    """
+    if row is not None:
+        raise ValueError(f"Subtree {row[0]} is being moved by a job")
+
+
+def lock_move_jobs(cursor: CursorWrapper, shared: bool = True) -> None:
+    """
+    Take the advisory lock of the move jobs until the end of the transaction.
+
+    It must be taken before the row locks of the items and before
+    the checks of the jobs (check_not_moving), so they see the jobs
+    committed while the lock was awaited.
+
+    :param cursor: Cursor of the transaction.
+    :param shared: Shared lock to change the items, exclusive - to create
+        a job.
+    """
+    cursor.execute(
+        LOCK_JOBS_SHARED_QUERY if shared else LOCK_JOBS_QUERY,
+        (MOVE_LOCK_CLASS,),
+    )
+
+
+def check_not_moving(cursor: CursorWrapper, urls: List[str]) -> None:
+    """
+    Refuse to change the subtrees being moved by unfinished jobs.
+
+    :param cursor: Cursor of the transaction holding the lock of the jobs
+        (see lock_move_jobs).
+    :param urls: Urls of the changed items before and after the change.
+    :raise ValueError: If a subtree is being moved.
+    """
+    cursor.execute(URLS_MOVING_QUERY, (urls,))
+    raise_if_moving(cursor.fetchone())
+
+
+def check_item_not_moving(
+    cursor: CursorWrapper, item_id: int, new_parent_id: Optional[int]
+) -> None:
+    """
+    Refuse to move the item if its subtree is being moved by a job.
+
+    :param cursor: Cursor of the transaction holding the lock of the jobs
+        (see lock_move_jobs).
+    :param item_id: Menu item id.
+    :param new_parent_id: New parent id, None - move to the root.
+    :raise ValueError: If the subtree is being moved.
+    """
+    cursor.execute(ITEM_MOVING_QUERY, (new_parent_id, item_id))
+    raise_if_moving(cursor.fetchone())
+
+
+def start_move(item_id: int, new_parent_id: Optional[int] = None) -> int:
+    """
+    Move the menu item to the new parent and create the job moving
+    its descendants.
+
+    :param item_id: Menu item id.
+    :param new_parent_id: New parent id, None - move to the root.
+    :return: Job id.
+    :raise ValueError: If the item or the parent doesn't exist, the move
+        creates a cycle, the url of the item is not unique or the subtree
+        is being moved by another job.
+    """
+    pin_primary()
+    with transaction.atomic(), connection.cursor() as cursor:
+        lock_move_jobs(cursor, shared=False)
+        cursor.execute(
+            "SELECT name, url FROM menu_menuitem WHERE id = %s FOR UPDATE;",
+            (item_id,),
+        )
+        row: Optional[Tuple[str, str]] = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Item {item_id} does not exist")
+        name, old_url = row
+
+        parent_url: str = ""
+        if new_parent_id is not None:
+            cursor.execute(
+                "SELECT url FROM menu_menuitem WHERE id = %s FOR SHARE;",
+                (new_parent_id,),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Parent {new_parent_id} does not exist")
+            parent_url = row[0]
+            if parent_url.startswith(old_url):
+                raise ValueError(f"Moving item {item_id} creates a cycle")
+        new_url: str = f"{parent_url}{name}/"
+
+        # потомки ищутся по префиксу url, он должен быть только у поддерева
+        cursor.execute(
+            "SELECT count(*) FROM menu_menuitem WHERE url = %s;", (old_url,)
+        )
+        if cursor.fetchone()[0] > 1:
+            raise ValueError(f"Url {old_url} of item {item_id} is not unique")
+
+        check_not_moving(cursor, [old_url, new_url])
+
+        cursor.execute(
+            """
+            UPDATE menu_menuitem SET parent_id = %s, url = %s
+            WHERE id = %s;
+            """,
+            (new_parent_id, new_url, item_id),
+        )
+        if is_closure_enabled():
+            # пути к потомкам обновляются пачками (_move_batch)
+            move_closure_item(cursor, item_id, new_parent_id)
+        total: int = 0
+        # url не изменился (тот же родитель) - переписывать нечего
+        if new_url != old_url:
+            cursor.execute(
+                "SELECT count(*) FROM menu_menuitem WHERE url LIKE %s;",
+                (like_prefix(old_url),),
+            )
+            total = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            INSERT INTO menu_menumovejob (
+                item_id, new_parent_id, old_url, new_url,
+                total, moved, last_id, created_at, updated_at, finished_at
+            )
+            VALUES (
+                %s, %s, %s, %s, %s, 0, 0, now(), now(),
+                CASE WHEN %s THEN now() END
+            )
+            RETURNING id;
+            """,
+            (item_id, new_parent_id, old_url, new_url, total, total == 0),
+        )
+        job_id: int = cursor.fetchone()[0]
+        transaction.on_commit(bump_tree_version)
+    return job_id
+
+
+def _move_batch(
+    cursor: CursorWrapper,
+    job_id: int,
+    item_id: int,
+    old_url: str,
+    new_url: str,
+    last_id: int,
+    size: int,
+) -> Tuple[int, int]:
+    with transaction.atomic():
+        cursor.execute(
+            MOVE_BATCH_QUERY,
+            {
+                "new_url": new_url,
+                "start": len(old_url) + 1,
+                "pattern": like_prefix(old_url),
+                "last_id": last_id,
+                "size": size,
+            },
+        )
+        ids: List[int] = [row[0] for row in cursor.fetchall()]
+        count: int = len(ids)
+        if ids:
+            last_id = max(ids)
+            if is_closure_enabled():
+                move_closure_descendants(cursor, item_id, ids)
+        cursor.execute(
+            """
+            UPDATE menu_menumovejob
+            SET
+                moved = moved + %s,
+                last_id = %s,
+                updated_at = now(),
+                finished_at = CASE WHEN %s THEN now() END
+            WHERE id = %s;
+            """,
+            (count, last_id, count < size, job_id),
+        )
+        if count:
+            transaction.on_commit(bump_tree_version)
+    return count, last_id
+
+
+def run_move(
+    job_id: int,
+    batch_size: int = 1000,
+    pause: float = 0.0,
+    progress: Optional[Progress] = None,
+) -> bool:
+    """
+    Rewrite the urls of the descendants of the moved item in batches.
+
+    Every batch is committed separately, so it must be called outside
+    of a transaction.
+
+    :param job_id: Job id.
+    :param batch_size: Number of the items updated by one transaction.
+    :param pause: Seconds to sleep between the batches.
+    :param progress: Function called after every batch with the numbers
+        of the moved and all descendants.
+    :return: False if the job is being processed by another process.
+    :raise ValueError: If there is no such job.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_try_advisory_lock(%s, %s);", (MOVE_LOCK_CLASS, job_id)
+        )
+        if not cursor.fetchone()[0]:
+            return False
+        try:
+            cursor.execute(
+                """
+                SELECT
+                    item_id, old_url, new_url, total, moved, last_id,
+                    finished_at IS NULL
+                FROM menu_menumovejob
+                WHERE id = %s;
+                """,
+                (job_id,),
+            )
+            row: Optional[Tuple[int, str, str, int, int, int, bool]] = (
+                cursor.fetchone()
+            )
+            if row is None:
+                raise ValueError(f"Job {job_id} does not exist")
+            item_id, old_url, new_url, total, moved, last_id, is_running = row
+
+            while is_running:
+                count, last_id = _move_batch(
+                    cursor,
+                    job_id,
+                    item_id,
+                    old_url,
+                    new_url,
+                    last_id,
+                    batch_size,
+                )
+                moved += count
+                is_running = count == batch_size
+                if progress is not None:
+                    progress(moved, total)
+                if is_running and pause:
+                    time.sleep(pause)
+        finally:
+            cursor.execute(
+                "SELECT pg_advisory_unlock(%s, %s);", (MOVE_LOCK_CLASS, job_id)
+            )
+    return True
+
+
+def move_subtree_online(
+    item_id: int,
+    new_parent_id: Optional[int] = None,
+    batch_size: int = 1000,
+    pause: float = 0.0,
+    progress: Optional[Progress] = None,
+) -> int:
+    """
+    Move the menu item to the new parent, updating its subtree in batches.
+
+    :param item_id: Menu item id.
+    :param new_parent_id: New parent id, None - move to the root.
+    :param batch_size: Number of the items updated by one transaction.
+    :param pause: Seconds to sleep between the batches.
+    :param progress: Function called after every batch with the numbers
+        of the moved and all descendants.
+    :return: Job id.
+    :raise ValueError: If the move is invalid (see start_move).
+    """
+    job_id: int = start_move(item_id, new_parent_id)
+    run_move(job_id, batch_size, pause, progress)
+    return job_id
+
+
+def get_unfinished_jobs() -> List[int]:
+    """
+    Get the jobs that were not finished.
+
+    :return: Ids of the jobs.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT id FROM menu_menumovejob
+            WHERE finished_at IS NULL
+            ORDER BY id;
+            """)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def resume_move_jobs(
+    batch_size: int = 1000,
+    pause: float = 0.0,
+    progress: Optional[Progress] = None,
+) -> List[int]:
+    """
+    Continue the interrupted jobs.
+
+    The jobs processed by other processes are skipped.
+
+    :param batch_size: Number of the items updated by one transaction.
+    :param pause: Seconds to sleep between the batches.
+    :param progress: Function called after every batch with the numbers
+        of the moved and all descendants.
+    :return: Ids of the finished jobs.
+    """
+    return [
+        job_id
+        for job_id in get_unfinished_jobs()
+        if run_move(job_id, batch_size, pause, progress)
+    ]
@@ -0,0 +1,134 @@
+"""
+Module with the server-side prepared menu queries.
+
+A query is prepared once per database connection (PREPARE) and then
+only executed by name (EXECUTE), so Postgres parses and plans it once
+for the connection instead of every request. It pays off with long-lived
+connections (CONN_MAX_AGE or the connection pool, see settings).
+Not compatible with poolers that reset the session between transactions
+(e.g. PgBouncer in the transaction mode), disable it with
+settings.MENU_PREPARED_STATEMENTS = False.
+"""
+
+import hashlib
+import re
+import threading
+import weakref
+from typing import Optional, Sequence, Set
+
+from django.conf import settings
+from django.db import DatabaseError, ProgrammingError
+from django.db.backends.utils import CursorWrapper
+
+# подготовленные запросы каждого соединения с базой
+_prepared: "weakref.WeakKeyDictionary[object, Set[str]]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+_PLACEHOLDER = re.compile(r"%s")
+INVALID_SQL_STATEMENT_NAME: str = "26000"
+DUPLICATE_PREPARED_STATEMENT: str = "42P05"
+
+
+def is_prepared_enabled() -> bool:
+    return getattr(settings, "MENU_PREPARED_STATEMENTS", True)
+
+
+def statement_name(query: str) -> str:
+    """
+    Get the name of the prepared statement of the query.
+
+    :param query: Query with %s placeholders.
+    :return: Statement name.
+    """
+    return f"menu_{hashlib.sha1(query.encode()).hexdigest()[:16]}"
+
+
+def to_positional(query: str) -> str:
+    """
+    Replace the %s placeholders of the query by $1, $2, ...
+
+    :param query: Query with %s placeholders.
+    :return: Query with the positional parameters.
+    """
+    counter: int = 0
+
+    def replace(_) -> str:
+        nonlocal counter
+        counter += 1
+        return f"${counter}"
+
+    return _PLACEHOLDER.sub(replace, query)
+
+
+def _sqlstate(error: DatabaseError) -> Optional[str]:
+    cause = error.__cause__
+    return getattr(cause, "sqlstate", getattr(cause, "pgcode", None))
+
+
+def _prepare(
+    cursor: CursorWrapper, name: str, query: str, statements: Set[str]
+) -> None:
+    try:
+        cursor.execute(f"PREPARE {name} AS {to_positional(query)};")
+    except ProgrammingError as error:
+        if _sqlstate(error) != DUPLICATE_PREPARED_STATEMENT:
+            raise
+        # запрос уже подготовлен (соединение пережило наш реестр),
+        # в транзакции ошибка её прервала - дальше только через rollback
+        with _lock:
+            statements.add(name)
+        if cursor.db.in_atomic_block:
+            raise
+        return
+    # PREPARE не отменяется откатом транзакции, запоминаем сразу
+    with _lock:
+        statements.add(name)
+
+
+def execute_prepared(
+    cursor: CursorWrapper, query: str, params: Sequence = ()
+) -> None:
+    """
+    Execute the query as a prepared statement of the cursor connection.
+
+    The first execution on the connection sends PREPARE, the next ones
+    send only EXECUTE. If the statement was lost (the session was reset),
+    it is prepared again, outside of a transaction the query is retried.
+
+    :param cursor: Database cursor.
+    :param query: Query with %s placeholders.
+    :param params: Query parameters.
+    """
+    if not is_prepared_enabled():
+        cursor.execute(query, params)
+        return
+
+    query = query.strip().rstrip(";")
+    name: str = statement_name(query)
+    execute: str = f"EXECUTE {name}"
+    if params:
+        execute += f" ({', '.join(['%s'] * len(params))})"
+
+    cursor.db.ensure_connection()
+    raw_connection = cursor.db.connection
+    with _lock:
+        statements: Set[str] = _prepared.setdefault(raw_connection, set())
+        prepared: bool = name in statements
+    if not prepared:
+        _prepare(cursor, name, query, statements)
+
+    try:
+        cursor.execute(execute, params)
+    except ProgrammingError as error:
+        if _sqlstate(error) != INVALID_SQL_STATEMENT_NAME:
+            raise
+        # сессия была сброшена (DISCARD ALL), подготовим запросы заново
+        with _lock:
+            statements.clear()
+        # в транзакции ошибка её прервала, повторять нельзя
+        if cursor.db.in_atomic_block:
+            raise
+        _prepare(cursor, name, query, statements)
+        cursor.execute(execute, params)
@@ -0,0 +1,149 @@
+"""
+Module with the routing of the menu reads to the database replicas.
+
+settings.MENU_REPLICAS are the aliases of the replicas in DATABASES.
+The menu reads go to one of them unless:
+- the request is pinned to the primary: it changes data or the client
+  changed data recently (read-your-writes, see MenuReplicaMiddleware),
+  or the read runs in a transaction of the primary;
+- the replica hasn't replayed the WAL of the primary up to the commit
+  of the last change of the menu tree (see get_tree_lsn) or the position
+  of the change isn't shared between the processes. So the menus
+  cached by the tree version are never built from the old data of a replica.
+The replayed position of every replica is checked at most once
+in settings.MENU_REPLICA_LAG_CHECK_INTERVAL seconds per process.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from menu.services.tree_listener import parse_lsn
+from menu.services.tree_version import get_tree_lsn
+
+logger = logging.getLogger("main")
+
+# Применённая позиция WAL (на основном сервере - текущая)
+REPLAY_LSN_QUERY: str = """
+SELECT CASE
+    WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()
+    ELSE pg_current_wal_insert_lsn()
+END::text;
+"""
+
+# позиция недоступной реплики
+UNAVAILABLE_LSN: int = -1
+
+_pinned: ContextVar[bool] = ContextVar("menu_pinned_to_primary", default=False)
+# в контексте были записи
+_written: ContextVar[bool] = ContextVar("menu_written", default=False)
+
+# alias -> (время проверки, применённая позиция WAL)
+_positions: Dict[str, Tuple[float, int]] = dict()
+_positions_lock = threading.Lock()
+
+
+def get_replicas() -> List[str]:
+    return getattr(settings, "MENU_REPLICAS", [])
+
+
+def pin_primary() -> None:
+    """Mark the write of the context, its next menu reads go to the primary."""
+    _pinned.set(True)
+    _written.set(True)
+
+
+def is_pinned() -> bool:
+    return _pinned.get()
+
+
+def has_written() -> bool:
+    return _written.get()
+
+
+@contextmanager
+def replica_context(pinned: bool = False) -> Iterator[None]:
+    """
+    Context of the menu reads of one request.
+
+    :param pinned: Whether the reads go to the primary from the start.
+    """
+    pinned_token = _pinned.set(pinned)
+    written_token = _written.set(False)
+    try:
+        yield
+    finally:
+        _written.reset(written_token)
+        _pinned.reset(pinned_token)
+
+
+def get_replay_lsn(alias: str) -> int:
+    """
+    Get the WAL position replayed by the replica.
+
+    The value is cached for settings.MENU_REPLICA_LAG_CHECK_INTERVAL seconds.
+    The position only grows, so a cached one is never ahead of the replica.
+
+    :param alias: Database alias of the replica.
+    :return: Position in the WAL, UNAVAILABLE_LSN if the replica
+        is unavailable.
+    """
+    interval: float = getattr(settings, "MENU_REPLICA_LAG_CHECK_INTERVAL", 1)
+    now: float = time.monotonic()
+    with _positions_lock:
+        checked_at, lsn = _positions.get(alias, (-math.inf, UNAVAILABLE_LSN))
+    if now - checked_at < interval:
+        return lsn
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLAY_LSN_QUERY)
+            replayed: Optional[int] = parse_lsn(cursor.fetchone()[0])
+        lsn = UNAVAILABLE_LSN if replayed is None else replayed
+    except DatabaseError:
+        logger.warning("Menu replica %s is unavailable", alias, exc_info=True)
+        lsn = UNAVAILABLE_LSN
+    with _positions_lock:
+        _positions[alias] = (now, lsn)
+    return lsn
+
+
+def get_read_alias() -> str:
+    """
+    Choose the database for the menu reads.
+
+    :return: Alias of a fresh enough replica or of the primary.
+    """
+    replicas: List[str] = get_replicas()
+    if (
+        not replicas
+        or is_pinned()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    ):
+        return DEFAULT_DB_ALIAS
+
+    # реплика должна применить коммит последнего изменения меню
+    tree_lsn: Optional[int] = get_tree_lsn()
+    if tree_lsn is None:
+        return DEFAULT_DB_ALIAS
+    fresh: List[str] = [
+        alias for alias in replicas if get_replay_lsn(alias) >= tree_lsn
+    ]
+    return random.choice(fresh) if fresh else DEFAULT_DB_ALIAS
+
+
+def read_connection() -> BaseDatabaseWrapper:
+    """
+    Get the connection for the menu reads (see get_read_alias).
+
+    :return: Database connection.
+    """
+    return connections[get_read_alias()]
@@ -0,0 +1,279 @@
+"""
+Module with the listener of the menu tree version changes.
+
+The trigger on menu_menuitem (migration 0006) bumps the version
+in menu_menutreeversion and sends it with NOTIFY after every change
+of the items, including raw SQL and manual changes in psql.
+The listener thread of the process receives the notifications
+on its own connection, so the cached menus of the process are
+invalidated right after the commit in any process.
+
+With every version the listener keeps the WAL position (LSN) of the primary
+read after the notification, i.e. after the commit of the change.
+A replica that has replayed it has the data of the version
+(see menu.services.replicas).
+"""
+
+import logging
+import os
+import select
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+logger = logging.getLogger("main")
+
+CHANNEL: str = "menu_tree_version"
+VERSION_QUERY: str = """
+SELECT
+    COALESCE(MAX(version), 0),
+    MAX(extract(epoch FROM modified_at)),
+    pg_current_wal_insert_lsn()::text
+FROM menu_menutreeversion
+"""
+# Позиция WAL основного сервера, не меньше конца последнего коммита
+LSN_QUERY: str = "SELECT pg_current_wal_insert_lsn()::text;"
+
+
+def is_tree_notify_enabled() -> bool:
+    return getattr(settings, "MENU_TREE_NOTIFY", False)
+
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """
+    Convert the text of pg_lsn to a number.
+
+    :param lsn: LSN, e.g. "16/B374D848".
+    :return: Position in the WAL, None if lsn is None.
+    """
+    if lsn is None:
+        return None
+    high, _, low = lsn.partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def read_current_lsn(alias: str = "default") -> int:
+    """
+    Read the WAL position of the primary.
+
+    Everything committed before the call is before the position.
+
+    :param alias: Database alias of the primary.
+    :return: Position in the WAL.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(LSN_QUERY)
+        return parse_lsn(cursor.fetchone()[0])
+
+
+class TreeVersionListener:
+    """
+    Thread listening to the menu tree version notifications.
+
+    The version is None while the listener is not connected,
+    then the version from the Django cache is used
+    (see menu.services.tree_version).
+    The thread is started lazily and restarted in a forked process.
+    """
+
+    def __init__(
+        self,
+        alias: str = "default",
+        timeout: float = 5.0,
+        retry_delay: float = 1.0,
+    ):
+        self.alias = alias
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._version: Optional[int] = None
+        # время последнего изменения дерева (unix time)
+        self._modified: Optional[float] = None
+        # позиция WAL после коммита изменения
+        self._lsn: Optional[int] = None
+
+    def get_version(self) -> Optional[int]:
+        """
+        Get the tree version received from the database.
+
+        :return: Tree version, None if the listener isn't connected yet.
+        """
+        self.start()
+        return self._version
+
+    def get_modified(self) -> Optional[float]:
+        """
+        Get the time of the last change of the tree from the database.
+
+        :return: Unix time, None if the listener isn't connected yet
+            or the time is unknown.
+        """
+        self.start()
+        return self._modified if self._version is not None else None
+
+    def get_lsn(self) -> Optional[int]:
+        """
+        Get the WAL position of the primary after the last change of the tree.
+
+        :return: Position in the WAL, None if the listener isn't connected.
+        """
+        self.start()
+        return self._lsn if self._version is not None else None
+
+    def start(self) -> None:
+        """Start the listener thread if it isn't running in this process."""
+        pid: int = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            self._pid = pid
+            self._version = None
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="menu-tree-listener", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the listener thread."""
+        with self._lock:
+            thread: Optional[threading.Thread] = self._thread
+            self._stop.set()
+            self._thread = None
+            self._pid = None
+        if thread is not None:
+            thread.join(self.timeout + 1)
+        self._version = None
+        self._modified = None
+        self._lsn = None
+
+    def advance(
+        self, version: int, modified: Optional[float], lsn: Optional[int]
+    ) -> None:
+        """
+        Set the newer tree version, e.g. read after a commit
+        before the notification has arrived.
+
+        :param version: Tree version from the database.
+        :param modified: Time of the change (unix time).
+        :param lsn: WAL position of the primary after the change.
+        """
+        with self._lock:
+            if self._version is not None and version > self._version:
+                self._version = version
+                self._modified = modified
+                self._lsn = lsn
+
+    def _set_version(
+        self, version: int, modified: Optional[float], lsn: Optional[int]
+    ) -> None:
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._modified = modified
+                self._lsn = lsn
+
+    def _connect(self) -> BaseDatabaseWrapper:
+        # отдельное соединение потока, не из пула Django
+        wrapper: BaseDatabaseWrapper = connections.create_connection(
+            self.alias
+        )
+        options: dict = dict(wrapper.settings_dict.get("OPTIONS", {}))
+        options.pop("pool", None)
+        wrapper.settings_dict = {**wrapper.settings_dict, "OPTIONS": options}
+        wrapper.ensure_connection()
+        return wrapper
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            wrapper: Optional[BaseDatabaseWrapper] = None
+            try:
+                wrapper = self._connect()
+                with wrapper.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                    # изменения до LISTEN не придут уведомлением
+                    cursor.execute(VERSION_QUERY)
+                    with self._lock:
+                        self._version, self._modified, self._lsn = (
+                            parse_version_row(cursor.fetchone())
+                        )
+                self._listen(wrapper)
+            except Exception:
+                logger.exception("Menu tree listener failed, reconnecting")
+            finally:
+                self._version = None
+                self._modified = None
+                self._lsn = None
+                if wrapper is not None:
+                    wrapper.close()
+            self._stop.wait(self.retry_delay)
+
+    def _listen(self, wrapper: BaseDatabaseWrapper) -> None:
+        while not self._stop.is_set():
+            payloads: List[str] = list(self._receive(wrapper.connection))
+            if not payloads:
+                continue
+            # уведомление приходит после коммита, позиция WAL - после него
+            with wrapper.cursor() as cursor:
+                cursor.execute(LSN_QUERY)
+                lsn: Optional[int] = parse_lsn(cursor.fetchone()[0])
+            for payload in payloads:
+                self._set_version(*parse_payload(payload), lsn)
+
+    def _receive(self, raw_connection) -> Iterable[str]:
+        if hasattr(raw_connection, "poll"):
+            # psycopg2
+            readable, _, _ = select.select(
+                [raw_connection], [], [], self.timeout
+            )
+            if not readable:
+                return []
+            raw_connection.poll()
+            payloads = [notify.payload for notify in raw_connection.notifies]
+            raw_connection.notifies.clear()
+            return payloads
+        # psycopg 3
+        return [
+            notify.payload
+            for notify in raw_connection.notifies(timeout=self.timeout)
+        ]
+
+
+def parse_version_row(
+    row: tuple,
+) -> Tuple[int, Optional[float], Optional[int]]:
+    version, modified, lsn = row
+    return (
+        version,
+        float(modified) if modified is not None else None,
+        parse_lsn(lsn),
+    )
+
+
+def parse_payload(payload: str) -> Tuple[int, Optional[float]]:
+    """
+    Parse the notification of the trigger.
+
+    :param payload: "<version> <unix time>" or "<version>".
+    :return: Tree version and time of the change.
+    """
+    version, _, modified = payload.partition(" ")
+    return int(version), float(modified) if modified else None
+
+
+tree_listener = TreeVersionListener()
+
+
+def refresh_tree_version() -> None:
+    """Read the tree version after a commit of this process."""
+    with connections[tree_listener.alias].cursor() as cursor:
+        cursor.execute(VERSION_QUERY)
+        tree_listener.advance(*parse_version_row(cursor.fetchone()))
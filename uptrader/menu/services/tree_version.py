@@ -0,0 +1,170 @@
+"""Module with the menu tree version used to invalidate cached menus."""
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from menu.services.tree_listener import (
+    is_tree_notify_enabled,
+    read_current_lsn,
+    refresh_tree_version,
+    tree_listener,
+)
+
+logger = logging.getLogger("main")
+
+TREE_VERSION_KEY: str = "menu:tree_version"
+TREE_MODIFIED_KEY: str = "menu:tree_modified"
+TREE_LSN_KEY: str = "menu:tree_lsn"
+
+# Бэкенды кэша, которые не видны другим процессам
+LOCAL_CACHE_BACKENDS: Tuple[str, ...] = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def _get_cache() -> BaseCache:
+    return caches[getattr(settings, "MENU_CACHE_ALIAS", "default")]
+
+
+def is_tree_version_shared() -> bool:
+    """
+    Whether every process sees the changes of the menu tree version.
+
+    It is so with settings.MENU_TREE_NOTIFY, with a shared backend
+    of the menu cache (not LocMemCache) or if the site is served by one
+    process (settings.MENU_SINGLE_PROCESS). Otherwise a change made
+    by another worker or a management command wouldn't reach the process,
+    so the process caches of the menus and the conditional GET are off.
+
+    :return: True if the version can be used to cache the menus.
+    """
+    if is_tree_notify_enabled() or getattr(
+        settings, "MENU_SINGLE_PROCESS", False
+    ):
+        return True
+    alias: str = getattr(settings, "MENU_CACHE_ALIAS", "default")
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+
+
+def is_tree_cache_enabled() -> bool:
+    """Whether the menu branches are taken from the process menu forest."""
+    return getattr(settings, "MENU_TREE_CACHE", True) and (
+        is_tree_version_shared()
+    )
+
+
+def is_fragment_cache_enabled() -> bool:
+    """Whether the rendered menus are cached."""
+    return getattr(settings, "MENU_FRAGMENT_CACHE", True) and (
+        is_tree_version_shared()
+    )
+
+
+def warn_if_caches_disabled() -> None:
+    """
+    Log a warning at startup if the menu caches are turned off
+    because the tree version is not shared (see is_tree_version_shared).
+    """
+    if is_tree_version_shared():
+        return
+    disabled: List[str] = [
+        name
+        for name in ("MENU_TREE_CACHE", "MENU_FRAGMENT_CACHE")
+        if getattr(settings, name, True)
+    ]
+    if not disabled:
+        return
+    alias: str = getattr(settings, "MENU_CACHE_ALIAS", "default")
+    logger.warning(
+        "%s disabled: the menu cache %s is local to the process. "
+        "Set MENU_CACHE_BACKEND to a shared cache, MENU_TREE_NOTIFY=1 "
+        "or MENU_SINGLE_PROCESS=1 for one process",
+        " and ".join(disabled),
+        settings.CACHES[alias]["BACKEND"],
+    )
+
+
+def get_tree_version() -> int:
+    """
+    Get the current version of the menu tree.
+
+    The version is stored in the Django cache, so every process
+    that shares the cache backend sees the same value.
+    If the key was evicted, it is recreated from the current time,
+    so the new version never matches an old one.
+    With settings.MENU_TREE_NOTIFY the version from the database trigger
+    is used while the listener of the process is connected.
+
+    :return: Menu tree version.
+    """
+    if is_tree_notify_enabled():
+        version: Optional[int] = tree_listener.get_version()
+        if version is not None:
+            return version
+    return _get_cache().get_or_set(
+        TREE_VERSION_KEY, time.time_ns(), timeout=None
+    )
+
+
+def bump_tree_version() -> None:
+    """Change the menu tree version, invalidating every cached menu."""
+    cache: BaseCache = _get_cache()
+    if getattr(settings, "MENU_REPLICAS", []):
+        # позиция - раньше версии: меню новой версии не читаются с реплики,
+        # которая ещё не применила изменение
+        cache.set(TREE_LSN_KEY, read_current_lsn(), timeout=None)
+    try:
+        cache.incr(TREE_VERSION_KEY)
+    except ValueError:
+        cache.set(TREE_VERSION_KEY, time.time_ns(), timeout=None)
+    cache.set(TREE_MODIFIED_KEY, time.time(), timeout=None)
+    if is_tree_notify_enabled():
+        refresh_tree_version()
+
+
+def get_tree_modified() -> float:
+    """
+    Get the time of the last change of the menu tree.
+
+    Like the version, it is stored in the Django cache
+    or received from the database trigger (settings.MENU_TREE_NOTIFY).
+    If it is unknown, the current time is used.
+
+    :return: Unix time.
+    """
+    if is_tree_notify_enabled():
+        modified: Optional[float] = tree_listener.get_modified()
+        if modified is not None:
+            return modified
+    return _get_cache().get_or_set(
+        TREE_MODIFIED_KEY, time.time(), timeout=None
+    )
+
+
+def get_tree_lsn() -> Optional[int]:
+    """
+    Get the WAL position of the primary after the last change of the tree.
+
+    A replica that has replayed the position has the data of the current
+    tree version. The position is read after the commit of the change
+    (see bump_tree_version and the listener of settings.MENU_TREE_NOTIFY).
+    Like the version, it is kept in the menu cache, so the position
+    of a local cache (LocMemCache) is unknown to the other processes
+    (see is_tree_version_shared). If it is not stored yet,
+    the current position of the primary is used.
+
+    :return: Position in the WAL, None if the process can't know it.
+    """
+    if is_tree_notify_enabled():
+        lsn: Optional[int] = tree_listener.get_lsn()
+        if lsn is not None:
+            return lsn
+    if not is_tree_version_shared():
+        return None
+    return _get_cache().get_or_set(
+        TREE_LSN_KEY, read_current_lsn, timeout=None
+    )
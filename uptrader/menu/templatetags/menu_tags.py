@@ -1,20 +1,219 @@
-from typing import List
+from functools import partial
+from typing import List, Optional, Tuple
 
 from django import template
 from django.conf import settings
-from menu.services.menu_funcs import MenuItemSchema, get_menu_branch
+from django.http import HttpRequest
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from menu.services.fragment_cache import get_or_render_fragment
+from menu.services.menu_cache import (
+    get_cached_menu_branch,
+    get_cached_menu_branch_by_url,
+)
+from menu.services.menu_funcs import (
+    MenuForest,
+    MenuItemSchema,
+    get_menu_branch,
+    get_menu_branch_by_url,
+    path_to_url,
+)
+from menu.services.menu_limits import (
+    get_limited_menu_branch,
+    get_limited_menu_branch_by_url,
+    is_limited,
+    limit_full_branch,
+)
+from menu.services.menu_loader import MenuLoader
+from menu.services.menu_metrics import phase
+from menu.services.menu_renderer import render_menu
+from menu.services.tree_version import (
+    is_fragment_cache_enabled,
+    is_tree_cache_enabled,
+)
 
 register = template.Library()
 
+RENDERERS: Tuple[str, ...] = ("template", "compiled")
 
-@register.inclusion_tag("menu/all_menu.html", takes_context=True)
-def draw_menu(context, menu_name):
-    menu_items: List[MenuItemSchema] = get_menu_branch(menu_name)
-    return {
-        "menu_items": [
-            [item] for item in menu_items
-        ],  # костыль для рекурсивного фронтенда
-        "target": menu_name,
-        "menu_url": settings.MENU_URL,
-        "request": context["request"],
-    }
+
+def resolve_menu(
+    menu_name: str,
+    menu_path: Optional[str],
+    forest: Optional[MenuForest] = None,
+    max_depth: Optional[int] = None,
+    max_siblings: Optional[int] = None,
+) -> Tuple[List[MenuItemSchema], Optional[str]]:
+    """
+    Get the menu branch of the target item.
+
+    The target is resolved by the full path (e.g. "a/b/c") if it is given,
+    otherwise (or if there is no such item) by the name.
+    The branch is cut to the limits (see menu.services.menu_limits),
+    when it is read from the database, the cut items are not read.
+
+    :param menu_name: Name of the target item.
+    :param menu_path: Path of the target item.
+    :param forest: Forest with the branch of the target (see
+    load_menu_branches), by default the branch is taken from the process
+    menu cache or from the database if it is disabled (is_tree_cache_enabled).
+    :param max_depth: Max level of the shown items, None - unlimited.
+    :param max_siblings: Max number of the shown children, None - unlimited.
+    :return: Roots of the menu subtrees and the url of the target item
+    (None if the target was resolved by the name).
+    """
+    limited: bool = is_limited(max_depth, max_siblings)
+    if forest is not None:
+        get_branch = forest.branch
+        get_branch_by_url = forest.branch_by_url
+    elif is_tree_cache_enabled():
+        get_branch = get_cached_menu_branch
+        get_branch_by_url = get_cached_menu_branch_by_url
+    elif limited:
+        # ограничения применяются в запросе, лишние узлы не читаются
+        get_branch = partial(
+            get_limited_menu_branch,
+            max_depth=max_depth,
+            max_siblings=max_siblings,
+        )
+        get_branch_by_url = partial(
+            get_limited_menu_branch_by_url,
+            max_depth=max_depth,
+            max_siblings=max_siblings,
+        )
+        limited = False
+    else:
+        get_branch = get_menu_branch
+        get_branch_by_url = get_menu_branch_by_url
+
+    target_url: Optional[str] = None
+    menu_items: List[MenuItemSchema] = list()
+    if menu_path:
+        target_url = path_to_url(menu_path)
+        menu_items = get_branch_by_url(target_url)
+    if not menu_items:
+        target_url = None
+        menu_items = get_branch(menu_name)
+    if limited:
+        with phase("tree"):
+            menu_items = limit_full_branch(
+                menu_items, menu_name, target_url, max_depth, max_siblings
+            )
+    return menu_items, target_url
+
+
+def render_menu_html(
+    menu_name: str,
+    menu_path: Optional[str],
+    renderer: str,
+    request: Optional[HttpRequest] = None,
+    forest: Optional[MenuForest] = None,
+    max_depth: Optional[int] = None,
+    max_siblings: Optional[int] = None,
+) -> str:
+    """
+    Render the menu expanded up to the target item (without the cache).
+
+    :param menu_name: Name of the target item.
+    :param menu_path: Path of the target item.
+    :param renderer: "template" or "compiled".
+    :param request: Current request.
+    :param forest: Forest with the branch of the target (see resolve_menu).
+    :param max_depth: Max level of the shown items, None - unlimited.
+    :param max_siblings: Max number of the shown children, None - unlimited.
+    :return: HTML of the menu.
+    """
+    menu_items, target_url = resolve_menu(
+        menu_name, menu_path, forest, max_depth, max_siblings
+    )
+    with phase("render"):
+        if renderer == "compiled":
+            return render_menu(
+                menu_items, menu_name, target_url, settings.MENU_URL
+            )
+        return render_to_string(
+            "menu/all_menu.html",
+            {
+                "menu_items": [
+                    [item] for item in menu_items
+                ],  # костыль для рекурсивного фронтенда
+                "target": menu_name,
+                "target_url": target_url,
+                "menu_url": settings.MENU_URL,
+            },
+            request=request,
+        )
+
+
+def _get_limit(name: str, value) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        limit: int = int(value)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise template.TemplateSyntaxError(
+            f"{name} must be a positive integer, got {value!r}"
+        )
+    return limit
+
+
+@register.simple_tag(takes_context=True)
+def draw_menu(
+    context,
+    menu_name,
+    menu_path=None,
+    renderer=None,
+    max_depth=None,
+    max_siblings=None,
+):
+    """
+    Draw the menu expanded up to the target item.
+
+    The renderer is "template" (menu/all_menu.html) or "compiled"
+    (menu.services.menu_renderer), by default settings.MENU_RENDERER.
+    max_depth limits the levels of the menu, max_siblings the number
+    of the shown children of every expanded item, the hidden children
+    are loaded by the "more" link (see menu.services.menu_limits).
+    The rendered menu is cached by the target and the menu tree version.
+    With MenuLoaderMiddleware the tag returns a placeholder and all menus
+    of the page are rendered together after the page. The limited menus
+    are rendered in place, their branches are read by separate queries.
+    """
+    renderer = renderer or getattr(settings, "MENU_RENDERER", "template")
+    if renderer not in RENDERERS:
+        raise template.TemplateSyntaxError(
+            f"Unknown menu renderer {renderer!r}"
+        )
+    max_depth = _get_limit("max_depth", max_depth)
+    max_siblings = _get_limit("max_siblings", max_siblings)
+    limited: bool = is_limited(max_depth, max_siblings)
+    request: Optional[HttpRequest] = context.get("request")
+
+    def render(forest: Optional[MenuForest] = None) -> str:
+        return render_menu_html(
+            menu_name,
+            menu_path,
+            renderer,
+            request=request,
+            forest=forest,
+            max_depth=max_depth,
+            max_siblings=max_siblings,
+        )
+
+    loader: Optional[MenuLoader] = getattr(request, "menu_loader", None)
+    if loader is not None and not limited:
+        return mark_safe(loader.defer(menu_name, menu_path, renderer, render))
+
+    if not is_fragment_cache_enabled():
+        return mark_safe(render())
+    html: str = get_or_render_fragment(
+        menu_name,
+        menu_path,
+        settings.MENU_URL,
+        renderer,
+        render,
+        variant=f"{max_depth}:{max_siblings}" if limited else "",
+    )
+    return mark_safe(html)
@@ -0,0 +1,94 @@
+from typing import List
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models import MenuItem
+
+
+class TestMenuItemAdmin(TestCase):
+    changelist_url: str = reverse("admin:menu_menuitem_changelist")
+
+    def setUp(self):
+        user = User.objects.create_superuser("admin", "admin@test", "admin")
+        self.client.force_login(user)
+        self.root: MenuItem = MenuItemFactory.create(name="root")
+        self.children: List[MenuItem] = [
+            MenuItemFactory.create(name=f"c{i}", parent=self.root)
+            for i in range(3)
+        ]
+        self.other: MenuItem = MenuItemFactory.create(name="other")
+
+    def changelist_ids(self, **params) -> List[int]:
+        response = self.client.get(self.changelist_url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item.pk for item in response.context["cl"].result_list]
+
+    def test_search(self):
+        self.assertEqual(
+            self.changelist_ids(q="root/"),
+            [self.root.pk] + [child.pk for child in self.children],
+        )
+        self.assertEqual(self.changelist_ids(q="c1"), [self.children[1].pk])
+
+    def test_parent_filter(self):
+        self.assertEqual(
+            self.changelist_ids(parent=self.root.pk),
+            [child.pk for child in self.children],
+        )
+        self.assertEqual(
+            self.changelist_ids(parent="root"), [self.root.pk, self.other.pk]
+        )
+
+    def test_parent_autocomplete(self):
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "menu",
+                "model_name": "menuitem",
+                "field_name": "parent",
+                "term": "root/c",
+            },
+        )
+        self.assertEqual(
+            [int(result["id"]) for result in response.json()["results"]],
+            [child.pk for child in self.children],
+        )
+
+    def test_move_action(self):
+        response = self.client.post(
+            self.changelist_url,
+            {
+                "action": "move_to_parent",
+                "new_parent": self.other.pk,
+                ACTION_CHECKBOX_NAME: [child.pk for child in self.children],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            MenuItem.objects.get(pk=self.children[0].pk).url, "other/c0/"
+        )
+
+    def test_delete_action(self):
+        response = self.client.post(
+            self.changelist_url,
+            {
+                "action": "delete_selected",
+                "post": "yes",
+                ACTION_CHECKBOX_NAME: [self.root.pk],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(MenuItem.objects.all()), [self.other])
+
+    def test_rename_updates_urls(self):
+        response = self.client.post(
+            reverse("admin:menu_menuitem_change", args=(self.root.pk,)),
+            {"name": "renamed", "parent": ""},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            MenuItem.objects.get(pk=self.children[0].pk).url, "renamed/c0/"
+        )
@@ -0,0 +1,92 @@
+from django.test import TestCase
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models import MenuItem
+from menu.services.menu_funcs import update_parent
+
+
+class TestMenuItemSave(TestCase):
+    def setUp(self):
+        self.root = MenuItemFactory.create(name="root")
+        self.other = MenuItemFactory.create(name="other")
+        self.child = MenuItemFactory.create(name="child", parent=self.root)
+        self.grandchild = MenuItemFactory.create(
+            name="grandchild", parent=self.child
+        )
+
+    def test_new_item_with_loaded_parent(self):
+        with self.assertNumQueries(1):
+            item = MenuItem(name="new", parent=self.child)
+            item.save()
+        self.assertEqual(item.url, "root/child/new/")
+
+    def test_new_item_with_parent_id(self):
+        with self.assertNumQueries(2):
+            item = MenuItem(name="new", parent_id=self.child.pk)
+            item.save()
+        self.assertEqual(item.url, "root/child/new/")
+
+    def test_new_item_with_missing_parent(self):
+        with self.assertRaises(ValueError):
+            MenuItem(name="new", parent_id=-1).save()
+
+    def test_save_without_move(self):
+        item: MenuItem = MenuItem.objects.get(pk=self.child.pk)
+        item.name = "renamed"
+        with self.assertNumQueries(1):
+            item.save()
+
+    def test_save_not_loaded_item(self):
+        item = MenuItem(
+            pk=self.child.pk,
+            name="child",
+            url="root/child/",
+            parent_id=self.root.pk,
+        )
+        with self.assertNumQueries(2):
+            item.save()
+
+    def test_move(self):
+        item: MenuItem = MenuItem.objects.get(pk=self.child.pk)
+        item.parent = self.other
+        item.save()
+        self.assertEqual(item.url, "other/child/")
+        self.assertEqual(
+            MenuItem.objects.get(pk=self.grandchild.pk).url,
+            "other/child/grandchild/",
+        )
+
+        # повторное сохранение не перемещает узел еще раз
+        with self.assertNumQueries(1):
+            item.save()
+
+    def test_move_after_refresh(self):
+        item: MenuItem = MenuItem.objects.get(pk=self.child.pk)
+        update_parent(self.child.pk, self.other.pk)
+        item.refresh_from_db()
+        item.parent = self.root
+        item.save()
+        self.assertEqual(item.url, "root/child/")
+
+    def test_save_after_partial_refresh(self):
+        item: MenuItem = MenuItem.objects.get(pk=self.child.pk)
+        update_parent(self.child.pk, self.other.pk)
+        # parent_id не обновлён, он читается в save
+        item.refresh_from_db(fields=["name"])
+        item.save()
+        self.assertEqual(item.url, "root/child/")
+
+    def test_deferred_parent(self):
+        item: MenuItem = MenuItem.objects.only("name").get(pk=self.child.pk)
+        self.assertEqual(item.parent_id, self.root.pk)
+        item.parent = self.other
+        item.save()
+        self.assertEqual(item.url, "other/child/")
+
+    def test_move_to_root(self):
+        self.child.parent = None
+        self.child.save()
+        self.assertEqual(self.child.url, "child/")
+        self.assertEqual(
+            MenuItem.objects.get(pk=self.grandchild.pk).url,
+            "child/grandchild/",
+        )
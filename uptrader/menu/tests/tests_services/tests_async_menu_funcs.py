@@ -0,0 +1,92 @@
+import asyncio
+from typing import List, Set
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TransactionTestCase
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models.menu_item import MenuItem
+from menu.services import async_menu_funcs
+from menu.services.async_menu_funcs import (
+    _get_pool,
+    aget_menu_branch,
+    aget_menu_branch_by_url,
+    aload_menu_branches,
+    aupdate_parent,
+)
+from menu.services.menu_funcs import MenuItemSchema, get_menu_branch
+from menu.services.replicas import is_pinned, replica_context
+
+
+# Асинхронный драйвер работает в своих соединениях,
+# поэтому данные должны быть закоммичены
+class TestAsyncMenuFuncs(TransactionTestCase):
+    def setUp(self):
+        self.root = MenuItemFactory.create(name="root")
+        self.child = MenuItemFactory.create(name="child", parent=self.root)
+        self.leaf = MenuItemFactory.create(name="leaf", parent=self.child)
+        self.other = MenuItemFactory.create(name="other")
+
+    @classmethod
+    def tree_ids(cls, roots: List[MenuItemSchema]) -> Set[tuple]:
+        result: Set[tuple] = set()
+        stack: List[MenuItemSchema] = list(roots)
+        while stack:
+            node = stack.pop()
+            result.add(
+                (node.id, tuple(sorted(child.id for child in node.children)))
+            )
+            stack.extend(node.children)
+        return result
+
+    async def test_branch(self):
+        self.assertEqual(
+            self.tree_ids(await aget_menu_branch("leaf")),
+            self.tree_ids(await sync_to_async(get_menu_branch)("leaf")),
+        )
+        self.assertEqual(
+            self.tree_ids(await aget_menu_branch_by_url("root/child/")),
+            self.tree_ids(await sync_to_async(get_menu_branch)("child")),
+        )
+        forest = await aload_menu_branches(["leaf", "other"], [])
+        self.assertEqual(len(forest), 4)
+
+    async def test_update_parent(self):
+        with replica_context():
+            url = await aupdate_parent(self.child.pk, self.other.pk)
+            self.assertTrue(is_pinned())
+        self.assertEqual(url, "other/child/")
+        leaf = await MenuItem.objects.aget(pk=self.leaf.pk)
+        self.assertEqual(leaf.url, "other/child/leaf/")
+        self.assertIsNone(await aupdate_parent(100500, None))
+
+
+class TestPools(SimpleTestCase):
+    def setUp(self):
+        self.opened: List[int] = list()
+        patcher = mock.patch.object(
+            async_menu_funcs, "_open_pool", self.open_pool
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(async_menu_funcs._pools.clear)
+
+    async def open_pool(self) -> int:
+        self.opened.append(len(self.opened))
+        if len(self.opened) == 1:
+            raise OSError("connection refused")
+        return self.opened[-1]
+
+    def test_failed_open_is_retried(self):
+        async def get_pools() -> List[int]:
+            with self.assertRaises(OSError):
+                await _get_pool()
+            return [await _get_pool(), await _get_pool()]
+
+        self.assertEqual(asyncio.run(get_pools()), [1, 1])
+
+    def test_closed_loops_are_forgotten(self):
+        self.opened.append(0)
+        self.assertEqual(asyncio.run(_get_pool()), 1)
+        self.assertEqual(asyncio.run(_get_pool()), 2)
+        self.assertEqual(len(async_menu_funcs._pools), 1)
@@ -0,0 +1,133 @@
+import random
+from typing import List, Set
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models import MenuItem, MenuItemBranch
+from menu.services.branch_funcs import fill_branches, rebuild_branches
+from menu.services.menu_funcs import (
+    MenuItemSchema,
+    get_menu_branch,
+    get_menu_branch_by_url,
+    update_parent,
+)
+
+
+@override_settings(MENU_BRANCH_TABLE=True)
+class TestBranchTable(TestCase):
+    def setUp(self):
+        self.n: int = 300
+        self.menu_items: List[MenuItem] = [
+            MenuItemFactory.create() for _ in range(self.n)
+        ]
+        for i in range(1, self.n):
+            self.menu_items[i].parent = random.choice(
+                (self.menu_items[random.randint(0, i - 1)], None)
+            )
+            self.menu_items[i].save()
+        self.names: Set[str] = {item.name for item in self.menu_items}
+
+    @classmethod
+    def tree_ids(cls, roots: List[MenuItemSchema]) -> Set[tuple]:
+        result: Set[tuple] = set()
+        stack: List[MenuItemSchema] = list(roots)
+        while stack:
+            node = stack.pop()
+            result.add(
+                (node.id, tuple(sorted(child.id for child in node.children)))
+            )
+            stack.extend(node.children)
+        return result
+
+    def assert_branches_equal(self):
+        for name in self.names:
+            stored_branch = get_menu_branch(name)
+            with override_settings(MENU_BRANCH_TABLE=False):
+                path_branch = get_menu_branch(name)
+            self.assertEqual(
+                self.tree_ids(path_branch), self.tree_ids(stored_branch)
+            )
+
+    def test_branch_equals_path_branch(self):
+        self.assert_branches_equal()
+        # все ветки построены, повторное чтение - один запрос
+        with self.assertNumQueries(1):
+            get_menu_branch(self.menu_items[-1].name)
+
+    def test_branch_by_url(self):
+        item: MenuItem = MenuItem.objects.get(pk=self.menu_items[-1].pk)
+        stored_branch = get_menu_branch_by_url(item.url)
+        with override_settings(MENU_BRANCH_TABLE=False):
+            path_branch = get_menu_branch_by_url(item.url)
+        self.assertEqual(
+            self.tree_ids(path_branch), self.tree_ids(stored_branch)
+        )
+
+    def test_branches_after_moves(self):
+        self.assert_branches_equal()
+        for item in random.sample(self.menu_items[1:], 30):
+            update_parent(item.pk, self.menu_items[0].pk)
+        update_parent(self.menu_items[0].pk, None)
+        self.assert_branches_equal()
+
+    def test_branches_after_raw_changes(self):
+        self.assert_branches_equal()
+        item: MenuItem = self.menu_items[-1]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO menu_menuitem (name, url, parent_id) "
+                "SELECT 'new', url || 'new/', id FROM menu_menuitem "
+                "WHERE id = %s",
+                (item.pk,),
+            )
+        self.names.add("new")
+        self.assert_branches_equal()
+
+    def test_branches_after_delete(self):
+        self.assert_branches_equal()
+        self.menu_items[0].delete()
+        self.names = set(MenuItem.objects.values_list("name", flat=True))
+        self.assert_branches_equal()
+
+    def test_unchanged_save_keeps_branches(self):
+        rebuild_branches()
+        count: int = MenuItemBranch.objects.count()
+        self.menu_items[0].refresh_from_db()
+        self.menu_items[0].save()
+        self.assertEqual(MenuItemBranch.objects.count(), count)
+
+    def test_rebuild(self):
+        self.assertEqual(rebuild_branches(), self.n)
+        self.assertEqual(MenuItemBranch.objects.count(), self.n)
+        self.assert_branches_equal()
+
+
+class TestFillDuringChange(TransactionTestCase):
+    def test_open_change_does_not_block(self):
+        root: MenuItem = MenuItemFactory.create(name="root")
+        child: MenuItem = MenuItemFactory.create(name="child", parent=root)
+
+        # незакоммиченное изменение дерева в другом соединении
+        writer = connections.create_connection("default")
+        self.addCleanup(writer.close)
+        writer.set_autocommit(False)
+        with writer.cursor() as cursor:
+            cursor.execute(
+                "UPDATE menu_menuitem SET name = 'renamed' WHERE id = %s",
+                (root.pk,),
+            )
+
+        branches = fill_branches([child.pk])
+        self.assertEqual(
+            sorted(row[0] for row in branches[child.pk]),
+            [root.pk, child.pk],
+        )
+        # ветка построена по старым данным и не сохранена
+        self.assertFalse(MenuItemBranch.objects.exists())
+
+        writer.rollback()
+        fill_branches([child.pk])
+        self.assertTrue(
+            MenuItemBranch.objects.filter(item_id=child.pk).exists()
+        )
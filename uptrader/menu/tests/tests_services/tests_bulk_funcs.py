@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from typing import Dict, List, Set
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from menu.models import MenuItem
+from menu.services.bulk_funcs import (
+    _copy_batch,
+    generate_menu_rows,
+    import_menu_records,
+    insert_menu_rows,
+    iter_menu_rows_topological,
+    reserve_menu_item_ids,
+)
+from menu.services.menu_funcs import MenuRow
+
+
+class TestInsertMenuRows(TestCase):
+    n: int = 2000
+
+    def load(self, method: str) -> List[MenuRow]:
+        with transaction.atomic():
+            first_id: int = reserve_menu_item_ids(self.n)
+            rows: List[MenuRow] = list(
+                generate_menu_rows(
+                    first_id, (f"item\t{i}\\" for i in range(self.n))
+                )
+            )
+            inserted: List[int] = list()
+            insert_menu_rows(
+                rows, method=method, batch_size=300, progress=inserted.append
+            )
+        self.assertEqual(inserted[-1], self.n)
+        self.assertEqual(len(inserted), 7)
+        return rows
+
+    def check_tree(self, rows: List[MenuRow]) -> None:
+        items: Dict[int, MenuItem] = MenuItem.objects.in_bulk()
+        self.assertEqual(len(items), self.n)
+        for item_id, parent_id, name, url in rows:
+            item: MenuItem = items[item_id]
+            self.assertEqual(
+                (item.parent_id, item.name, item.url), (parent_id, name, url)
+            )
+            parent_url: str = items[parent_id].url if parent_id else ""
+            self.assertEqual(item.url, f"{parent_url}{item.name}/")
+
+    def test_copy(self):
+        self.check_tree(self.load("copy"))
+
+    def test_bulk_create(self):
+        self.check_tree(self.load("bulk"))
+
+    def test_copy_batch(self):
+        # COPY через установленный драйвер (psycopg2 или psycopg 3)
+        with transaction.atomic():
+            first_id: int = reserve_menu_item_ids(2)
+            rows: List[MenuRow] = [
+                (first_id, None, "a\\N\r\n", "a\\N\r\n/"),
+                (first_id + 1, first_id, "b\tc", "a\\N\r\n/b\tc/"),
+            ]
+            _copy_batch(rows)
+        self.assertEqual(
+            list(
+                MenuItem.objects.order_by("id").values_list(
+                    "id", "parent_id", "name", "url"
+                )
+            ),
+            rows,
+        )
+
+    def test_ids_are_reserved(self):
+        with transaction.atomic():
+            first_id: int = reserve_menu_item_ids(100)
+        item: MenuItem = MenuItem.objects.create(name="after", url="after/")
+        self.assertGreaterEqual(item.pk, first_id + 100)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            insert_menu_rows([], method="csv")
+
+
+class TestExportImport(TestCase):
+    def setUp(self):
+        with transaction.atomic():
+            first_id: int = reserve_menu_item_ids(500)
+            insert_menu_rows(
+                generate_menu_rows(first_id, (f"w{i}" for i in range(500)))
+            )
+
+    def test_topological_order(self):
+        seen: Set[int] = set()
+        rows: List[MenuRow] = list(iter_menu_rows_topological(chunk_size=7))
+        self.assertEqual(len(rows), 500)
+        for item_id, parent_id, _, _ in rows:
+            if parent_id is not None:
+                self.assertIn(parent_id, seen)
+            seen.add(item_id)
+
+    def test_reimport(self):
+        exported: List[MenuRow] = list(iter_menu_rows_topological())
+        # порядок записей не важен
+        exported.reverse()
+        for method in ("copy", "bulk"):
+            self.assertEqual(
+                import_menu_records(
+                    ((row[0], row[1], row[2]) for row in exported),
+                    method=method,
+                    batch_size=64,
+                ),
+                500,
+            )
+
+        self.assertEqual(MenuItem.objects.count(), 1500)
+        urls: List[str] = sorted(row[3] for row in exported)
+        self.assertEqual(
+            sorted(MenuItem.objects.values_list("url", flat=True)),
+            sorted(urls * 3),
+        )
+        for item in MenuItem.objects.filter(parent__isnull=False)[:50]:
+            self.assertEqual(item.url, f"{item.parent.url}{item.name}/")
+
+        self.assertEqual(MenuItem.objects.count(), 1000)
+        urls: List[str] = sorted(row[3] for row in exported)
+        self.assertEqual(
+            sorted(MenuItem.objects.values_list("url", flat=True)),
+            sorted(urls + urls),
+        )
+
+    def test_invalid_records(self):
+        for records in (
+            [(1, None, "a"), (2, 100, "b")],
+            [(1, None, "a"), (2, 3, "b"), (3, 2, "c")],
+            [(1, None, "a"), (1, None, "b")],
+        ):
+            with self.assertRaises(ValueError):
+                import_menu_records(records)
+        self.assertEqual(MenuItem.objects.count(), 500)
+
+
+class TestImportCommand(TestCase):
+    def test_import_with_copy(self):
+        # временная таблица заполняется COPY через установленный драйвер
+        records: List[Dict] = [
+            {"id": 10, "parent_id": None, "name": "a\\b"},
+            {"id": 11, "parent_id": 10, "name": "c\td"},
+        ]
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".jsonl", delete=False, encoding="utf-8"
+        ) as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        self.addCleanup(os.remove, file.name)
+
+        call_command("import_menu", file.name, stdout=StringIO())
+        self.assertEqual(
+            sorted(MenuItem.objects.values_list("url", flat=True)),
+            ["a\\b/", "a\\b/c\td/"],
+        )
@@ -0,0 +1,104 @@
+import random
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.test import TestCase, override_settings
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models import MenuItem, MenuItemClosure
+from menu.services.closure_funcs import get_descendant_ids, rebuild_closure
+from menu.services.menu_funcs import (
+    MenuItemSchema,
+    get_menu_branch,
+    update_parent,
+)
+from menu.services.move_funcs import move_subtree_online
+
+
+@override_settings(MENU_CLOSURE_TABLE=True)
+class TestClosureTable(TestCase):
+    def setUp(self):
+        self.n: int = 500
+        self.menu_items: List[MenuItem] = [
+            MenuItemFactory.create() for _ in range(self.n)
+        ]
+        for i in range(1, self.n):
+            self.menu_items[i].parent = random.choice(
+                (self.menu_items[random.randint(0, i - 1)], None)
+            )
+            self.menu_items[i].save()
+
+    @classmethod
+    def expected_closure(cls) -> Set[Tuple[int, int, int]]:
+        parents: Dict[int, Optional[int]] = dict(
+            MenuItem.objects.values_list("id", "parent_id")
+        )
+        result: Set[Tuple[int, int, int]] = set()
+        for item_id in parents:
+            ancestor_id: Optional[int] = item_id
+            depth: int = 0
+            while ancestor_id is not None:
+                result.add((ancestor_id, item_id, depth))
+                ancestor_id = parents[ancestor_id]
+                depth += 1
+        return result
+
+    @classmethod
+    def actual_closure(cls) -> Set[Tuple[int, int, int]]:
+        return set(
+            MenuItemClosure.objects.values_list(
+                "ancestor_id", "descendant_id", "depth"
+            )
+        )
+
+    @classmethod
+    def tree_ids(cls, roots: List[MenuItemSchema]) -> Set[tuple]:
+        result: Set[tuple] = set()
+        stack: List[MenuItemSchema] = list(roots)
+        while stack:
+            node = stack.pop()
+            result.add(
+                (node.id, tuple(sorted(child.id for child in node.children)))
+            )
+            stack.extend(node.children)
+        return result
+
+    def test_closure_after_inserts(self):
+        self.assertEqual(self.expected_closure(), self.actual_closure())
+
+    def test_closure_after_moves(self):
+        for item in random.sample(self.menu_items[1:], 50):
+            new_parent: MenuItem = self.menu_items[0]
+            update_parent(item.pk, new_parent.pk)
+        update_parent(self.menu_items[0].pk, None)
+        self.assertEqual(self.expected_closure(), self.actual_closure())
+
+    def test_closure_after_online_move(self):
+        new_parent: MenuItem = MenuItemFactory.create(name="new_parent")
+        move_subtree_online(self.menu_items[0].pk, new_parent.pk, batch_size=7)
+        self.assertEqual(self.expected_closure(), self.actual_closure())
+
+    def test_closure_after_delete(self):
+        self.menu_items[0].delete()
+        self.assertEqual(self.expected_closure(), self.actual_closure())
+
+    def test_rebuild(self):
+        MenuItemClosure.objects.all().delete()
+        rebuild_closure()
+        self.assertEqual(self.expected_closure(), self.actual_closure())
+
+    def test_descendant_ids(self):
+        root: MenuItem = self.menu_items[0]
+        expected: Set[int] = {
+            descendant_id
+            for ancestor_id, descendant_id, _ in self.expected_closure()
+            if ancestor_id == root.pk
+        }
+        self.assertEqual(expected, set(get_descendant_ids(root.pk)))
+
+    def test_branch_equals_path_branch(self):
+        for name in {item.name for item in self.menu_items}:
+            closure_branch = get_menu_branch(name)
+            with override_settings(MENU_CLOSURE_TABLE=False):
+                path_branch = get_menu_branch(name)
+            self.assertEqual(
+                self.tree_ids(path_branch), self.tree_ids(closure_branch)
+            )
@@ -0,0 +1,136 @@
+import random
+from typing import List, Set
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models.menu_item import MenuItem
+from menu.services.menu_cache import MenuTreeCache
+from menu.services.menu_funcs import (
+    MenuItemSchema,
+    get_menu_branch,
+    update_parent,
+)
+from menu.services.tree_version import (
+    get_tree_version,
+    is_fragment_cache_enabled,
+    is_tree_cache_enabled,
+    is_tree_version_shared,
+    warn_if_caches_disabled,
+)
+
+
+class TestMenuTreeCache(TestCase):
+    def setUp(self):
+        self.n: int = 300
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu_items: List[MenuItem] = [
+                MenuItemFactory.create() for _ in range(self.n)
+            ]
+            for i in range(1, self.n):
+                self.menu_items[i].parent = random.choice(
+                    (self.menu_items[random.randint(0, i - 1)], None)
+                )
+                self.menu_items[i].save()
+
+        self.names: Set[str] = {item.name for item in self.menu_items}
+        self.cache = MenuTreeCache(max_branches=10)
+
+    @classmethod
+    def tree_ids(cls, roots: List[MenuItemSchema]) -> Set[tuple]:
+        result: Set[tuple] = set()
+        stack: List[MenuItemSchema] = list(roots)
+        while stack:
+            node = stack.pop()
+            result.add(
+                (node.id, tuple(sorted(child.id for child in node.children)))
+            )
+            stack.extend(node.children)
+        return result
+
+    def test_branch_equals_database_branch(self):
+        for name in self.names:
+            self.assertEqual(
+                self.tree_ids(get_menu_branch(name)),
+                self.tree_ids(self.cache.get_branch(name)),
+            )
+
+    def test_unknown_name(self):
+        self.assertEqual(self.cache.get_branch("no such menu item"), [])
+
+    def test_branch_is_reused(self):
+        name: str = self.menu_items[0].name
+        self.cache.get_forest()
+        with self.assertNumQueries(0):
+            self.assertIs(
+                self.cache.get_branch(name), self.cache.get_branch(name)
+            )
+
+    def test_lru_eviction(self):
+        for name in list(self.names)[:20]:
+            self.cache.get_branch(name)
+        self.assertLessEqual(len(self.cache._branches), 10)
+
+    def test_invalidation_on_save(self):
+        version: int = get_tree_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            item: MenuItem = MenuItemFactory.create(name="brand-new")
+        self.assertNotEqual(version, get_tree_version())
+        self.assertEqual(
+            [node.id for node in self.cache.get_branch("brand-new")],
+            [item.pk],
+        )
+
+    def test_invalidation_on_update_parent(self):
+        item: MenuItem = self.menu_items[-1]
+        self.cache.get_branch(item.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_parent(item.pk, None)
+        self.assertIn(
+            item.pk, [node.id for node in self.cache.get_branch(item.name)]
+        )
+
+    def test_invalidation_on_delete(self):
+        item: MenuItem = MenuItemFactory.create(name="to-delete")
+        self.assertEqual(len(self.cache.get_branch("to-delete")), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(self.cache.get_branch("to-delete"), [])
+
+
+@override_settings(MENU_SINGLE_PROCESS=False, MENU_TREE_NOTIFY=False)
+class TestTreeVersionShared(SimpleTestCase):
+    def test_local_cache(self):
+        self.assertFalse(is_tree_version_shared())
+        self.assertFalse(is_tree_cache_enabled())
+        self.assertFalse(is_fragment_cache_enabled())
+
+    def test_startup_warning(self):
+        with self.assertLogs("main", "WARNING") as logs:
+            warn_if_caches_disabled()
+        self.assertIn(
+            "MENU_TREE_CACHE and MENU_FRAGMENT_CACHE", logs.output[0]
+        )
+        with self.settings(MENU_SINGLE_PROCESS=True):
+            with self.assertNoLogs("main", "WARNING"):
+                warn_if_caches_disabled()
+        with self.settings(MENU_TREE_CACHE=False, MENU_FRAGMENT_CACHE=False):
+            with self.assertNoLogs("main", "WARNING"):
+                warn_if_caches_disabled()
+
+    def test_single_process(self):
+        with self.settings(MENU_SINGLE_PROCESS=True):
+            self.assertTrue(is_tree_cache_enabled())
+            self.assertTrue(is_fragment_cache_enabled())
+        with self.settings(MENU_SINGLE_PROCESS=True, MENU_TREE_CACHE=False):
+            self.assertFalse(is_tree_cache_enabled())
+
+    def test_shared_cache(self):
+        caches = {
+            "menu": {
+                "BACKEND": "django.core.cache.backends.filebased."
+                "FileBasedCache",
+                "LOCATION": "/tmp/menu_cache_test",
+            },
+        }
+        with self.settings(CACHES=caches):
+            self.assertTrue(is_tree_version_shared())
@@ -1,14 +1,21 @@
 import random
 from typing import Dict, List, Set
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from menu.factories.menu_item_factory import MenuItemFactory
 from menu.models.menu_item import MenuItem
 from menu.services.menu_funcs import (
+    MenuForest,
     MenuItemSchema,
+    count_subtrees,
+    delete_subtrees,
     get_menu_branch,
+    get_menu_branch_by_url,
+    move_items,
+    path_to_url,
     update_parent,
 )
+from menu.services.move_funcs import start_move
 
 
 class TestGetMenuBranch(TestCase):
@@ -32,8 +39,7 @@ class TestGetMenuBranch(TestCase):
             self.menu_items[i].save()
 
     def tearDown(self):
-        for item in self.menu_items:
-            item.delete()
+        delete_subtrees(item.pk for item in self.menu_items)
 
     @classmethod
     def compare_nodes(
@@ -203,6 +209,85 @@ class TestGetMenuBranch(TestCase):
                 )
 
 
+class TestMenuForest(SimpleTestCase):
+    def setUp(self):
+        # строки не по порядку id, у "b" два узла с одним url
+        self.forest = MenuForest(
+            [
+                (5, 1, "b", "a/b/"),
+                (1, None, "a", "a/"),
+                (2, 1, "b", "a/b/"),
+                (7, 2, "c", "a/b/c/"),
+                (3, 1, "d", "a/d/"),
+                (9, None, "e", "e/"),
+            ]
+        )
+
+    def test_branch_nodes(self):
+        roots = self.forest.branch("c")
+        self.assertEqual([root.id for root in roots], [1])
+        self.assertEqual(
+            [(node.id, node.parent_id) for node in roots[0].children],
+            [(2, 1), (3, 1), (5, 1)],
+        )
+        b = roots[0].children[0]
+        self.assertEqual((b.name, b.url), ("b", "a/b/"))
+        self.assertEqual([child.name for child in b.children], ["c"])
+        self.assertEqual(roots[0].children[2].children, [])
+
+    def test_lookups(self):
+        self.assertEqual(len(self.forest), 6)
+        self.assertEqual([root.id for root in self.forest.branch("b")], [1])
+        roots = self.forest.branch_by_url("a/b/")
+        self.assertEqual(
+            [child.id for child in roots[0].children[0].children], [7]
+        )
+        self.assertEqual(roots[0].children[2].children, [])
+        self.assertEqual(self.forest.branch("x"), [])
+        self.assertEqual(
+            [root.id for root in self.forest.branch_by_ids([9, 100])], [9]
+        )
+
+
+class TestGetMenuBranchByUrl(TestCase):
+    def setUp(self):
+        # два дерева с одинаковыми именами: a/b/c и x/b/c
+        self.a = MenuItemFactory.create(name="a")
+        self.a_b = MenuItemFactory.create(name="b", parent=self.a)
+        self.a_b_c = MenuItemFactory.create(name="c", parent=self.a_b)
+        self.a_d = MenuItemFactory.create(name="d", parent=self.a)
+        self.x = MenuItemFactory.create(name="x")
+        self.x_b = MenuItemFactory.create(name="b", parent=self.x)
+        self.x_b_c = MenuItemFactory.create(name="c", parent=self.x_b)
+
+    def test_path_to_url(self):
+        self.assertEqual(path_to_url("a/b/c"), "a/b/c/")
+        self.assertEqual(path_to_url("/a/b/c/"), "a/b/c/")
+
+    def test_only_one_branch(self):
+        self.assertEqual(len(get_menu_branch("c")), 2)
+
+        roots: List[MenuItemSchema] = get_menu_branch_by_url("x/b/c/")
+        self.assertEqual([root.id for root in roots], [self.x.pk])
+        self.assertEqual(
+            [child.id for child in roots[0].children], [self.x_b.pk]
+        )
+        self.assertEqual(
+            [child.id for child in roots[0].children[0].children],
+            [self.x_b_c.pk],
+        )
+
+    def test_siblings_are_expanded(self):
+        roots: List[MenuItemSchema] = get_menu_branch_by_url("a/b/")
+        self.assertEqual(
+            {child.id for child in roots[0].children},
+            {self.a_b.pk, self.a_d.pk},
+        )
+
+    def test_unknown_url(self):
+        self.assertEqual(get_menu_branch_by_url("a/unknown/"), [])
+
+
 class TestUpdateParent(TestCase):
     def setUp(self):
         self.n: int = 1000
@@ -224,8 +309,7 @@ class TestUpdateParent(TestCase):
             self.menu_items[i].save()
 
     def tearDown(self):
-        for item in self.menu_items:
-            item.delete()
+        delete_subtrees(item.pk for item in self.menu_items)
 
     def check_url(self, item_id: int, correct_url: str) -> None:
         self.assertEqual(
@@ -249,3 +333,108 @@ class TestUpdateParent(TestCase):
         for item in self.menu_items[1:]:
             update_parent(item.pk, self.menu_items[0].pk)
             self.check_url(item.pk, f"{self.menu_items[0].url}{item.name}/")
+
+
+class TestMoveItems(TestCase):
+    def setUp(self):
+        self.n: int = 300
+        self.menu_items: List[MenuItem] = [
+            MenuItemFactory.create() for _ in range(self.n)
+        ]
+        for i in range(1, self.n):
+            self.menu_items[i].parent = random.choice(
+                (self.menu_items[random.randint(0, i - 1)], None)
+            )
+            self.menu_items[i].save()
+
+    def check_urls(self) -> None:
+        items: Dict[int, MenuItem] = MenuItem.objects.in_bulk()
+        for item in items.values():
+            parent_url: str = (
+                items[item.parent_id].url if item.parent_id else ""
+            )
+            self.assertEqual(item.url, f"{parent_url}{item.name}/")
+
+    def test_move_many(self):
+        # перевесим все узлы, кроме первого, на первый узел
+        root: MenuItem = self.menu_items[0]
+        move_items((item.pk, root.pk) for item in self.menu_items[1:])
+        self.assertEqual(
+            MenuItem.objects.filter(parent_id=root.pk).count(), self.n - 1
+        )
+        self.check_urls()
+
+    def test_move_nested(self):
+        a = MenuItemFactory.create(name="a")
+        b = MenuItemFactory.create(name="b", parent=a)
+        c = MenuItemFactory.create(name="c", parent=b)
+        d = MenuItemFactory.create(name="d", parent=c)
+
+        # b в корень, a под c, d под a
+        move_items([(b.pk, None), (a.pk, c.pk), (d.pk, a.pk)])
+        self.assertEqual(MenuItem.objects.get(pk=d.pk).url, "b/c/a/d/")
+        self.check_urls()
+
+    def test_cycle(self):
+        a = MenuItemFactory.create(name="a")
+        b = MenuItemFactory.create(name="b", parent=a)
+        c = MenuItemFactory.create(name="c", parent=b)
+        e = MenuItemFactory.create(name="e")
+
+        for moves in (
+            [(a.pk, c.pk)],
+            [(a.pk, a.pk)],
+            [(a.pk, e.pk), (e.pk, b.pk)],
+        ):
+            with self.assertRaises(ValueError):
+                move_items(moves)
+        self.assertEqual(MenuItem.objects.get(pk=c.pk).url, "a/b/c/")
+
+    def test_missing_items(self):
+        with self.assertRaises(ValueError):
+            move_items([(self.menu_items[1].pk, -1)])
+        with self.assertRaises(ValueError):
+            move_items([(-1, None)])
+
+
+class TestDeleteSubtrees(TestCase):
+    def setUp(self):
+        self.a = MenuItemFactory.create(name="a")
+        self.b = MenuItemFactory.create(name="b", parent=self.a)
+        self.c = MenuItemFactory.create(name="c", parent=self.b)
+        self.d = MenuItemFactory.create(name="d", parent=self.a)
+        self.e = MenuItemFactory.create(name="e")
+
+    def test_delete_subtree(self):
+        self.assertEqual(count_subtrees([self.b.pk, self.c.pk]), 2)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(delete_subtrees([self.b.pk, self.c.pk]), 2)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            set(MenuItem.objects.values_list("pk", flat=True)),
+            {self.a.pk, self.d.pk, self.e.pk},
+        )
+
+    def test_model_delete(self):
+        self.assertEqual(self.a.delete(), (4, {"menu.MenuItem": 4}))
+        self.assertIsNone(self.a.pk)
+        self.assertEqual(
+            MenuItem.objects.filter(name__in=("a", "e")).delete(),
+            (1, {"menu.MenuItem": 1}),
+        )
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_subtree_being_moved(self):
+        start_move(self.b.pk, self.e.pk)
+        # старое и новое поддеревья и их предки
+        for item in (self.a, self.b, self.c, self.e):
+            with self.assertRaises(ValueError):
+                delete_subtrees([item.pk])
+        self.assertEqual(delete_subtrees([self.d.pk]), 1)
+        self.assertEqual(MenuItem.objects.count(), 4)
+
+    def test_nothing_to_delete(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(delete_subtrees([]), 0)
+            self.assertEqual(delete_subtrees([-1]), 0)
+        self.assertEqual(callbacks, [])
@@ -0,0 +1,193 @@
+import random
+from typing import Dict, List, Optional, Set
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models import MenuItem
+from menu.services.menu_funcs import (
+    MenuForest,
+    MenuRow,
+    get_menu_branch,
+    get_menu_branch_by_url,
+)
+from menu.services.menu_limits import (
+    LimitedMenuItem,
+    get_limited_menu_branch,
+    get_limited_menu_branch_by_url,
+    limit_full_branch,
+)
+
+
+def tree(roots: List[LimitedMenuItem]) -> Set[tuple]:
+    result: Set[tuple] = set()
+    stack: List[LimitedMenuItem] = list(roots)
+    while stack:
+        node = stack.pop()
+        result.add(
+            (
+                node.id,
+                tuple(child.id for child in node.children),
+                node.more,
+                node.more_after,
+            )
+        )
+        stack.extend(node.children)
+    return result
+
+
+class TestLimitBranch(SimpleTestCase):
+    def setUp(self):
+        # корень 1, у него дети 2..11, у 5 - дети 12..16
+        self.rows: List[MenuRow] = [(1, None, "root", "root/")]
+        for item_id in range(2, 12):
+            self.rows.append((item_id, 1, f"n{item_id}", f"root/n{item_id}/"))
+        for item_id in range(12, 17):
+            self.rows.append(
+                (item_id, 5, f"n{item_id}", f"root/n5/n{item_id}/")
+            )
+        self.forest = MenuForest(self.rows)
+
+    def test_siblings_limit_keeps_path(self):
+        roots = limit_full_branch(
+            self.forest.branch("n14"), "n14", None, None, 2
+        )
+        root: LimitedMenuItem = roots[0]
+        self.assertEqual([child.id for child in root.children], [2, 3, 5])
+        self.assertTrue(root.more)
+        self.assertEqual(root.more_after, 3)
+
+        item: LimitedMenuItem = root.children[2]
+        self.assertEqual([child.id for child in item.children], [12, 13, 14])
+        self.assertTrue(item.more)
+        self.assertEqual(item.more_after, 13)
+
+    def test_depth_limit(self):
+        roots = limit_full_branch(
+            self.forest.branch("n14"), "n14", None, 2, None
+        )
+        root: LimitedMenuItem = roots[0]
+        self.assertEqual(len(root.children), 10)
+        self.assertFalse(root.more)
+        item: LimitedMenuItem = root.children[3]
+        self.assertEqual(item.children, [])
+        self.assertTrue(item.more)
+        self.assertIsNone(item.more_after)
+
+    def test_no_limits_hit(self):
+        roots = limit_full_branch(
+            self.forest.branch("n12"), "n12", None, 5, 100
+        )
+        self.assertFalse(any(more for _, _, more, _ in tree(roots)))
+
+
+class TestLimitedQuery(TestCase):
+    def setUp(self):
+        self.n: int = 300
+        self.menu_items: List[MenuItem] = [
+            MenuItemFactory.create() for _ in range(self.n)
+        ]
+        for i in range(1, self.n):
+            # мало корней, чтобы были широкие уровни
+            self.menu_items[i].parent = random.choice(
+                (self.menu_items[random.randint(0, i - 1)],) * 9 + (None,)
+            )
+            self.menu_items[i].save()
+
+    def test_same_as_limited_full_branch(self):
+        for max_depth, max_siblings in ((None, 2), (2, None), (3, 3)):
+            for name in {item.name for item in self.menu_items[::10]}:
+                with self.assertNumQueries(1):
+                    limited = get_limited_menu_branch(
+                        name, max_depth, max_siblings
+                    )
+                expected = limit_full_branch(
+                    get_menu_branch(name), name, None, max_depth, max_siblings
+                )
+                self.assertEqual(tree(expected), tree(limited))
+
+    def test_by_url(self):
+        item: MenuItem = MenuItem.objects.get(pk=self.menu_items[-1].pk)
+        limited = get_limited_menu_branch_by_url(item.url, 3, 2)
+        expected = limit_full_branch(
+            get_menu_branch_by_url(item.url), item.name, item.url, 3, 2
+        )
+        self.assertEqual(tree(expected), tree(limited))
+
+    def test_duplicate_urls(self):
+        root: MenuItem = MenuItemFactory.create(name="dup-root")
+        # соседи с одинаковым url, раскрыт должен быть только предок цели
+        first: MenuItem = MenuItemFactory.create(name="dup-same", parent=root)
+        second: MenuItem = MenuItemFactory.create(name="dup-same", parent=root)
+        for name in ("dup-1", "dup-2", "dup-3"):
+            MenuItemFactory.create(name=name, parent=first)
+        target: MenuItem = MenuItemFactory.create(
+            name="dup-target", parent=second
+        )
+
+        for max_depth, max_siblings in ((None, 2), (3, None)):
+            limited = get_limited_menu_branch(
+                target.name, max_depth, max_siblings
+            )
+            expected = limit_full_branch(
+                get_menu_branch(target.name),
+                target.name,
+                None,
+                max_depth,
+                max_siblings,
+            )
+            self.assertEqual(tree(expected), tree(limited))
+            self.assertEqual(
+                {
+                    (first.pk, (), False, None),
+                    (second.pk, (target.pk,), False, None),
+                },
+                {
+                    node
+                    for node in tree(limited)
+                    if node[0] in (first.pk, second.pk)
+                },
+            )
+
+
+class TestMenuChildren(TestCase):
+    def setUp(self):
+        self.root: MenuItem = MenuItemFactory.create(name="root")
+        self.children: List[MenuItem] = [
+            MenuItemFactory.create(name=f"c{i}", parent=self.root)
+            for i in range(5)
+        ]
+        MenuItemFactory.create(name="g", parent=self.children[0])
+
+    def get(self, item_id: int, **params) -> Dict:
+        response = self.client.get(
+            reverse("menu:children", args=(item_id,)), params
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages(self):
+        page: Dict = self.get(self.root.pk, limit=2)
+        self.assertEqual(
+            [child["id"] for child in page["children"]],
+            [child.pk for child in self.children[:2]],
+        )
+        self.assertTrue(page["children"][0]["has_children"])
+        self.assertEqual(
+            page["children"][0]["children_url"],
+            reverse("menu:children", args=(self.children[0].pk,)),
+        )
+        self.assertFalse(page["children"][1]["has_children"])
+        self.assertIsNone(page["children"][1]["children_url"])
+
+        after: Optional[int] = page["next"]
+        ids: List[int] = list()
+        while after is not None:
+            page = self.get(self.root.pk, limit=2, after=after)
+            ids.extend(child["id"] for child in page["children"])
+            after = page["next"]
+        self.assertEqual(ids, [child.pk for child in self.children[2:]])
+
+    def test_unknown_item(self):
+        response = self.client.get(reverse("menu:children", args=(10**9,)))
+        self.assertEqual(response.status_code, 404)
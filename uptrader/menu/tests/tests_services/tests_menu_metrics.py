@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase, TestCase
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.services.menu_funcs import get_menu_branch
+from menu.services.menu_metrics import (
+    add_nodes,
+    collect_metrics,
+    get_metrics,
+    phase,
+)
+
+
+class TestPhases(SimpleTestCase):
+    def test_no_metrics_outside(self):
+        self.assertIsNone(get_metrics())
+        with phase("render"):
+            add_nodes(10)
+        self.assertIsNone(get_metrics())
+
+    def test_phases(self):
+        with collect_metrics() as metrics:
+            self.assertIs(get_metrics(), metrics)
+            with phase("render"):
+                with phase("tree"):
+                    add_nodes(3)
+                add_nodes(1)
+            with phase("tree"):
+                add_nodes(2)
+        self.assertIsNone(get_metrics())
+
+        self.assertEqual(metrics.phases["tree"].calls, 2)
+        self.assertEqual(metrics.phases["tree"].nodes, 5)
+        self.assertEqual(metrics.phases["render"].nodes, 1)
+        self.assertGreater(metrics.phases["render"].seconds, 0)
+        header: str = metrics.server_timing()
+        self.assertIn("menu-tree;dur=", header)
+        self.assertIn('desc="5 nodes"', header)
+        self.assertIn("menu-total;dur=", header)
+
+
+class TestQueryMetrics(TestCase):
+    def test_branch_queries(self):
+        root = MenuItemFactory.create(name="root")
+        MenuItemFactory.create(name="child", parent=root)
+
+        with collect_metrics() as metrics:
+            get_menu_branch("child")
+        self.assertEqual(metrics.queries, 1)
+        self.assertEqual(metrics.phases["db"].queries, 1)
+        self.assertEqual(metrics.phases["db"].rows, 2)
+        self.assertEqual(metrics.phases["tree"].nodes, 2)
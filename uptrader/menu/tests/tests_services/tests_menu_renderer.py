@@ -0,0 +1,84 @@
+import random
+import re
+from typing import Dict, List, Optional
+
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+from menu.services.menu_funcs import MenuForest, MenuItemSchema, MenuRow
+from menu.services.menu_limits import limit_full_branch
+from menu.services.menu_renderer import render_menu
+
+
+class TestRenderMenu(SimpleTestCase):
+    menu_url: str = "http://127.0.0.1:8000/menu/"
+
+    def setUp(self):
+        self.rows: List[MenuRow] = list()
+        urls: Dict[int, str] = dict()
+        for item_id in range(1, 500):
+            parent_id: Optional[int] = random.choice(
+                (None, random.randint(1, item_id))
+            )
+            if parent_id == item_id:
+                parent_id = None
+            name: str = random.choice(("a", "b", "<c&d>", "e'f")) + str(
+                random.randint(0, 20)
+            )
+            urls[item_id] = f"{urls.get(parent_id, '')}{name}/"
+            self.rows.append((item_id, parent_id, name, urls[item_id]))
+        self.forest = MenuForest(self.rows)
+
+    @classmethod
+    def normalize(cls, html: str) -> str:
+        return re.sub(r">\s+<", "><", html).strip()
+
+    def render_template(
+        self,
+        menu_items: List[MenuItemSchema],
+        target: str,
+        target_url: Optional[str],
+    ) -> str:
+        return render_to_string(
+            "menu/all_menu.html",
+            {
+                "menu_items": [[item] for item in menu_items],
+                "target": target,
+                "target_url": target_url,
+                "menu_url": self.menu_url,
+            },
+        )
+
+    def test_same_markup_by_name(self):
+        for name in {row[2] for row in self.rows}:
+            menu_items = self.forest.branch(name)
+            self.assertEqual(
+                self.normalize(self.render_template(menu_items, name, None)),
+                render_menu(menu_items, name, None, self.menu_url),
+            )
+
+    def test_same_markup_by_url(self):
+        for _, _, name, url in self.rows[::5]:
+            menu_items = self.forest.branch_by_url(url)
+            self.assertEqual(
+                self.normalize(self.render_template(menu_items, name, url)),
+                render_menu(menu_items, name, url, self.menu_url),
+            )
+
+    def test_same_markup_limited(self):
+        for name in list({row[2] for row in self.rows})[:20]:
+            menu_items = limit_full_branch(
+                self.forest.branch(name), name, None, 3, 2
+            )
+            self.assertEqual(
+                self.normalize(self.render_template(menu_items, name, None)),
+                render_menu(menu_items, name, None, self.menu_url),
+            )
+
+    def test_empty_menu(self):
+        self.assertEqual(render_menu([], "x", None, self.menu_url), "")
+
+    def test_escaping(self):
+        node = MenuItemSchema(id=1, parent_id=None, name="<b>", url="<b>/")
+        html: str = render_menu([node], "<b>", None, self.menu_url)
+        self.assertNotIn("<b>", html)
+        self.assertIn("&lt;b&gt;", html)
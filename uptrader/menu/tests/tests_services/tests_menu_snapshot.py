@@ -0,0 +1,85 @@
+import os
+import random
+import tempfile
+from typing import Dict, List, Set
+
+from django.test import SimpleTestCase
+from menu.services.menu_funcs import MenuForest, MenuItemSchema, MenuRow
+from menu.services.menu_snapshot import MenuSnapshot, write_menu_snapshot
+
+
+class TestMenuSnapshot(SimpleTestCase):
+    def setUp(self):
+        self.rows: List[MenuRow] = list()
+        urls: Dict[int, str] = dict()
+        for item_id in range(1, 2000):
+            parent_id = random.choice((None, random.randint(1, item_id)))
+            if parent_id == item_id:
+                parent_id = None
+            name: str = random.choice(("hello", "мир", "menu")) + str(
+                random.randint(0, 50)
+            )
+            urls[item_id] = f"{urls.get(parent_id, '')}{name}/"
+            self.rows.append((item_id, parent_id, name, urls[item_id]))
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.directory.name, "menu.snapshot")
+        write_menu_snapshot(self.path, 42, self.rows)
+        self.forest = MenuForest(self.rows)
+        self.snapshot = MenuSnapshot(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @classmethod
+    def flatten(cls, roots: List[MenuItemSchema]) -> Set[tuple]:
+        result: Set[tuple] = set()
+        stack: List[MenuItemSchema] = list(roots)
+        while stack:
+            node = stack.pop()
+            result.add(
+                (
+                    node.id,
+                    node.parent_id,
+                    node.name,
+                    node.url,
+                    tuple(child.id for child in node.children),
+                )
+            )
+            stack.extend(node.children)
+        return result
+
+    def test_header(self):
+        self.assertEqual(self.snapshot.version, 42)
+        self.assertEqual(len(self.snapshot), len(self.rows))
+
+    def test_branch_equals_forest_branch(self):
+        for name in {row[2] for row in self.rows}:
+            self.assertEqual(
+                self.flatten(self.forest.branch(name)),
+                self.flatten(self.snapshot.branch(name)),
+            )
+
+    def test_branch_by_ids(self):
+        ids: List[int] = [1, 500, 1999, 100500]
+        self.assertEqual(
+            self.flatten(self.forest.branch_by_ids(ids)),
+            self.flatten(self.snapshot.branch_by_ids(ids)),
+        )
+
+    def test_branch_by_url(self):
+        for url in {row[3] for row in self.rows[::10]}:
+            self.assertEqual(
+                self.flatten(self.forest.branch_by_url(url)),
+                self.flatten(self.snapshot.branch_by_url(url)),
+            )
+        self.assertEqual(self.snapshot.branch_by_url("no/such/url/"), [])
+
+    def test_replace_snapshot(self):
+        write_menu_snapshot(self.path, 43, self.rows[:10])
+        snapshot = MenuSnapshot(self.path)
+        self.assertEqual(snapshot.version, 43)
+        self.assertEqual(len(snapshot), 10)
+        self.assertNotEqual(snapshot.inode, self.snapshot.inode)
+        # the old mapping still works after the swap
+        self.assertEqual(len(self.snapshot), len(self.rows))
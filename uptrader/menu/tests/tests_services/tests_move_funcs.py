@@ -0,0 +1,130 @@
+import random
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models import MenuItem, MenuMoveJob
+from menu.services.menu_funcs import move_items, update_parent
+from menu.services.move_funcs import (
+    _move_batch,
+    like_prefix,
+    move_subtree_online,
+    resume_move_jobs,
+    start_move,
+)
+
+
+class TestLikePrefix(SimpleTestCase):
+    def test_escapes(self):
+        self.assertEqual(like_prefix("a/b_c%/"), "a/b\\_c\\%/%")
+        self.assertEqual(like_prefix("a\\b/"), "a\\\\b/%")
+
+
+class TestMoveSubtreeOnline(TestCase):
+    def setUp(self):
+        self.n: int = 500
+        # уникальные имена, чтобы url пунктов не совпадали
+        self.menu_items: List[MenuItem] = [
+            MenuItemFactory.create(name=f"n{i}") for i in range(self.n)
+        ]
+        for i in range(1, self.n):
+            self.menu_items[i].parent = random.choice(
+                (self.menu_items[random.randint(0, i - 1)],) * 4 + (None,)
+            )
+            self.menu_items[i].save()
+
+    def assert_urls_valid(self):
+        rows: Dict[int, Tuple[Optional[int], str, str]] = {
+            item_id: (parent_id, name, url)
+            for item_id, parent_id, name, url in MenuItem.objects.values_list(
+                "id", "parent_id", "name", "url"
+            )
+        }
+        for parent_id, name, url in rows.values():
+            parent_url: str = rows[parent_id][2] if parent_id else ""
+            self.assertEqual(url, f"{parent_url}{name}/")
+
+    def test_move(self):
+        root: MenuItem = self.menu_items[0]
+        total: int = MenuItem.objects.filter(url__startswith=root.url).count()
+        parent: MenuItem = MenuItemFactory.create(name="new")
+        calls: List[Tuple[int, int]] = list()
+
+        job_id: int = move_subtree_online(
+            root.pk,
+            parent.pk,
+            batch_size=7,
+            progress=lambda moved, count: calls.append((moved, count)),
+        )
+
+        self.assert_urls_valid()
+        self.assertEqual(calls[-1], (total - 1, total - 1))
+        self.assertEqual(len(calls), (total - 1) // 7 + 1)
+        job: MenuMoveJob = MenuMoveJob.objects.get(pk=job_id)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.new_url, "new/n0/")
+
+    def test_resume(self):
+        parent: MenuItem = MenuItemFactory.create(name="new")
+        job_id: int = start_move(self.menu_items[0].pk, parent.pk)
+        job: MenuMoveJob = MenuMoveJob.objects.get(pk=job_id)
+        # прерванный перенос: обработана только одна пачка
+        with connection.cursor() as cursor:
+            _move_batch(
+                cursor, job_id, job.item_id, job.old_url, job.new_url, 0, 3
+            )
+
+        self.assertEqual(resume_move_jobs(batch_size=10), [job_id])
+        self.assert_urls_valid()
+        job.refresh_from_db()
+        self.assertEqual(job.moved, job.total)
+        self.assertEqual(
+            job.last_id,
+            MenuItem.objects.filter(url__startswith=job.new_url)
+            .exclude(pk=job.item_id)
+            .latest("pk")
+            .pk,
+        )
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(resume_move_jobs(), [])
+
+    def test_same_parent(self):
+        item: MenuItem = self.menu_items[-1]
+        job_id: int = move_subtree_online(item.pk, item.parent_id)
+        self.assertIsNotNone(MenuMoveJob.objects.get(pk=job_id).finished_at)
+        self.assert_urls_valid()
+
+    def test_invalid_moves(self):
+        root: MenuItem = self.menu_items[0]
+        child: MenuItem = MenuItemFactory.create(name="child", parent=root)
+        MenuItemFactory.create(name="grandchild", parent=child)
+        with self.assertRaises(ValueError):
+            start_move(root.pk, child.pk)
+        with self.assertRaises(ValueError):
+            start_move(root.pk, root.pk)
+        with self.assertRaises(ValueError):
+            start_move(10**9)
+
+        start_move(child.pk)
+        # поддерево ещё переносится
+        with self.assertRaises(ValueError):
+            start_move(root.pk)
+
+    def test_changes_during_move(self):
+        root: MenuItem = self.menu_items[0]
+        child: MenuItem = MenuItemFactory.create(name="child", parent=root)
+        other: MenuItem = MenuItemFactory.create(name="other")
+        start_move(root.pk, other.pk)
+
+        # старое и новое поддеревья меняет только задание
+        with self.assertRaises(ValueError):
+            update_parent(child.pk, None)
+        with self.assertRaises(ValueError):
+            update_parent(other.pk, self.menu_items[-1].pk)
+        with self.assertRaises(ValueError):
+            move_items([(child.pk, other.pk)])
+
+        resume_move_jobs()
+        self.assertEqual(update_parent(child.pk, None), "child/")
+        self.assert_urls_valid()
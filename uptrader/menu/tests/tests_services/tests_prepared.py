@@ -0,0 +1,117 @@
+from django.db import DataError, connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.services import prepared
+from menu.services.menu_funcs import get_menu_branch, update_parent
+from menu.services.prepared import (
+    execute_prepared,
+    statement_name,
+    to_positional,
+)
+
+
+class TestToPositional(SimpleTestCase):
+    def test_placeholders(self):
+        self.assertEqual(
+            to_positional("SELECT %s, %s FROM t WHERE id = %s"),
+            "SELECT $1, $2 FROM t WHERE id = $3",
+        )
+
+
+class TestExecutePrepared(TestCase):
+    query: str = "SELECT id FROM menu_menuitem WHERE name = %s ORDER BY id;"
+
+    def setUp(self):
+        self.root = MenuItemFactory.create(name="root")
+        self.child = MenuItemFactory.create(name="child", parent=self.root)
+
+    def fetch(self, name: str):
+        with connection.cursor() as cursor:
+            execute_prepared(cursor, self.query, (name,))
+            return cursor.fetchall()
+
+    def test_prepared_once(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.fetch("root"), [(self.root.pk,)])
+            self.assertEqual(self.fetch("child"), [(self.child.pk,)])
+        self.assertEqual(len(captured.captured_queries), 3)
+        self.assertTrue(
+            captured.captured_queries[0]["sql"].startswith("PREPARE")
+        )
+        for query in captured.captured_queries[1:]:
+            self.assertTrue(query["sql"].startswith("EXECUTE"))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_prepared_statements WHERE name = %s;",
+                (statement_name(self.query.rstrip(";")),),
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    @override_settings(MENU_PREPARED_STATEMENTS=False)
+    def test_disabled(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.fetch("root"), [(self.root.pk,)])
+        self.assertNotIn("PREPARE", captured.captured_queries[0]["sql"])
+
+    def test_menu_queries(self):
+        get_menu_branch("child")
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                branch = get_menu_branch("child")
+            self.assertEqual([node.id for node in branch], [self.root.pk])
+
+        other = MenuItemFactory.create(name="other")
+        self.assertEqual(
+            update_parent(self.child.pk, other.pk), "other/child/"
+        )
+        self.assertEqual(update_parent(self.child.pk, None), "child/")
+
+    def test_failed_execute_keeps_statement(self):
+        # ошибка EXECUTE не должна приводить к повторному PREPARE
+        with connection.cursor() as cursor:
+            with self.assertRaises(DataError):
+                with transaction.atomic():
+                    execute_prepared(cursor, "SELECT %s::int / 0;", (1,))
+            with CaptureQueriesContext(connection) as captured:
+                with self.assertRaises(DataError):
+                    with transaction.atomic():
+                        execute_prepared(cursor, "SELECT %s::int / 0;", (1,))
+        self.assertFalse(
+            any(
+                query["sql"].startswith("PREPARE")
+                for query in captured.captured_queries
+            )
+        )
+
+
+class TestLostStatements(TransactionTestCase):
+    query: str = TestExecutePrepared.query
+
+    def setUp(self):
+        self.root = MenuItemFactory.create(name="root")
+        self.child = MenuItemFactory.create(name="child", parent=self.root)
+
+    def fetch(self, name: str):
+        with connection.cursor() as cursor:
+            execute_prepared(cursor, self.query, (name,))
+            return cursor.fetchall()
+
+    def test_session_reset(self):
+        self.assertEqual(self.fetch("root"), [(self.root.pk,)])
+        with connection.cursor() as cursor:
+            cursor.execute("DEALLOCATE ALL;")
+        # вне транзакции запрос готовится заново и повторяется
+        self.assertEqual(self.fetch("root"), [(self.root.pk,)])
+
+    def test_lost_registry(self):
+        self.assertEqual(self.fetch("root"), [(self.root.pk,)])
+        # запрос подготовлен, а реестр соединения потерян
+        prepared._prepared.clear()
+        self.assertEqual(self.fetch("child"), [(self.child.pk,)])
@@ -0,0 +1,141 @@
+import time
+from typing import List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.middleware import MenuReplicaMiddleware
+from menu.models import MenuItem
+from menu.routers import MenuReplicaRouter
+from menu.services import replicas
+from menu.services.replicas import (
+    get_read_alias,
+    has_written,
+    pin_primary,
+    replica_context,
+)
+from menu.services.tree_version import TREE_LSN_KEY
+
+
+@override_settings(
+    MENU_REPLICAS=["replica_0"],
+    MENU_REPLICA_LAG_CHECK_INTERVAL=1,
+    MENU_SINGLE_PROCESS=True,
+)
+class TestReadAlias(SimpleTestCase):
+    def setUp(self):
+        # последнее изменение меню - в позиции 100 WAL основного сервера
+        caches[settings.MENU_CACHE_ALIAS].set(TREE_LSN_KEY, 100)
+        self.set_replay_lsn(100)
+
+    def tearDown(self):
+        replicas._positions.clear()
+        caches[settings.MENU_CACHE_ALIAS].delete(TREE_LSN_KEY)
+
+    @classmethod
+    def set_replay_lsn(cls, lsn: int) -> None:
+        replicas._positions["replica_0"] = (time.monotonic(), lsn)
+
+    def test_fresh_replica(self):
+        self.assertEqual(get_read_alias(), "replica_0")
+
+    def test_lagging_replica(self):
+        self.set_replay_lsn(99)
+        self.assertEqual(get_read_alias(), "default")
+
+    def test_recent_change(self):
+        caches[settings.MENU_CACHE_ALIAS].set(TREE_LSN_KEY, 200)
+        self.assertEqual(get_read_alias(), "default")
+        self.set_replay_lsn(200)
+        self.assertEqual(get_read_alias(), "replica_0")
+
+    def test_unavailable_replica(self):
+        self.set_replay_lsn(replicas.UNAVAILABLE_LSN)
+        self.assertEqual(get_read_alias(), "default")
+
+    def test_pinned(self):
+        with replica_context(pinned=True):
+            self.assertEqual(get_read_alias(), "default")
+        with replica_context():
+            self.assertEqual(get_read_alias(), "replica_0")
+            pin_primary()
+            self.assertTrue(has_written())
+            self.assertEqual(get_read_alias(), "default")
+        self.assertFalse(has_written())
+
+    @override_settings(MENU_SINGLE_PROCESS=False, MENU_TREE_NOTIFY=False)
+    def test_local_cache(self):
+        # позиция в LocMemCache не видна другим процессам
+        self.assertEqual(get_read_alias(), "default")
+
+    @override_settings(MENU_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(get_read_alias(), "default")
+
+    def test_router(self):
+        router = MenuReplicaRouter()
+        with replica_context():
+            self.assertEqual(router.db_for_read(MenuItem), "replica_0")
+            self.assertEqual(router.db_for_write(MenuItem), "default")
+            self.assertEqual(router.db_for_read(MenuItem), "default")
+        self.assertFalse(router.allow_migrate("replica_0", "menu"))
+        self.assertIsNone(router.allow_migrate("default", "menu"))
+
+    def test_middleware(self):
+        aliases: List[str] = list()
+
+        def get_response(request):
+            aliases.append(get_read_alias())
+            return HttpResponse()
+
+        middleware = MenuReplicaMiddleware(get_response)
+        factory = RequestFactory()
+
+        response = middleware(factory.get("/"))
+        self.assertNotIn(MenuReplicaMiddleware.cookie_name, response.cookies)
+        response = middleware(factory.post("/"))
+        self.assertIn(MenuReplicaMiddleware.cookie_name, response.cookies)
+
+        request = factory.get("/")
+        request.COOKIES[MenuReplicaMiddleware.cookie_name] = "1"
+        response = middleware(request)
+        self.assertNotIn(MenuReplicaMiddleware.cookie_name, response.cookies)
+        self.assertEqual(aliases, ["replica_0", "default", "default"])
+
+
+@override_settings(
+    MENU_REPLICAS=["replica_0"],
+    MENU_REPLICA_LAG_CHECK_INTERVAL=60,
+    MENU_SINGLE_PROCESS=True,
+)
+class TestSaveOnPrimary(TransactionTestCase):
+    def setUp(self):
+        with replica_context():
+            self.parent: MenuItem = MenuItemFactory.create(name="parent")
+        # реплика свежая, но её нет в DATABASES: чтение с неё упадёт
+        replicas._positions["replica_0"] = (time.monotonic(), 2**62)
+
+    def tearDown(self):
+        replicas._positions.clear()
+        caches[settings.MENU_CACHE_ALIAS].delete(TREE_LSN_KEY)
+
+    def test_save_reads_primary(self):
+        with replica_context():
+            child: MenuItem = MenuItem(name="child", parent_id=self.parent.pk)
+            child.save()
+        self.assertEqual(child.url, "parent/child/")
+
+        with replica_context():
+            # parent_id до изменения читается в save
+            moved: MenuItem = MenuItem(
+                pk=child.pk, name="child", url=child.url
+            )
+            moved.save()
+        self.assertEqual(moved.url, "child/")
@@ -0,0 +1,106 @@
+import time
+
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.models import MenuTreeVersion
+from menu.services.menu_funcs import update_parent
+from menu.services.tree_listener import (
+    TreeVersionListener,
+    parse_lsn,
+    parse_payload,
+    tree_listener,
+)
+from menu.services.tree_version import get_tree_version
+
+
+class TestParsePayload(SimpleTestCase):
+    def test_payload(self):
+        self.assertEqual(parse_payload("12 1700000000.5"), (12, 1700000000.5))
+        self.assertEqual(parse_payload("12"), (12, None))
+
+    def test_lsn(self):
+        self.assertEqual(parse_lsn("0/10"), 16)
+        self.assertEqual(parse_lsn("16/B374D848"), (0x16 << 32) + 0xB374D848)
+        self.assertIsNone(parse_lsn(None))
+
+
+class TestTreeVersionTrigger(TestCase):
+    @classmethod
+    def db_version(cls) -> int:
+        return (
+            MenuTreeVersion.objects.filter(pk=1)
+            .values_list("version", flat=True)
+            .first()
+            or 0
+        )
+
+    def test_orm_changes(self):
+        version: int = self.db_version()
+        root = MenuItemFactory.create(name="root")
+        self.assertGreater(self.db_version(), version)
+        self.assertIsNotNone(MenuTreeVersion.objects.get(pk=1).modified_at)
+
+        version = self.db_version()
+        root.delete()
+        self.assertGreater(self.db_version(), version)
+
+    def test_raw_sql_changes(self):
+        root = MenuItemFactory.create(name="root")
+        child = MenuItemFactory.create(name="child", parent=root)
+
+        version: int = self.db_version()
+        update_parent(child.id, None)
+        self.assertGreater(self.db_version(), version)
+
+        version = self.db_version()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE menu_menuitem SET name = 'renamed' WHERE id = %s",
+                (root.id,),
+            )
+        self.assertGreater(self.db_version(), version)
+
+
+class TestTreeVersionListener(TransactionTestCase):
+    def setUp(self):
+        self.listener = TreeVersionListener(timeout=0.1, retry_delay=0.1)
+        self.addCleanup(self.listener.stop)
+
+    def wait_version(self, previous=None) -> int:
+        deadline: float = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            version = self.listener.get_version()
+            if version is not None and version != previous:
+                return version
+            time.sleep(0.05)
+        self.fail("The listener didn't receive the tree version")
+
+    def test_notifications(self):
+        version: int = self.wait_version()
+
+        # изменение мимо ORM тоже меняет версию
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO menu_menuitem (name, url) VALUES ('a', 'a/')"
+            )
+        self.assertGreater(self.wait_version(version), version)
+
+    @override_settings(MENU_TREE_NOTIFY=True)
+    def test_tree_version_from_database(self):
+        self.listener = tree_listener
+        self.addCleanup(tree_listener.stop)
+        version: int = self.wait_version()
+        self.assertEqual(get_tree_version(), version)
+
+        lsn: int = tree_listener.get_lsn()
+        MenuItemFactory.create(name="a")
+        self.assertGreater(self.wait_version(version), version)
+        self.assertEqual(get_tree_version(), tree_listener.get_version())
+        # позиция WAL прочитана после коммита изменения
+        self.assertGreater(tree_listener.get_lsn(), lsn)
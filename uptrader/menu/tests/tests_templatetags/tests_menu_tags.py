@@ -0,0 +1,146 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.template import Context, RequestContext, Template
+from django.test import RequestFactory, TestCase, override_settings
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.middleware import MenuLoaderMiddleware
+from menu.services.fragment_cache import fragment_cache_stats
+from menu.services.menu_cache import menu_tree_cache
+
+
+@override_settings(MENU_SINGLE_PROCESS=True)
+class TestDrawMenu(TestCase):
+    template = Template(
+        "{% load menu_tags %}{% draw_menu menu_name menu_path %}"
+    )
+
+    def setUp(self):
+        caches["menu_fragments"].clear()
+        menu_tree_cache.clear()
+        fragment_cache_stats.reset()
+
+        self.root = MenuItemFactory.create(name="root")
+        self.child = MenuItemFactory.create(name="child", parent=self.root)
+        self.other = MenuItemFactory.create(name="other", parent=self.root)
+
+    def render(self, menu_name: str, menu_path: str = None) -> str:
+        return self.template.render(
+            Context({"menu_name": menu_name, "menu_path": menu_path})
+        )
+
+    def test_target_is_marked(self):
+        html: str = self.render("child", "root/child")
+        self.assertIn("root/child/", html)
+        self.assertIn("root/other/", html)
+        self.assertEqual(html.count("dotted-underline"), 1)
+
+    def test_fallback_to_name(self):
+        html: str = self.render("child", "no/such/path")
+        self.assertIn("root/child/", html)
+        self.assertEqual(html.count("dotted-underline"), 1)
+
+    def test_warm_hit_skips_queries(self):
+        html: str = self.render("child", "root/child")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render("child", "root/child"), html)
+        self.assertEqual(
+            fragment_cache_stats.as_dict(), {"hits": 1, "misses": 1}
+        )
+
+    def test_invalidated_by_save(self):
+        self.render("child", "root/child")
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItemFactory.create(name="new", parent=self.root)
+        self.assertIn("root/new/", self.render("child", "root/child"))
+        self.assertEqual(fragment_cache_stats.misses, 2)
+
+    def test_cached_by_renderer(self):
+        template = Template(
+            "{% load menu_tags %}"
+            "{% draw_menu menu_name menu_path renderer=renderer %}"
+        )
+        for renderer in ("template", "compiled", "template", "compiled"):
+            template.render(
+                Context(
+                    {
+                        "menu_name": "child",
+                        "menu_path": "root/child",
+                        "renderer": renderer,
+                    }
+                )
+            )
+        self.assertEqual(
+            fragment_cache_stats.as_dict(), {"hits": 2, "misses": 2}
+        )
+
+    @override_settings(MENU_FRAGMENT_CACHE=False)
+    def test_cache_disabled(self):
+        self.render("child", "root/child")
+        self.render("child", "root/child")
+        self.assertEqual(fragment_cache_stats.hits, 0)
+
+
+@override_settings(MENU_TREE_CACHE=False, MENU_SINGLE_PROCESS=True)
+class TestMenuLoaderMiddleware(TestCase):
+    template = Template(
+        "{% load menu_tags %}"
+        "{% draw_menu 'child' 'root/child' %}"
+        "{% draw_menu 'leaf' %}"
+        "{% draw_menu 'other' 'root/other' %}"
+        "{% draw_menu 'child' 'root/child' %}"
+    )
+
+    def setUp(self):
+        caches["menu_fragments"].clear()
+        fragment_cache_stats.reset()
+
+        self.root = MenuItemFactory.create(name="root")
+        self.child = MenuItemFactory.create(name="child", parent=self.root)
+        self.other = MenuItemFactory.create(name="other", parent=self.root)
+        self.leaf = MenuItemFactory.create(name="leaf", parent=self.child)
+        self.middleware = MenuLoaderMiddleware(self.view)
+
+    def view(self, request: HttpRequest) -> HttpResponse:
+        return HttpResponse(self.template.render(RequestContext(request)))
+
+    def get(self) -> str:
+        response = self.middleware(RequestFactory().get("/menu/"))
+        return response.content.decode()
+
+    def test_same_as_without_loader(self):
+        expected: str = self.template.render(Context())
+        self.assertEqual(self.get(), expected)
+        self.assertNotIn("<!--draw_menu:", expected)
+
+    # ветки из кэша процесса: пул асинхронного драйвера
+    # не видит незакоммиченные данные теста
+    @override_settings(MENU_TREE_CACHE=True, MENU_SINGLE_PROCESS=True)
+    async def test_async_same_as_sync(self):
+        menu_tree_cache.clear()
+
+        async def view(request: HttpRequest) -> HttpResponse:
+            return HttpResponse(self.template.render(RequestContext(request)))
+
+        expected: str = await sync_to_async(self.template.render)(Context())
+        for _ in range(2):
+            # промах и попадание в кэш фрагментов
+            response = await MenuLoaderMiddleware(view)(
+                RequestFactory().get("/menu/")
+            )
+            self.assertEqual(response.content.decode(), expected)
+
+    # PREPARE первого запроса на соединении - отдельный запрос
+    @override_settings(
+        MENU_FRAGMENT_CACHE=False, MENU_PREPARED_STATEMENTS=False
+    )
+    def test_one_query_per_page(self):
+        with self.assertNumQueries(1):
+            html: str = self.get()
+        self.assertEqual(html.count("dotted-underline"), 4)
+
+    def test_cached_page_skips_queries(self):
+        html: str = self.get()
+        self.assertEqual(fragment_cache_stats.misses, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(), html)
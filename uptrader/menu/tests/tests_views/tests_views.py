@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from menu.decorators import menu_etag
+from menu.factories.menu_item_factory import MenuItemFactory
+from menu.services.tree_version import bump_tree_version, get_tree_modified
+
+
+@override_settings(MENU_SINGLE_PROCESS=True)
+class TestMenuConditionalGet(SimpleTestCase):
+    url: str = reverse("menu:index", kwargs={"subpath": "a/b"})
+
+    def test_not_modified_without_database(self):
+        etag: str = menu_etag([("b", "a/b")])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{etag}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], f'"{etag}"')
+
+        response = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=http_date(get_tree_modified()),
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes(self):
+        etag: str = menu_etag([("b", "a/b")])
+        self.assertNotEqual(etag, menu_etag([("c", "a/c")]))
+        self.assertEqual(
+            menu_etag([("b", "a/b"), ("c", None)]),
+            menu_etag([("c", ""), ("b", "a/b")]),
+        )
+        bump_tree_version()
+        self.assertNotEqual(etag, menu_etag([("b", "a/b")]))
+
+
+@override_settings(MENU_SINGLE_PROCESS=True)
+class TestMenuPage(TestCase):
+    def test_etag_of_rendered_page(self):
+        root = MenuItemFactory.create(name="a")
+        MenuItemFactory.create(name="b", parent=root)
+        url: str = reverse("menu:index", kwargs={"subpath": "a/b"})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.headers["ETag"], f'"{menu_etag([("b", "a/b")])}"'
+        )
+        self.assertIn("Last-Modified", response.headers)
+
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response.headers["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MENU_SINGLE_PROCESS=False)
+    def test_without_shared_version(self):
+        # версия в LocMemCache процесса - другие процессы её не меняют
+        root = MenuItemFactory.create(name="a")
+        MenuItemFactory.create(name="b", parent=root)
+        url: str = reverse("menu:index", kwargs={"subpath": "a/b"})
+        etag: str = menu_etag([("b", "a/b")])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{etag}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response.headers)
+        self.assertNotIn("Last-Modified", response.headers)
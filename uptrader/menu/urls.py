@@ -1,11 +1,25 @@
 """Module with urlpatterns."""
 
+from django.conf import settings
 from django.urls import path
 
-from .views import test_draw_menu
+from .views import atest_draw_menu, menu_children, test_draw_menu
 
 app_name = "menu"
 
 urlpatterns = [
-    path("<path:subpath>/", test_draw_menu, name="index"),
+    path(
+        "children/<int:item_id>.json",
+        menu_children,
+        name="children",
+    ),
+    path(
+        "<path:subpath>/",
+        (
+            atest_draw_menu
+            if getattr(settings, "MENU_ASYNC_VIEW", False)
+            else test_draw_menu
+        ),
+        name="index",
+    ),
 ]
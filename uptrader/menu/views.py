@@ -1,7 +1,103 @@
-from django.http import HttpRequest, HttpResponse
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.urls import reverse
+from menu.decorators import MenuTarget, menu_condition
+from menu.services.menu_limits import get_menu_children
+
+
+def get_target(subpath: str) -> Tuple[str, str]:
+    target_path: str = subpath.strip("/")
+    target: str = target_path.split("/")[-1]
+    return target, target_path
+
 
+def get_page_targets(request: HttpRequest, subpath: str) -> List[MenuTarget]:
+    return [get_target(subpath)]
 
+
+@menu_condition(get_page_targets)
 def test_draw_menu(request: HttpRequest, subpath: str) -> HttpResponse:
-    target: str = subpath.strip("/").split("/")[-1]
-    return render(request, "menu/index.html", context={"target": target})
+    target, target_path = get_target(subpath)
+    return render(
+        request,
+        "menu/index.html",
+        context={"target": target, "target_path": target_path},
+    )
+
+
+@menu_condition(get_page_targets)
+async def atest_draw_menu(request: HttpRequest, subpath: str) -> HttpResponse:
+    """
+    Async variant of test_draw_menu for ASGI (settings.MENU_ASYNC_VIEW).
+
+    The template only puts the menu placeholders, the branches are loaded
+    by MenuLoaderMiddleware without blocking the event loop.
+    """
+    target, target_path = get_target(subpath)
+    return render(
+        request,
+        "menu/index.html",
+        context={"target": target, "target_path": target_path},
+    )
+
+
+def get_children_targets(
+    request: HttpRequest, item_id: int
+) -> List[MenuTarget]:
+    return [(f"children:{item_id}", request.GET.urlencode())]
+
+
+def _get_int(request: HttpRequest, name: str, default: int) -> int:
+    try:
+        return max(int(request.GET.get(name, default)), 0)
+    except ValueError:
+        return default
+
+
+@menu_condition(get_children_targets)
+def menu_children(request: HttpRequest, item_id: int) -> JsonResponse:
+    """
+    Children of the menu item for the lazy expansion of the limited menus.
+
+    Query parameters: after - return the children with greater ids,
+    limit - page size (settings.MENU_CHILDREN_PAGE_SIZE by default,
+    at most settings.MENU_CHILDREN_MAX_PAGE_SIZE). The next page
+    starts after the "next" id of the response.
+    """
+    limit: int = _get_int(
+        request, "limit", getattr(settings, "MENU_CHILDREN_PAGE_SIZE", 100)
+    )
+    limit = min(
+        max(limit, 1), getattr(settings, "MENU_CHILDREN_MAX_PAGE_SIZE", 1000)
+    )
+    page: Optional[Tuple[list, bool]] = get_menu_children(
+        item_id, after=_get_int(request, "after", 0), limit=limit
+    )
+    if page is None:
+        raise Http404("Menu item does not exist")
+
+    children, has_next = page
+    return JsonResponse(
+        {
+            "id": item_id,
+            "children": [
+                {
+                    "id": child_id,
+                    "name": name,
+                    "url": url,
+                    "href": f"{settings.MENU_URL}{url}",
+                    "has_children": has_children,
+                    "children_url": (
+                        reverse("menu:children", args=(child_id,))
+                        if has_children
+                        else None
+                    ),
+                }
+                for child_id, name, url, has_children in children
+            ],
+            "next": children[-1][0] if has_next else None,
+        }
+    )
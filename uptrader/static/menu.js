@@ -0,0 +1,55 @@
+// Подгрузка скрытых детей пунктов меню (draw_menu с max_depth/max_siblings)
+document.addEventListener("click", async (event) => {
+    const link = event.target.closest(".menu-more a");
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+
+    const response = await fetch(link.href);
+    if (!response.ok) {
+        return;
+    }
+    const page = await response.json();
+    const more = link.parentElement;
+    // пункты на пути к цели уже показаны
+    const shown = new Set(
+        Array.from(
+            more.parentElement.querySelectorAll(":scope > li > a, :scope > li > span > a"),
+            (anchor) => anchor.href
+        )
+    );
+    for (const child of page.children) {
+        if (shown.has(new URL(child.href, document.baseURI).href)) {
+            continue;
+        }
+        const item = document.createElement("li");
+        const anchor = document.createElement("a");
+        anchor.href = child.href;
+        anchor.textContent = child.name;
+        item.append(anchor);
+        if (child.has_children) {
+            // дети подгруженного пункта тоже подгружаются по ссылке
+            const list = document.createElement("ul");
+            list.className = "menu";
+            const childMore = document.createElement("li");
+            childMore.className = "menu-more";
+            const childLink = document.createElement("a");
+            childLink.href = child.children_url;
+            childLink.dataset.menuChildren = child.id;
+            childLink.innerHTML = "&hellip;";
+            childMore.append(childLink);
+            list.append(childMore);
+            item.append(list);
+        }
+        more.before(item);
+    }
+
+    if (page.next === null) {
+        more.remove();
+    } else {
+        const url = new URL(link.href);
+        url.searchParams.set("after", page.next);
+        link.href = url;
+    }
+});
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "menu.middleware.MenuMetricsMiddleware",
+    "menu.middleware.MenuReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,6 +56,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "menu.middleware.MenuLoaderMiddleware",
 ]
 
 ROOT_URLCONF = "uptrader.urls"
@@ -102,6 +106,60 @@ DATABASES = {
     }
 }
 
+# Connections are reused between requests: with POSTGRES_POOL_SIZE > 0 they
+# are taken from the connection pool of the process (psycopg 3 only, see the
+# psycopg[binary,pool] dependency), otherwise every thread keeps
+# its connection for POSTGRES_CONN_MAX_AGE seconds. In both cases
+# the connection is checked before use.
+POSTGRES_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", 0))
+if POSTGRES_POOL_SIZE:
+    try:
+        from psycopg_pool import ConnectionPool
+    except ImportError:
+        raise ImproperlyConfigured(
+            "POSTGRES_POOL_SIZE requires psycopg 3 with the pool: "
+            'pip install "psycopg[binary,pool]" or set POSTGRES_POOL_SIZE=0'
+        )
+
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": min(2, POSTGRES_POOL_SIZE),
+            "max_size": POSTGRES_POOL_SIZE,
+            "timeout": int(os.getenv("POSTGRES_POOL_TIMEOUT", 10)),
+            "check": ConnectionPool.check_connection,
+        },
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(
+        os.getenv("POSTGRES_CONN_MAX_AGE", 60)
+    )
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Read replicas of the database for the menu reads (host:port, comma
+# separated), e.g. POSTGRES_REPLICAS=localhost:5433. The reads go to the
+# primary within MENU_REPLICA_STICKY_SECONDS after a write of the client
+# and while the replicas haven't replayed the last change of the menu tree
+# (see menu.services.replicas).
+MENU_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv("POSTGRES_REPLICAS", "").split(","))
+):
+    host, _, port = replica.strip().partition(":")
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    MENU_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["menu.routers.MenuReplicaRouter"]
+MENU_REPLICA_STICKY_SECONDS = int(os.getenv("MENU_REPLICA_STICKY_SECONDS", 10))
+MENU_REPLICA_LAG_CHECK_INTERVAL = float(
+    os.getenv("MENU_REPLICA_LAG_CHECK_INTERVAL", 1)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -182,3 +240,80 @@ LOGGING = {
 }
 
 MENU_URL = os.getenv("MENU_URL", "http://127.0.0.1:8000/menu/")
+
+# menu cache
+# With several workers the menu cache backend must be shared between them
+# (e.g. FileBasedCache), so all workers see the same menu tree version.
+# Otherwise (LocMemCache without MENU_TREE_NOTIFY) the process menu caches
+# and the menu ETag are off, unless the site runs in one process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "menu": {
+        "BACKEND": os.getenv(
+            "MENU_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("MENU_CACHE_LOCATION", ""),
+    },
+    "menu_fragments": {
+        "BACKEND": os.getenv(
+            "MENU_FRAGMENT_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("MENU_FRAGMENT_CACHE_LOCATION", ""),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.getenv("MENU_FRAGMENT_CACHE_MAX_ENTRIES", 1000)
+            ),
+        },
+    },
+}
+MENU_CACHE_ALIAS = "menu"
+# The site is served by one process (runserver), so a process menu cache
+# sees all changes of the menu tree.
+MENU_SINGLE_PROCESS = (
+    os.getenv("MENU_SINGLE_PROCESS", "1" if DEBUG else "0") == "1"
+)
+# Keep the whole menu tree in the memory of every process,
+# otherwise the branches are read from the database.
+MENU_TREE_CACHE = os.getenv("MENU_TREE_CACHE", "1") == "1"
+MENU_CACHE_MAX_BRANCHES = int(os.getenv("MENU_CACHE_MAX_BRANCHES", 1024))
+# The file with the menu snapshot shared between workers, empty - disabled.
+MENU_SNAPSHOT_PATH = os.getenv("MENU_SNAPSHOT_PATH", "")
+# "template" - menu/all_menu.html, "compiled" - menu.services.menu_renderer
+MENU_RENDERER = os.getenv("MENU_RENDERER", "template")
+# Page size of the children of the menu item (menu/children/<id>.json).
+MENU_CHILDREN_PAGE_SIZE = int(os.getenv("MENU_CHILDREN_PAGE_SIZE", 100))
+MENU_CHILDREN_MAX_PAGE_SIZE = int(
+    os.getenv("MENU_CHILDREN_MAX_PAGE_SIZE", 1000)
+)
+# Cache of the rendered menus (draw_menu tag), timeout in seconds.
+MENU_FRAGMENT_CACHE = os.getenv("MENU_FRAGMENT_CACHE", "1") == "1"
+MENU_FRAGMENT_CACHE_ALIAS = "menu_fragments"
+MENU_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv("MENU_FRAGMENT_CACHE_TIMEOUT", 300)
+)
+# Keep the menu closure table up to date and read branches from it.
+# Fill it for existing data with "python manage.py build_menu_closure".
+MENU_CLOSURE_TABLE = os.getenv("MENU_CLOSURE_TABLE", "0") == "1"
+# Read the menu branches from the stored branches of the items
+# (menu_menuitembranch), they are built when read after a change.
+MENU_BRANCH_TABLE = os.getenv("MENU_BRANCH_TABLE", "0") == "1"
+# Invalidate the cached menus by the version from the database trigger
+# (LISTEN/NOTIFY), the rendered menus are cached without timeout.
+MENU_TREE_NOTIFY = os.getenv("MENU_TREE_NOTIFY", "0") == "1"
+# Per-request menu metrics: Server-Timing header and the "main" logger
+# (WARNING for the requests slower than MENU_METRICS_SLOW_MS).
+MENU_METRICS = os.getenv("MENU_METRICS", "1") == "1"
+MENU_SERVER_TIMING = os.getenv("MENU_SERVER_TIMING", "1") == "1"
+MENU_METRICS_SLOW_MS = int(os.getenv("MENU_METRICS_SLOW_MS", 500))
+# Async menu view for ASGI (uvicorn uptrader.asgi:application), the menu
+# queries go through psycopg 3 pool if "psycopg[binary,pool]" is installed.
+MENU_ASYNC_VIEW = os.getenv("MENU_ASYNC_VIEW", "0") == "1"
+MENU_ASYNC_DRIVER = os.getenv("MENU_ASYNC_DRIVER", "1") == "1"
+MENU_ASYNC_POOL_SIZE = int(os.getenv("MENU_ASYNC_POOL_SIZE", 10))
+# Run the menu queries as server-side prepared statements,
+# disable behind PgBouncer in the transaction mode.
+MENU_PREPARED_STATEMENTS = os.getenv("MENU_PREPARED_STATEMENTS", "1") == "1"